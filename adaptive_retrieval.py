@@ -0,0 +1,40 @@
+"""Skora duyarlı (uyarlanabilir k) bağlam seçimi.
+
+ChromaDB'nin döndürdüğü mesafeler benzerliğe çevrilir; sonuç listesi bir benzerlik eşiğinde ve/veya
+ardışık skorlar arasındaki en büyük kırılmada kesilir. Hiçbir doküman eşiği geçemezse LLM çağrılmadan
+hazır "bulunamadı" cevabı verilebilir.
+
+Varsayılan yalnızca düşük bir eşiktir: kırılma kuralı [0.45, 0.30, 0.29, 0.28] gibi listeleri tek dokümana
+indirir ve skor ölçeği PCA (EMBEDDING_PCA_DIM) ile değişir. Eşik veya kırılma kuralı açılmadan önce
+`python embedding_recall_report.py --calibrate` ile o ayardaki skor dağılımı ve tutulan doküman sayısı ölçülmelidir.
+"""
+import os
+
+RETRIEVAL_MIN_SIMILARITY = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.15")) # Kosinüs benzerliği alt sınırı (temkinli)
+RETRIEVAL_MIN_GAP = float(os.getenv("RETRIEVAL_MIN_GAP", "0.08")) # Bu kadar büyük skor kırılmasından sonrası atılır
+RETRIEVAL_CUTOFF = os.getenv("RETRIEVAL_CUTOFF", "threshold") # "threshold" | "gap" | "both"
+RETRIEVAL_MIN_K = 1 # Eşiği geçen en az bu kadar doküman tutulur (kırılma kuralı için)
+
+
+def similarity_from_distance(distance):
+    """Birim uzunluklu vektörler için ChromaDB'nin (karesi alınmış) L2 mesafesini kosinüs benzerliğine çevirir."""
+    return 1.0 - distance / 2.0
+
+
+def cutoff_index(scores, min_similarity=RETRIEVAL_MIN_SIMILARITY, min_gap=RETRIEVAL_MIN_GAP, mode=RETRIEVAL_CUTOFF):
+    """Azalan sıralı skor listesinde tutulacak doküman sayısını (dinamik k) döndürür; 0 ise alakalı sonuç yoktur."""
+    k = len(scores)
+    if mode in ("threshold", "both"):
+        k = next((i for i, score in enumerate(scores) if score < min_similarity), k)
+    if mode in ("gap", "both") and k > RETRIEVAL_MIN_K:
+        gaps = [scores[i] - scores[i + 1] for i in range(RETRIEVAL_MIN_K - 1, k - 1)]
+        largest = max(gaps)
+        if largest >= min_gap:
+            k = gaps.index(largest) + RETRIEVAL_MIN_K
+    return k
+
+
+def select_relevant(ids, documents, metadatas, scores):
+    """Sonuçları dinamik k ile keser; (ids, documents, metadatas, scores) döndürür."""
+    k = cutoff_index(list(scores))
+    return ids[:k], documents[:k], metadatas[:k], list(scores[:k])
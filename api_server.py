@@ -0,0 +1,241 @@
+"""Gradio'suz, hafif JSON/HTTP API (ASGI).
+
+Mobil uygulama ve iş ortağı entegrasyonları için travel_service işlem hattını sunar:
+    POST /ask      {"question", "location"?, "stream"?, "include_context"?}
+    POST /route    {"city", "days"?, "start_weekday"?, "places"?}
+    GET  /nearby   ?lat=..&lon=..&radius_km=..&limit=..
+    GET  /health
+    GET  /metrics  (embedding batch ve model gecikme/hata istatistikleri)
+    POST /admin/reload   (Authorization: Bearer $ADMIN_TOKEN; veri setini kesintisiz yeniden yükler)
+    POST /admin/profile  ?requests=N  (profilleme modunda sonraki N isteği cProfile ile örnekler)
+    GET  /thumbnails/<dosya>   (uzun ömürlü önbellek başlıklarıyla)
+
+`stream: true` ile /ask cevabı NDJSON (satır başına bir JSON olay) olarak akar.
+Tek başına çalıştırma: python api_server.py  (Gradio arayüzüne de /api/v1 altında bağlanabilir)
+"""
+import hmac
+import json
+import math
+import os
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+from startup_profiler import profiler
+import travel_service
+from image_pipeline import CacheHeadersMiddleware
+from itinerary_planner import weekday_index
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") # Tanımlı değilse yönetici uçları kapalıdır
+
+
+def _error(message, status_code=400):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def _data_unavailable():
+    """Veri seti henüz yüklenmediyse (açılış/ısınma sürüyor) 503 cevabı; yüklendiyse None."""
+    if travel_service.snapshots.current() is None:
+        return _error(travel_service.NOT_READY_MESSAGE, status_code=503)
+    return None
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def _public_image(image, root_path):
+    """Dosya yolunu istemcinin kullanabileceği URL'ye çevirir."""
+    if not image:
+        return None
+    path = image["path"]
+    thumbnail_dir = travel_service.thumbnail_index.cache_dir if travel_service.thumbnail_index else None
+    if thumbnail_dir and os.path.dirname(os.path.abspath(path)) == os.path.abspath(thumbnail_dir):
+        url = f"{root_path}/thumbnails/{os.path.basename(path)}"
+    else:
+        url = None
+    return {"place": image["place"], "url": url, "width": image["width"], "height": image["height"]}
+
+
+def _public_result(result, root_path, include_context=False):
+    """Servis sonucundan istemciye gereken alanları seçer (debug bağlamı varsayılan olarak gönderilmez)."""
+    payload = {
+        "answer": result["answer"],
+        "city": result["city"],
+        "is_route_request": result["is_route_request"],
+        "itinerary": result["itinerary"],
+        "images": [_public_image(image, root_path) for image in result["images"]],
+    }
+    if include_context:
+        payload["context"] = result["context"]
+    return payload
+
+
+async def health(request):
+    ready = travel_service.is_ready()
+    return JSONResponse({"ready": ready}, status_code=200 if ready else 503)
+
+
+async def metrics(request):
+    # Parçalı modda doküman sayımı ağ beklediği için olay döngüsünde çalıştırılmaz
+    return JSONResponse(await run_in_threadpool(travel_service.service_metrics))
+
+
+async def ask(request):
+    body = await _json_body(request)
+    if body is None or not isinstance(body.get("question"), str) or not body["question"].strip():
+        return _error("'question' alanı zorunludur.")
+    if body.get("location") is not None and not isinstance(body["location"], str):
+        return _error("'location' \"enlem, boylam\" biçiminde metin olmalıdır.")
+    if not travel_service.is_ready():
+        return _error(travel_service.NOT_READY_MESSAGE, status_code=503)
+
+    question = body["question"].strip()
+    location = body.get("location")
+    include_context = bool(body.get("include_context"))
+    root_path = request.scope.get("root_path", "")
+
+    if body.get("stream"):
+        def ndjson_events():
+            for event in travel_service.stream_answer(question, location):
+                if event["type"] == "final":
+                    event = {"type": "final", **_public_result(event, root_path, include_context)}
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(ndjson_events(), media_type="application/x-ndjson")
+
+    result = await run_in_threadpool(travel_service.answer_question, question, location)
+    if result["error"]:
+        return _error(result["error"], status_code=result.get("status") or 502)
+    return JSONResponse(_public_result(result, root_path, include_context))
+
+
+async def route(request):
+    body = await _json_body(request)
+    if body is None or not isinstance(body.get("city"), str):
+        return _error("'city' alanı zorunludur.")
+    city = body["city"]
+
+    num_days = body.get("days", 3)
+    # bool, int'in alt sınıfıdır; true/2.7 gibi değerler sessizce 1/2 güne çevrilmez
+    if isinstance(num_days, bool) or not isinstance(num_days, int):
+        return _error("'days' tam sayı olmalıdır.")
+    start_weekday = body.get("start_weekday")
+    if isinstance(start_weekday, bool) or not isinstance(start_weekday, (int, str, type(None))):
+        return _error("'start_weekday' gün adı veya 0-6 arası tam sayı olmalıdır.")
+    try:
+        start_weekday = weekday_index(start_weekday) if start_weekday is not None else None
+    except ValueError as e:
+        return _error(str(e))
+    if not 1 <= num_days <= 14:
+        return _error("'days' 1 ile 14 arasında olmalıdır.")
+    places = body.get("places")
+    if places is not None and not (isinstance(places, list) and all(isinstance(p, str) for p in places)):
+        return _error("'places' metin listesi olmalıdır.")
+    unavailable = _data_unavailable()
+    if unavailable:
+        return unavailable
+
+    itinerary = await run_in_threadpool(travel_service.plan_city_route, city, places, num_days, start_weekday)
+    if itinerary is None:
+        return _error(f"Bilinmeyen şehir: {city}", status_code=404)
+    return JSONResponse({"city": city, "itinerary": itinerary})
+
+
+async def nearby(request):
+    params = request.query_params
+    try:
+        lat = float(params["lat"])
+        lon = float(params["lon"])
+        radius_km = float(params.get("radius_km", 1.6))
+        limit = int(params.get("limit", 10))
+    except (KeyError, ValueError):
+        return _error("'lat' ve 'lon' sayısal olarak verilmelidir.")
+    if not all(math.isfinite(value) for value in (lat, lon, radius_km)):
+        return _error("'lat', 'lon' ve 'radius_km' sonlu sayılar olmalıdır.")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return _error("'lat' -90..90, 'lon' -180..180 aralığında olmalıdır.")
+    if radius_km <= 0:
+        return _error("'radius_km' pozitif olmalıdır.")
+    unavailable = _data_unavailable()
+    if unavailable:
+        return unavailable
+    root_path = request.scope.get("root_path", "")
+    places = travel_service.nearby_places(lat, lon, radius_km=radius_km, limit=max(1, min(limit, 50)))
+    for place in places:
+        place["image"] = _public_image(place["image"], root_path)
+    return JSONResponse({"places": places})
+
+
+def _admin_error(request):
+    """Yönetici isteğini doğrular; sorun varsa hata cevabı döndürür."""
+    if not ADMIN_TOKEN:
+        return _error("Yönetici uçları kapalı (ADMIN_TOKEN tanımlı değil).", status_code=404)
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {ADMIN_TOKEN}"):
+        return _error("Yetkisiz.", status_code=401)
+    return None
+
+
+async def admin_reload(request):
+    denied = _admin_error(request)
+    if denied:
+        return denied
+    if not travel_service.is_ready():
+        return _error(travel_service.NOT_READY_MESSAGE, status_code=503)
+    current = travel_service.snapshots.current()
+    travel_service.reload_dataset_async("API /admin/reload")
+    return JSONResponse({"reloading": True, "current_generation": current.generation}, status_code=202)
+
+
+async def admin_profile(request):
+    denied = _admin_error(request)
+    if denied:
+        return denied
+    if not profiler.enabled:
+        return _error("Profilleme modu kapalı (PROFILE_STARTUP=1 ile başlatın).", status_code=409)
+    try:
+        count = max(1, min(int(request.query_params.get("requests", 1)), 20))
+    except ValueError:
+        return _error("'requests' sayısal olmalıdır.")
+    profiler.arm_requests(count)
+    return JSONResponse({"armed_requests": count, "report": profiler.report_path})
+
+
+def create_api_app():
+    """API'nin ASGI uygulamasını oluşturur (servis önceden başlatılmış olmalıdır)."""
+    thumbnail_dir = travel_service.thumbnail_index.cache_dir if travel_service.thumbnail_index else travel_service.THUMBNAIL_CACHE_DIR
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    routes = [
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/ask", ask, methods=["POST"]),
+        Route("/route", route, methods=["POST"]),
+        Route("/nearby", nearby, methods=["GET"]),
+        Route("/admin/reload", admin_reload, methods=["POST"]),
+        Route("/admin/profile", admin_profile, methods=["POST"]),
+        Mount("/thumbnails", app=StaticFiles(directory=thumbnail_dir), name="thumbnails"),
+    ]
+    return Starlette(routes=routes, middleware=[Middleware(CacheHeadersMiddleware, path_fragment="/thumbnails/")])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    print("--- API Başlatılıyor ---")
+    with profiler.phase("initialize"):
+        ready = travel_service.initialize_models_and_db()
+    if ready:
+        profiler.finish_startup()
+        uvicorn.run(create_api_app(), host=API_HOST, port=API_PORT)
+    else:
+        print("\n❌ Modeller düzgün başlatılamadığı için API başlatılamadı.")
@@ -0,0 +1,39 @@
+import argparse
+import json
+import time
+
+from travel_dataset import build_documents, compile_dataset
+from embedding_storage import EMBEDDING_STORAGE_DTYPE, STORAGE_DTYPES
+
+DATA_FILE = "travel_routes.json"
+DATASET_FILE = "travel_routes.bin"
+embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
+
+# travel_routes.json dosyasını uygulamanın mmap ile açtığı ikili formata derler.
+# Kullanım: python compile_dataset.py [--embeddings]
+parser = argparse.ArgumentParser(description="travel_routes.json -> travel_routes.bin derleyicisi")
+parser.add_argument("--input", default=DATA_FILE, help="Kaynak JSON dosyası")
+parser.add_argument("--output", default=DATASET_FILE, help="Üretilecek ikili dataset dosyası")
+parser.add_argument("--embeddings", action="store_true", help="Doküman embedding'lerini önceden hesaplayıp dosyaya göm")
+parser.add_argument("--embedding-dtype", choices=STORAGE_DTYPES, default=EMBEDDING_STORAGE_DTYPE,
+                    help="Gömülü embedding'lerin saklama türü (float16 yarı, int8 dörtte bir boyut)")
+args = parser.parse_args()
+
+start_time = time.time()
+with open(args.input, "r", encoding="utf-8") as f:
+    data = json.load(f)
+
+embeddings = None
+if args.embeddings:
+    from sentence_transformers import SentenceTransformer
+
+    print(f"⏳ Embedding'ler hesaplanıyor ({embedding_model_name})...")
+    documents, _, _ = build_documents(data)
+    model = SentenceTransformer(model_name_or_path=embedding_model_name, device='cpu')
+    embeddings = model.encode(documents, convert_to_numpy=True)
+
+warnings = compile_dataset(data, args.output, embeddings=embeddings, model_name=embedding_model_name,
+                           embedding_dtype=args.embedding_dtype)
+for warning in warnings:
+    print(f"⚠️ {warning}")
+print(f"✅ {args.output} oluşturuldu. ({time.time() - start_time:.2f} saniye)")
@@ -0,0 +1,150 @@
+"""Eşzamanlı gelen sorgu embedding'lerini tek bir toplu (batch) encode çağrısında birleştirir."""
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "16"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+
+class _PendingQuery:
+    """Sonucu bekleyen tek bir sorgu."""
+
+    __slots__ = ("text", "done", "vector", "error")
+
+    def __init__(self, text):
+        self.text = text
+        self.done = threading.Event()
+        self.vector = None
+        self.error = None
+
+
+class EmbeddingBatcher:
+    """Kısa bir zaman penceresinde gelen sorguları toplayıp tek seferde encode eder.
+
+    Her `ask_travel_bot` çağrısı `encode()` ile kendi vektörünü ister; arka plandaki
+    işçi iş parçacığı ilk sorgudan itibaren en fazla `max_wait_ms` bekler veya
+    `max_batch_size` sorguya ulaşınca hepsini tek bir `model.encode` çağrısıyla işler.
+    """
+
+    def __init__(self, model, max_batch_size=EMBED_BATCH_MAX_SIZE, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size en az 1 olmalıdır.")
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._total_queries = 0
+        self._total_encode_seconds = 0.0
+        self._closed = False
+        self._submit_lock = threading.Lock() # kapanma ile kuyruğa ekleme arasında yarış olmasın
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, text, timeout=None):
+        """Tek bir metnin embedding vektörünü döndürür (toplu işlenmeyi bekler)."""
+        pending = _PendingQuery(text)
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher kapatıldı.")
+            self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Embedding sonucu zamanında alınamadı.")
+        if pending.error is not None:
+            raise pending.error
+        return pending.vector
+
+    def close(self):
+        """İşçi iş parçacığını durdurur; kuyrukta bekleyenler yine de işlenir."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def stats(self):
+        """Batch boyutu dağılımını ve toplam sayaçları döndürür (metrik olarak)."""
+        with self._stats_lock:
+            total_batches = sum(self._batch_sizes.values())
+            return {
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "total_batches": total_batches,
+                "total_queries": self._total_queries,
+                "mean_batch_size": (self._total_queries / total_batches) if total_batches else 0.0,
+                "total_encode_seconds": round(self._total_encode_seconds, 4),
+            }
+
+    # --- İşçi tarafı ---
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Kapatma sinyali: elimizdeki batch'i bitirip çıkacağız.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        batch = []
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+                batch = self._collect_batch(first)
+                self._encode_batch(batch)
+                batch = []
+        finally:
+            # İşçi beklenmedik şekilde (BaseException) ölürse bekleyenler asılı kalmasın; yeni istekler hemen hata alır
+            with self._submit_lock:
+                self._closed = True
+            error = RuntimeError("EmbeddingBatcher işçisi durdu.")
+            self._fail(batch, error)
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    self._fail([item], error)
+
+    @staticmethod
+    def _fail(batch, error):
+        for pending in batch:
+            if not pending.done.is_set():
+                pending.error = error
+                pending.done.set()
+
+    def _encode_batch(self, batch):
+        # Aynı batch içindeki tekrar eden metinler yalnızca bir kez encode edilir.
+        unique_texts = list(dict.fromkeys(p.text for p in batch))
+        start_time = time.perf_counter()
+        try:
+            vectors = self.model.encode(unique_texts)
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        elapsed = time.perf_counter() - start_time
+
+        vector_by_text = {text: vectors[i] for i, text in enumerate(unique_texts)}
+        for pending in batch:
+            pending.vector = vector_by_text[pending.text]
+            pending.done.set()
+
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            self._total_queries += len(batch)
+            self._total_encode_seconds += elapsed
@@ -0,0 +1,150 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from travel_dataset import build_documents
+from embedding_storage import PcaProjection, STORAGE_DTYPES, normalize_rows, quantize, quantized_scores, storage_nbytes
+from adaptive_retrieval import RETRIEVAL_MIN_GAP, RETRIEVAL_MIN_SIMILARITY, cutoff_index
+
+DATA_FILE = "travel_routes.json"
+embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Düşük hassasiyetli / düşük boyutlu embedding ayarlarının recall@k raporu.
+# Her ayarın ilk k sonucu, tam hassasiyetli (float32, tam boyut) aramanın ilk k sonucuyla karşılaştırılır.
+# --calibrate ile her PCA ayarında benzerlik skorlarının dağılımı ve dinamik k kurallarının tuttuğu doküman
+# sayısı da raporlanır (adaptive_retrieval eşiklerini seçmek için).
+# Kullanım: python embedding_recall_report.py [--pca 32,64,128] [--k 1,5,10] [--calibrate] [--json rapor.json]
+parser = argparse.ArgumentParser(description="Embedding saklama ayarları için recall@k raporu")
+parser.add_argument("--input", default=DATA_FILE, help="Kaynak JSON dosyası")
+parser.add_argument("--dtypes", default=",".join(STORAGE_DTYPES), help="Karşılaştırılacak saklama türleri")
+parser.add_argument("--pca", default="32,64,128", help="Denenecek PCA boyutları (0: PCA yok her zaman dahil)")
+parser.add_argument("--k", default="1,5,10", help="recall@k için k değerleri")
+parser.add_argument("--calibrate", action="store_true", help="Dinamik k (eşik / kırılma) kalibrasyon raporu")
+parser.add_argument("--top", type=int, default=10, help="Kalibrasyonda aramanın döndürdüğü sonuç sayısı (RETRIEVAL_TOP_K)")
+parser.add_argument("--json", default=None, help="Sonuçları bu JSON dosyasına da yaz")
+args = parser.parse_args()
+
+dtypes = [d.strip() for d in args.dtypes.split(",") if d.strip()]
+pca_dims = [0] + [int(d) for d in args.pca.split(",") if d.strip() and int(d) > 0]
+ks = [int(k) for k in args.k.split(",") if k.strip()]
+
+
+def generate_queries(data):
+    """Veri setinden sorgu kümesi üretir (yer, kategori ve şehir planı soruları)."""
+    queries = []
+    for city, city_data in data.items():
+        queries.append(f"{city} için 3 günlük gezi planı")
+        for category, places in city_data.items():
+            if category not in ("Days", "Places") and isinstance(places, list):
+                queries.append(f"{city} şehrinde {category.lower()} önerileri")
+        for place_name, details in city_data.get("Places", {}).items():
+            queries.append(f"{place_name} hakkında bilgi ver")
+            if details.get("tips"):
+                queries.append(f"{place_name} ziyareti için ipuçları")
+            if details.get("description"):
+                queries.append(details["description"].split(".")[0])
+    return queries
+
+
+def top_k(scores, k):
+    k = min(k, len(scores))
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+with open(args.input, "r", encoding="utf-8") as f:
+    data = json.load(f)
+documents, _, _ = build_documents(data)
+queries = generate_queries(data)
+
+from sentence_transformers import SentenceTransformer
+
+print(f"⏳ {len(documents)} doküman ve {len(queries)} sorgu encode ediliyor ({embedding_model_name})...")
+model = SentenceTransformer(model_name_or_path=embedding_model_name, device='cpu')
+doc_vectors = normalize_rows(model.encode(documents, convert_to_numpy=True))
+query_vectors = normalize_rows(model.encode(queries, convert_to_numpy=True))
+
+# PCA en fazla min(doküman, boyut) bileşen üretir; kırpılan boyutlar tek satırda raporlanır
+max_pca_dim = min(doc_vectors.shape)
+clipped = sorted({d for d in pca_dims if d > max_pca_dim})
+if clipped:
+    print(f"⚠️ PCA boyutları {clipped} korpus için çok büyük ({len(documents)} doküman); {max_pca_dim} boyuta kırpılıyor.")
+pca_dims = list(dict.fromkeys(min(d, max_pca_dim) for d in pca_dims))
+
+max_k = max(ks)
+truth = [top_k(doc_vectors @ q, max_k) for q in query_vectors]
+
+results = []
+for pca_dim in pca_dims:
+    for dtype in dtypes:
+        start_time = time.perf_counter()
+        projection = PcaProjection.fit(doc_vectors, pca_dim) if pca_dim else None
+        index = projection.transform(doc_vectors) if projection else doc_vectors
+        codes, scales = quantize(index, dtype)
+        build_seconds = time.perf_counter() - start_time
+        projected_queries = projection.transform(query_vectors) if projection else query_vectors
+
+        recalls = {k: 0.0 for k in ks}
+        for expected, query in zip(truth, projected_queries):
+            found = top_k(quantized_scores(codes, scales, query), max_k)
+            for k in ks:
+                recalls[k] += len(set(found[:k]) & set(expected[:k])) / min(k, len(expected))
+        results.append({
+            "dtype": dtype,
+            "dim": index.shape[1],
+            "bytes_per_vector": storage_nbytes(codes, scales) / len(documents),
+            "chroma_bytes_per_vector": index.shape[1] * 4,
+            "build_seconds": round(build_seconds, 5),
+            **{f"recall@{k}": round(recalls[k] / len(queries), 4) for k in ks},
+        })
+
+header = f"{'tür':<8} {'boyut':>5} {'bayt/vektör':>11} {'chroma bayt':>11} {'kurulum (ms)':>12} " + " ".join(f"{'recall@' + str(k):>10}" for k in ks)
+print(header)
+print("-" * len(header))
+for row in results:
+    print(f"{row['dtype']:<8} {row['dim']:>5} {row['bytes_per_vector']:>11.0f} {row['chroma_bytes_per_vector']:>11} "
+          f"{row['build_seconds'] * 1000:>12.2f} " + " ".join(f"{row[f'recall@{k}']:>10.4f}" for k in ks))
+
+calibration = []
+if args.calibrate:
+    # Skorlar float32 indeks üzerinden hesaplanır; "korunan recall@5" tam boyutlu ilk 5 sonucun kesmeden sağ çıkan oranıdır
+    for pca_dim in pca_dims:
+        projection = PcaProjection.fit(doc_vectors, pca_dim) if pca_dim else None
+        index = projection.transform(doc_vectors) if projection else doc_vectors
+        projected_queries = projection.transform(query_vectors) if projection else query_vectors
+        ranked = []
+        for query in projected_queries:
+            scores = index @ query
+            order = top_k(scores, args.top)
+            ranked.append((order, [float(s) for s in scores[order]]))
+        top1 = np.array([scores[0] for _, scores in ranked])
+        last = np.array([scores[-1] for _, scores in ranked])
+        row = {"dim": index.shape[1],
+               "top1_p10_p50_p90": [round(float(v), 3) for v in np.percentile(top1, [10, 50, 90])],
+               f"top{args.top}_p10_p50_p90": [round(float(v), 3) for v in np.percentile(last, [10, 50, 90])]}
+        for mode in ("threshold", "gap", "both"):
+            kept = [cutoff_index(scores, mode=mode) for _, scores in ranked]
+            retained = [len(set(order[:k]) & set(expected[:5])) / min(5, len(expected))
+                        for (order, _), k, expected in zip(ranked, kept, truth)]
+            row[mode] = {"mean_k": round(float(np.mean(kept)), 2),
+                         "empty_ratio": round(sum(k == 0 for k in kept) / len(kept), 4),
+                         "k1_ratio": round(sum(k == 1 for k in kept) / len(kept), 4),
+                         "retained_recall@5": round(float(np.mean(retained)), 4)}
+        calibration.append(row)
+
+    print(f"\n📐 Dinamik k kalibrasyonu (eşik {RETRIEVAL_MIN_SIMILARITY}, kırılma {RETRIEVAL_MIN_GAP}, ilk {args.top} sonuç)")
+    for row in calibration:
+        print(f"boyut {row['dim']}: ilk skor p10/p50/p90 {row['top1_p10_p50_p90']}, "
+              f"{args.top}. skor p10/p50/p90 {row[f'top{args.top}_p10_p50_p90']}")
+        for mode in ("threshold", "gap", "both"):
+            stats = row[mode]
+            print(f"   {mode:<9} ort. k {stats['mean_k']:>5.2f} | boş {stats['empty_ratio']:.2%} | k=1 {stats['k1_ratio']:.2%} "
+                  f"| korunan recall@5 {stats['retained_recall@5']:.4f}")
+
+if args.json:
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump({"model": embedding_model_name, "documents": len(documents), "queries": len(queries), "results": results,
+                   "calibration": calibration}, f, ensure_ascii=False, indent=2)
+    print(f"✅ Rapor yazıldı: {args.json}")
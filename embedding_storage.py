@@ -0,0 +1,148 @@
+"""Embedding'lerin düşük hassasiyetli (float16 / int8) ve düşük boyutlu (PCA) saklanması.
+
+Embedding'ler uçtan uca NumPy dizisi olarak taşınır (Python float listesine çevrilmez).
+
+    EMBEDDING_STORAGE_DTYPE  Derlenmiş dataset'teki ve oturum aday önbelleğindeki vektörlerin türü
+                             ("float32" | "float16" | "int8"; int8 satır başına float32 ölçekle saklanır)
+    EMBEDDING_PCA_DIM        0'dan büyükse korpus üzerinde PCA fit edilir ve vektör indeksine bu boyutta
+                             vektörler yazılır; sorgular aynı projeksiyondan geçer
+
+ChromaDB vektörleri her durumda float32 tutar; indeksin bellek ve kurulum maliyetini düşüren PCA'dır.
+Ayarların doğruluğa etkisi `python embedding_recall_report.py` ile ölçülebilir.
+"""
+import os
+
+import numpy as np
+
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+EMBEDDING_PCA_DIM = int(os.getenv("EMBEDDING_PCA_DIM", "0")) # 0: PCA kapalı
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+
+def normalize_rows(matrix):
+    """Satırları (veya tek vektörü) birim uzunluğa getirir; float32 döndürür."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+def quantize(matrix, dtype=EMBEDDING_STORAGE_DTYPE):
+    """Vektörleri saklama türüne çevirir; (kodlar, satır ölçekleri) döndürür (ölçek yalnızca int8'de var)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=-1) / 127.0
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scales[..., None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Desteklenmeyen saklama türü: {dtype} (seçenekler: {', '.join(STORAGE_DTYPES)})")
+
+
+def dequantize(codes, scales=None):
+    """Saklanan vektörleri float32'ye geri çevirir."""
+    matrix = np.asarray(codes).astype(np.float32)
+    if scales is not None:
+        matrix *= np.asarray(scales, dtype=np.float32)[..., None]
+    return matrix
+
+
+def quantized_scores(codes, scales, query):
+    """Saklanan vektörlerle sorgunun iç çarpımı (matris önceden float32'ye açılmaz)."""
+    scores = codes @ np.asarray(query, dtype=np.float32)
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def storage_nbytes(codes, scales=None):
+    return codes.nbytes + (scales.nbytes if scales is not None else 0)
+
+
+class PcaProjection:
+    """Korpus embedding'leri üzerinde fit edilen doğrusal boyut indirgeme (SVD ile)."""
+
+    def __init__(self, mean, components):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32) # (hedef boyut, kaynak boyut)
+
+    @classmethod
+    def fit(cls, matrix, dim):
+        """PCA en fazla min(doküman sayısı, kaynak boyut) bileşen üretebilir; istenen boyut buna kırpılır."""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        max_dim = min(matrix.shape[0], matrix.shape[1])
+        if dim > max_dim:
+            print(f"⚠️ PCA boyutu {dim} -> {max_dim} olarak kırpıldı (korpusta {matrix.shape[0]} doküman, "
+                  f"{matrix.shape[1]} boyut); daha büyük bir EMBEDDING_PCA_DIM etkisizdir.")
+            dim = max_dim
+        mean = matrix.mean(axis=0)
+        _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        return cls(mean, vt[:dim])
+
+    @property
+    def dim(self):
+        return self.components.shape[0]
+
+    def transform(self, matrix):
+        """Projeksiyon sonrası vektörler yeniden normalize edilir (kosinüs/L2 dönüşümü geçerli kalsın)."""
+        return normalize_rows((np.asarray(matrix, dtype=np.float32) - self.mean) @ self.components.T)
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, mean=self.mean, components=self.components)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as archive:
+            return cls(archive["mean"], archive["components"])
+
+
+class EmbeddingCodec:
+    """Vektör indeksine yazılan ve sorguda kullanılan embedding dönüşümü (isteğe bağlı PCA)."""
+
+    def __init__(self, dtype=EMBEDDING_STORAGE_DTYPE, pca_dim=EMBEDDING_PCA_DIM):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Desteklenmeyen saklama türü: {dtype} (seçenekler: {', '.join(STORAGE_DTYPES)})")
+        self.dtype = dtype
+        self.pca_dim = max(pca_dim, 0)
+        self.projection = None
+
+    @property
+    def index_key(self):
+        """İndeks içeriğini belirleyen ayar (koleksiyon adının özetine girer)."""
+        return f"pca{self.pca_dim}" if self.pca_dim else "full"
+
+    @property
+    def needs_projection(self):
+        return self.pca_dim > 0 and self.projection is None
+
+    def fit(self, matrix):
+        if self.pca_dim:
+            self.projection = PcaProjection.fit(matrix, self.pca_dim)
+            print(f"   - PCA: {np.asarray(matrix).shape[1]} -> {self.projection.dim} boyut.")
+
+    def load_projection(self, path):
+        """Kaydedilmiş projeksiyonu yükler; PCA kapalıysa veya dosya yoksa False."""
+        if not self.pca_dim or not os.path.exists(path):
+            return False
+        self.projection = PcaProjection.load(path)
+        return True
+
+    def save_projection(self, path):
+        if self.projection is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.projection.save(path)
+
+    def index_vectors(self, matrix):
+        """İndekse yazılacak (n, d) float32 matris."""
+        if self.projection is not None:
+            return self.projection.transform(matrix)
+        return np.asarray(matrix, dtype=np.float32)
+
+    def project_query(self, vector):
+        """Sorgu vektörünü indeksin uzayına taşır."""
+        if self.projection is not None:
+            return self.projection.transform(vector[None, :])[0]
+        return np.asarray(vector, dtype=np.float32)
@@ -0,0 +1,150 @@
+"""Veri setinin kesintisiz yeniden yüklenmesi (hot-reload).
+
+Her yükleme bir "nesil" (DataSnapshot) üretir: yer verisi, vektör koleksiyonu ve küçük resim indeksi
+birlikte tutulur. Yeni nesil arka planda tamamen hazırlanır, ardından tek bir atama ile yayınlanır.
+Devam eden istekler başladıkları nesli sonuna kadar kullanır; eski nesil son istek bitince bırakılır.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+HOT_RELOAD_POLL_SECONDS = float(os.getenv("HOT_RELOAD_POLL_SECONDS", "5")) # 0 ise dosya izleyici kapalı
+
+
+class DataSnapshot:
+    """Bir veri nesli: veri, koleksiyon ve küçük resim indeksi birlikte değişir."""
+
+    def __init__(self, generation, data, client, collection, thumbnails, fingerprint, source_signature, codec=None):
+        self.generation = generation
+        self.data = data
+        self.client = client
+        self.collection = collection
+        self.thumbnails = thumbnails
+        self.fingerprint = fingerprint
+        self.source_signature = source_signature
+        self.codec = codec # İndeks vektörlerinin dönüşümü (PCA); sorgular aynı dönüşümden geçer
+        self.created_at = time.time()
+        self.inflight = 0
+        self.retired = False
+
+    def close(self, drop_collection=False):
+        """Nesli bırakır: mmap'li dataset kapatılır, istenirse koleksiyon da silinir."""
+        if hasattr(self.data, "close"):
+            self.data.close()
+        if drop_collection:
+            try:
+                self.client.delete_collection(self.collection.name)
+            except Exception as e:
+                print(f"⚠️ Eski koleksiyon silinemedi ({self.collection.name}): {e}")
+
+
+class SnapshotManager:
+    """Güncel nesli yayınlar; istekler `acquire()` ile nesli sabitler."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = None
+
+    def current(self):
+        return self._current
+
+    @contextmanager
+    def acquire(self):
+        """İstek süresince aynı nesli kullanmak için; nesil yoksa None verir."""
+        with self._lock:
+            snapshot = self._current
+            if snapshot is not None:
+                snapshot.inflight += 1
+        try:
+            yield snapshot
+        finally:
+            if snapshot is not None:
+                with self._lock:
+                    snapshot.inflight -= 1
+                    drained = snapshot.retired and snapshot.inflight == 0
+                if drained:
+                    self._release(snapshot)
+
+    def publish(self, snapshot):
+        """Yeni nesli atomik olarak yayınlar; eski nesil boşaldığında bırakılır."""
+        with self._lock:
+            old = self._current
+            self._current = snapshot
+            drained = False
+            if old is not None:
+                old.retired = True
+                drained = old.inflight == 0
+        print(f"🔄 Veri nesli {snapshot.generation} yayında ({snapshot.fingerprint[:12]}).")
+        if drained:
+            self._release(old)
+
+    def _release(self, snapshot):
+        """Boşalan eski nesli bırakır; hatalar loglanır, `acquire()` içindeki isteğe yansıtılmaz."""
+        with self._lock:
+            current = self._current
+            # Aynı içerik yeniden yüklendiyse koleksiyon yeni nesil tarafından kullanılıyordur
+            drop = current is None or current.collection.name != snapshot.collection.name
+        try:
+            snapshot.close(drop_collection=drop)
+        except Exception as e:
+            print(f"🚨 Veri nesli {snapshot.generation} bırakılırken hata oluştu: {e}")
+            return
+        print(f"🧹 Veri nesli {snapshot.generation} bırakıldı.")
+
+
+def file_signature(paths):
+    """Dosyaların (mtime, boyut) imzası; olmayan dosyalar da imzaya girer."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class DatasetWatcher:
+    """Kaynak dosyaları periyodik olarak yoklar; değişiklik durulunca `on_change(sebep)` çağrılır."""
+
+    def __init__(self, paths_fn, on_change, interval=HOT_RELOAD_POLL_SECONDS):
+        self.paths_fn = paths_fn
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, initial_signature=None):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._last = initial_signature or file_signature(self.paths_fn())
+        self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+        self._thread.start()
+        print(f"👀 Veri dosyaları izleniyor ({self.interval:g} sn aralıkla).")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            try:
+                signature = file_signature(self.paths_fn())
+            except Exception as e:
+                print(f"⚠️ Veri dosyaları yoklanamadı: {e}")
+                continue
+            if signature == self._last:
+                pending = None
+                continue
+            # Dosya yazılırken tetiklememek için imza bir tur boyunca sabit kalmalı
+            if signature != pending:
+                pending = signature
+                continue
+            pending = None
+            try:
+                # on_change yeni neslin imzasını döndürür (yükleme sırasında gelen değişiklikler kaçmaz)
+                self._last = self.on_change("dosya değişikliği") or signature
+            except Exception as e:
+                self._last = signature
+                print(f"🚨 Yeniden yükleme başarısız: {e}")
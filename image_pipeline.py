@@ -0,0 +1,189 @@
+"""Yer görselleri için küçük resim (thumbnail) hattı.
+
+travel_routes.json'da geçen her görsel için yeniden boyutlandırılmış WebP küçük resimler üretir ve
+içerik adresli (kaynak içeriğin özetiyle adlandırılmış) bir önbellek klasöründe saklar. Dosya adı
+içerikle değiştiği için tarayıcıya uzun ömürlü önbellek başlıklarıyla güvenle sunulabilir.
+
+Klasör olduğu gibi herkese açık sunulduğu için manifest (kaynak yolları ve mtime'lar) klasörün
+dışında, yanındaki `<klasör>.manifest.json` dosyasında tutulur.
+
+Kullanım (derleme sırasında önceden üretmek için): python image_pipeline.py
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "thumbnail_cache") # Tüm uygulamalar bu ayarı okur
+THUMBNAIL_MAX_SIZE = int(os.getenv("THUMBNAIL_MAX_SIZE", "480")) # 2 sütunlu galeri için yeterli
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+MANIFEST_SUFFIX = ".manifest.json"
+LEGACY_MANIFEST_FILE = "manifest.json" # Eski sürümler manifest'i sunulan klasörün içine yazıyordu
+CACHE_CONTROL_HEADER = b"public, max-age=31536000, immutable"
+CONTENT_ADDRESSED_NAME = re.compile(r"/[0-9a-f]{24}\.webp$") # Yalnızca bu adlar içerikle değişir
+
+
+def iter_place_images(data):
+    """Veri setindeki (şehir, yer, görsel yolu) üçlülerini döndürür."""
+    for city, city_data in data.items():
+        for place, details in city_data.get("Places", {}).items():
+            image_path = details.get("image")
+            if image_path:
+                yield city, place, image_path
+
+
+def _content_key(source_bytes):
+    digest = hashlib.sha256(source_bytes)
+    digest.update(f"|{THUMBNAIL_MAX_SIZE}|{THUMBNAIL_QUALITY}|webp".encode())
+    return digest.hexdigest()[:24]
+
+
+def manifest_path_for(cache_dir):
+    """Manifest'in yolu: sunulan klasörün içinde değil, yanında."""
+    return os.path.normpath(os.path.abspath(cache_dir)) + MANIFEST_SUFFIX
+
+
+def _replace_atomically(target_path, write):
+    """`write(dosya)` ile benzersiz bir geçici dosyaya yazar ve hedefin üzerine taşır.
+
+    Aynı hedefi aynı anda üreten iş parçacıkları/süreçler birbirinin geçici dosyasını ezmez.
+    """
+    directory = os.path.dirname(os.path.abspath(target_path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=".", suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.unlink(tmp_path)
+            raise
+    os.replace(tmp_path, target_path)
+
+
+def _make_thumbnail(source_path, target_path):
+    from PIL import Image
+
+    with Image.open(source_path) as img:
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        img.thumbnail((THUMBNAIL_MAX_SIZE, THUMBNAIL_MAX_SIZE))
+        _replace_atomically(target_path, lambda f: img.save(f, "WEBP", quality=THUMBNAIL_QUALITY, method=4))
+        return img.size
+
+
+class ThumbnailIndex:
+    """Kaynak görsel yolu -> {"path", "width", "height"} eşlemesi; manifest sunulan klasörün dışında saklanır."""
+
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._manifest_path = manifest_path_for(cache_dir)
+        self._entries = {}
+        legacy_path = os.path.join(cache_dir, LEGACY_MANIFEST_FILE)
+        for path in (self._manifest_path, legacy_path):
+            if self._entries or not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        if os.path.exists(legacy_path):
+            try:
+                os.remove(legacy_path) # Herkese açık klasörde kaynak yollarını sızdırmasın
+            except OSError as e:
+                print(f"⚠️ Eski manifest silinemedi ({legacy_path}): {e}")
+
+    def _is_fresh(self, source_path, entry):
+        stat = os.stat(source_path)
+        return (entry.get("source_mtime") == stat.st_mtime and entry.get("source_size") == stat.st_size
+                and os.path.exists(entry["path"]))
+
+    def ensure(self, source_path):
+        """Görselin küçük resmini (gerekirse üreterek) döndürür; üretilemezse None."""
+        if not os.path.exists(source_path):
+            return None
+        with self._lock:
+            entry = self._entries.get(source_path)
+            if entry and self._is_fresh(source_path, entry):
+                return entry
+        with open(source_path, "rb") as f:
+            key = _content_key(f.read())
+        target_path = os.path.join(self.cache_dir, f"{key}.webp")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if os.path.exists(target_path):
+                from PIL import Image
+
+                with Image.open(target_path) as thumb:
+                    width, height = thumb.size
+            else:
+                width, height = _make_thumbnail(source_path, target_path)
+        except Exception as e:
+            print(f"🚨 Küçük resim üretilemedi ({source_path}): {e}")
+            return None
+        stat = os.stat(source_path)
+        entry = {"path": target_path, "width": width, "height": height,
+                 "source_mtime": stat.st_mtime, "source_size": stat.st_size}
+        with self._lock:
+            self._entries[source_path] = entry
+        return entry
+
+    def get(self, source_path):
+        """Önceden üretilmiş küçük resmi döndürür (yoksa üretmeyi dener)."""
+        with self._lock:
+            entry = self._entries.get(source_path)
+        if entry and os.path.exists(entry["path"]):
+            return entry
+        return self.ensure(source_path)
+
+    def build_all(self, data):
+        """Veri setindeki tüm görsellerin küçük resimlerini üretir ve manifest'i kaydeder."""
+        built = 0
+        for _, _, image_path in iter_place_images(data):
+            if self.ensure(image_path):
+                built += 1
+        self.save()
+        return built
+
+    def save(self):
+        os.makedirs(os.path.dirname(self._manifest_path), exist_ok=True)
+        with self._lock:
+            payload = json.dumps(self._entries, ensure_ascii=False, indent=1)
+        _replace_atomically(self._manifest_path, lambda f: f.write(payload.encode("utf-8")))
+
+
+class CacheHeadersMiddleware:
+    """Küçük resim klasöründen sunulan içerik adresli `*.webp` dosyalarına uzun ömürlü Cache-Control başlığı ekleyen ASGI ara katmanı."""
+
+    def __init__(self, app, path_fragment=None):
+        self.app = app
+        self.path_fragment = path_fragment or os.path.basename(os.path.normpath(THUMBNAIL_CACHE_DIR))
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or self.path_fragment not in path or not CONTENT_ADDRESSED_NAME.search(path):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_headers(message):
+            if message["type"] == "http.response.start" and message.get("status") == 200:
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"cache-control"]
+                headers.append((b"cache-control", CACHE_CONTROL_HEADER))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
+
+
+if __name__ == "__main__":
+    import time
+
+    start_time = time.time()
+    with open("travel_routes.json", "r", encoding="utf-8") as f:
+        routes = json.load(f)
+    index = ThumbnailIndex()
+    count = index.build_all(routes)
+    print(f"✅ {count} küçük resim hazır: {index.cache_dir} ({time.time() - start_time:.2f} saniye)")
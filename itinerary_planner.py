@@ -0,0 +1,391 @@
+"""Deterministik çok günlü gezi planlayıcısı.
+
+Bir şehrin yerlerini koordinatlarına göre dengeli günlük kümelere ayırır (dengeli k-means),
+her günü TSP sezgiseliyle (en yakın komşu + 2-opt) sıralar; ziyaret sürelerini ve
+yerlerin kapalı olduğu hafta günlerini dikkate alır.
+"""
+import datetime
+import itertools
+import math
+import re
+
+WEEKDAYS_TR = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]
+
+DEFAULT_VISIT_MINUTES = 90
+DAY_BUDGET_MINUTES = 9 * 60
+TRAVEL_SPEED_KMH = 15.0 # Şehir içi ortalama (yürüyüş + toplu taşıma)
+KMEANS_MAX_ITERATIONS = 25
+
+_WEEKDAY_PATTERN = "|".join(WEEKDAYS_TR)
+# "Pazartesi kapalı değildir" / "kapalı olmaz" gibi olumsuz ifadeler kapalı gün sayılmaz
+_CLOSED_PATTERN = re.compile(
+    rf"((?:(?:{_WEEKDAY_PATTERN})(?:\s*(?:,|ve|veya)\s*)?)+)\s*(?:günleri|günü)?\s*kapalı(?!\w*\s+(?:değil|olmaz|olmuyor))",
+    re.IGNORECASE,
+)
+
+
+# ====================================================
+# >>> Yardımcı Fonksiyonlar <<<
+# ====================================================
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """İki koordinat arasındaki büyük daire mesafesini (km) döndürür."""
+    r = 6371.0
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+def weekday_index(value):
+    """'Salı' gibi bir gün adını veya 0-6 sayısını hafta günü indeksine çevirir (0=Pazartesi)."""
+    if isinstance(value, int):
+        if 0 <= value < 7:
+            return value
+        raise ValueError(f"Geçersiz hafta günü: {value}")
+    for i, name in enumerate(WEEKDAYS_TR):
+        if name.casefold() == str(value).strip().casefold():
+            return i
+    raise ValueError(f"Geçersiz hafta günü: {value}")
+
+
+def parse_closed_weekdays(text):
+    """'Salı günleri kapalıdır' gibi ifadelerden kapalı olunan hafta günlerini çıkarır."""
+    closed = set()
+    if not text:
+        return closed
+    for match in _CLOSED_PATTERN.finditer(text):
+        for i, name in enumerate(WEEKDAYS_TR):
+            if re.search(rf"\b{name}\b", match.group(1), re.IGNORECASE):
+                closed.add(i)
+    return closed
+
+
+def places_from_city(city_data, names=None):
+    """Şehir verisinden planlayıcının beklediği yer kayıtlarını üretir.
+
+    `names` verilirse yalnızca o yerler (verilen sırayla) alınır. İsteğe bağlı
+    'visit_minutes' ve 'closed_days' alanları ile ipuçlarındaki kapalı gün bilgisi okunur.
+    """
+    places_data = city_data.get("Places", {}) if city_data else {}
+    selected = names if names is not None else list(places_data.keys())
+    places = []
+    for name in selected:
+        details = places_data.get(name)
+        if details is None:
+            continue
+        closed = parse_closed_weekdays(details.get("tips"))
+        closed.update(weekday_index(d) for d in details.get("closed_days", []) or [])
+        places.append({
+            "name": name,
+            "latitude": details.get("latitude"),
+            "longitude": details.get("longitude"),
+            "visit_minutes": details.get("visit_minutes") or DEFAULT_VISIT_MINUTES,
+            "closed_weekdays": closed,
+        })
+    return places
+
+
+# ====================================================
+# >>> Kümeleme (Dengeli k-means) <<<
+# ====================================================
+
+def _project(places):
+    """Koordinatları km cinsinden yerel düzleme izdüşürür (küçük alanlarda yeterince doğru)."""
+    mean_lat = sum(p["latitude"] for p in places) / len(places)
+    kx = 111.32 * math.cos(math.radians(mean_lat))
+    return [(p["longitude"] * kx, p["latitude"] * 110.57) for p in places]
+
+
+def _sq_dist(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2
+
+
+def _initial_centroids(points, k):
+    """Deterministik en uzak nokta başlatması (k-means++'ın rastgelesiz hali)."""
+    cx = sum(p[0] for p in points) / len(points)
+    cy = sum(p[1] for p in points) / len(points)
+    first = max(range(len(points)), key=lambda i: _sq_dist(points[i], (cx, cy)))
+    chosen = [first]
+    while len(chosen) < k:
+        nxt = max(range(len(points)), key=lambda i: min(_sq_dist(points[i], points[c]) for c in chosen))
+        chosen.append(nxt)
+    return [points[i] for i in chosen]
+
+
+def _balanced_assign(points, centroids, capacity):
+    """Her kümeye en fazla `capacity` nokta düşecek şekilde açgözlü atama yapar."""
+    pairs = sorted(
+        (_sq_dist(p, c), i, j) for i, p in enumerate(points) for j, c in enumerate(centroids)
+    )
+    assignment = [None] * len(points)
+    load = [0] * len(centroids)
+    for _, i, j in pairs:
+        if assignment[i] is None and load[j] < capacity:
+            assignment[i] = j
+            load[j] += 1
+    return assignment
+
+
+def balanced_kmeans(points, k):
+    """Noktaları yaklaşık eşit büyüklükte k kümeye ayırır; küme indekslerini döndürür."""
+    if k <= 1:
+        return [0] * len(points)
+    capacity = math.ceil(len(points) / k)
+    centroids = _initial_centroids(points, k)
+    assignment = None
+    for _ in range(KMEANS_MAX_ITERATIONS):
+        new_assignment = _balanced_assign(points, centroids, capacity)
+        if new_assignment == assignment:
+            break
+        assignment = new_assignment
+        for j in range(k):
+            members = [points[i] for i in range(len(points)) if assignment[i] == j]
+            if members:
+                centroids[j] = (sum(p[0] for p in members) / len(members),
+                                sum(p[1] for p in members) / len(members))
+    return assignment
+
+
+# ====================================================
+# >>> Günlük Sıralama (TSP Sezgiseli) <<<
+# ====================================================
+
+def _path_length(order, dist):
+    return sum(dist[order[i]][order[i + 1]] for i in range(len(order) - 1))
+
+
+def order_day(places):
+    """Bir günün yerlerini toplam yolu kısaltacak şekilde sıralar (açık yol TSP)."""
+    n = len(places)
+    if n <= 2:
+        return list(places)
+    dist = [[haversine_km(a["latitude"], a["longitude"], b["latitude"], b["longitude"]) for b in places]
+            for a in places]
+
+    # Her başlangıç noktasından en yakın komşu; en kısa olanı al
+    best_order, best_length = None, float("inf")
+    for start in range(n):
+        order = [start]
+        remaining = set(range(n)) - {start}
+        while remaining:
+            nxt = min(remaining, key=lambda j: (dist[order[-1]][j], j))
+            order.append(nxt)
+            remaining.remove(nxt)
+        length = _path_length(order, dist)
+        if length < best_length:
+            best_order, best_length = order, length
+
+    # 2-opt iyileştirmesi
+    improved = True
+    while improved:
+        improved = False
+        for i in range(0, n - 1):
+            for j in range(i + 1, n):
+                candidate = best_order[:i] + best_order[i:j + 1][::-1] + best_order[j + 1:]
+                length = _path_length(candidate, dist)
+                if length + 1e-9 < best_length:
+                    best_order, best_length = candidate, length
+                    improved = True
+    return [places[i] for i in best_order]
+
+
+# ====================================================
+# >>> Planlayıcı <<<
+# ====================================================
+
+def _travel_minutes(km):
+    return km / TRAVEL_SPEED_KMH * 60
+
+
+def _route_minutes(ordered):
+    """Sıralanmış bir günün ziyaret + yol süresi."""
+    km = sum(haversine_km(a["latitude"], a["longitude"], b["latitude"], b["longitude"])
+             for a, b in zip(ordered, ordered[1:]))
+    return sum(p["visit_minutes"] for p in ordered) + _travel_minutes(km)
+
+
+def _insertion_minutes(ordered, place):
+    """Yeri sıralı güne en ucuz noktadan eklemenin ek süresi; günü yeniden sıralamanın O(n) tahmini."""
+    if not ordered:
+        return place["visit_minutes"]
+    to_place = [haversine_km(p["latitude"], p["longitude"], place["latitude"], place["longitude"]) for p in ordered]
+    best_km = min(to_place[0], to_place[-1])
+    for i, (a, b) in enumerate(zip(ordered, ordered[1:])):
+        leg = haversine_km(a["latitude"], a["longitude"], b["latitude"], b["longitude"])
+        best_km = min(best_km, to_place[i] + to_place[i + 1] - leg)
+    return place["visit_minutes"] + _travel_minutes(best_km)
+
+
+def _best_day_permutation(clusters, weekdays):
+    """Kümeleri günlere, kapalı gün çakışması en az olacak şekilde eşler."""
+    k = len(clusters)
+
+    def conflicts(perm):
+        return sum(1 for day, c in enumerate(perm) for p in clusters[c] if weekdays[day] in p["closed_weekdays"])
+
+    if k > 7:
+        return list(range(k))
+    return list(min(itertools.permutations(range(k)), key=conflicts))
+
+
+def plan_itinerary(places, num_days=3, start_weekday=None, day_budget_minutes=DAY_BUDGET_MINUTES):
+    """Yerleri `num_days` güne dağıtıp sıralar ve yapılandırılmış bir plan döndürür.
+
+    Dönen sözlük: {"start_weekday", "days": [{"day", "weekday", "places", "distance_km",
+    "visit_minutes", "travel_minutes", "total_minutes", "over_budget"}], "unscheduled": [...]}
+    """
+    if start_weekday is None:
+        start_weekday = datetime.date.today().weekday()
+    weekdays = [(start_weekday + d) % 7 for d in range(max(num_days, 1))]
+
+    unscheduled = []
+    located = []
+    for p in places:
+        if isinstance(p.get("latitude"), (int, float)) and isinstance(p.get("longitude"), (int, float)):
+            located.append(p)
+        else:
+            unscheduled.append({"name": p["name"], "reason": "Koordinat bilgisi yok"})
+    for p in list(located):
+        if len(p["closed_weekdays"] & set(weekdays)) == len(set(weekdays)):
+            located.remove(p)
+            unscheduled.append({"name": p["name"], "reason": "Plan günlerinin hepsinde kapalı"})
+
+    k = min(max(num_days, 1), len(located))
+    clusters = [[] for _ in range(max(num_days, 1))]
+    if located:
+        points = _project(located)
+        assignment = balanced_kmeans(points, k)
+        groups = [[located[i] for i in range(len(located)) if assignment[i] == j] for j in range(k)]
+        groups += [[] for _ in range(len(clusters) - k)]
+        perm = _best_day_permutation(groups, weekdays)
+        clusters = [groups[c] for c in perm]
+
+        def centroid(day_places):
+            pts = _project(day_places) if day_places else []
+            return (sum(x for x, _ in pts) / len(pts), sum(y for _, y in pts) / len(pts)) if pts else None
+
+        def nearest_open_day(place, exclude):
+            point = _project([place])[0]
+            options = []
+            for day, day_places in enumerate(clusters):
+                if day == exclude or weekdays[day] in place["closed_weekdays"]:
+                    continue
+                c = centroid(day_places)
+                options.append((_sq_dist(point, c) if c else float("inf"), day))
+            return min(options)[1] if options else None
+
+        # Kapalı güne düşen yerleri, açık oldukları en yakın güne taşı
+        for day in range(len(clusters)):
+            for place in list(clusters[day]):
+                if weekdays[day] in place["closed_weekdays"]:
+                    target = nearest_open_day(place, day)
+                    clusters[day].remove(place)
+                    clusters[target].append(place)
+
+        # Süre bütçesini aşan günlerden, bütçesi uygun ve açık olan komşu günlere yer aktar.
+        # Gün sıraları ve süreleri önbellekte tutulur: aday gün araya ekleme tahminiyle denenir,
+        # yalnızca aktarımın değiştirdiği iki gün yeniden sıralanır (order_day her çağrıda O(n³)).
+        orders = [order_day(day_places) for day_places in clusters]
+        costs = [_route_minutes(order) for order in orders]
+
+        def update_day(day):
+            orders[day] = order_day(clusters[day])
+            costs[day] = _route_minutes(orders[day])
+
+        for _ in range(len(located)):
+            over = [d for d in range(len(clusters)) if clusters[d] and costs[d] > day_budget_minutes]
+            if not over:
+                break
+            moved = False
+            for day in over:
+                c = centroid(clusters[day])
+                for place in sorted(clusters[day], key=lambda p: -_sq_dist(_project([p])[0], c)):
+                    target = nearest_open_day(place, day)
+                    if target is not None and costs[target] + _insertion_minutes(orders[target], place) <= day_budget_minutes:
+                        clusters[day].remove(place)
+                        clusters[target].append(place)
+                        update_day(day)
+                        update_day(target)
+                        moved = True
+                        break
+                if moved:
+                    break
+            if not moved:
+                break
+
+    return {"start_weekday": WEEKDAYS_TR[start_weekday], "days": _itinerary_days(clusters, weekdays, day_budget_minutes),
+            "unscheduled": unscheduled}
+
+
+def plan_grouped_itinerary(day_groups, start_weekday=None, day_budget_minutes=DAY_BUDGET_MINUTES):
+    """Günlere önceden bölünmüş yerlerin (ör. modelin gruplaması) gruplamasını koruyup yalnızca gün içi sırayı belirler.
+
+    Bir yerin koordinatı yoksa ya da kendi gününde kapalıysa gruplama geçersizdir ve None döner
+    (çağıran taraf `plan_itinerary` ile yeniden gruplar). Dönen sözlük `plan_itinerary` ile aynı biçimdedir.
+    """
+    if start_weekday is None:
+        start_weekday = datetime.date.today().weekday()
+    weekdays = [(start_weekday + d) % 7 for d in range(len(day_groups))]
+    for day, day_places in enumerate(day_groups):
+        for p in day_places:
+            if not isinstance(p.get("latitude"), (int, float)) or not isinstance(p.get("longitude"), (int, float)):
+                return None
+            if weekdays[day] in p["closed_weekdays"]:
+                return None
+    return {"start_weekday": WEEKDAYS_TR[start_weekday], "days": _itinerary_days(day_groups, weekdays, day_budget_minutes),
+            "unscheduled": []}
+
+
+def _itinerary_days(clusters, weekdays, day_budget_minutes):
+    """Gün kümelerini sıralayıp mesafe/süre bilgileriyle plan günlerine çevirir."""
+    days = []
+    for day, day_places in enumerate(clusters):
+        ordered = order_day(day_places)
+        stops = []
+        distance_km = 0.0
+        for i, p in enumerate(ordered):
+            leg = 0.0
+            if i:
+                prev = ordered[i - 1]
+                leg = haversine_km(prev["latitude"], prev["longitude"], p["latitude"], p["longitude"])
+            distance_km += leg
+            stops.append({
+                "name": p["name"],
+                "latitude": p["latitude"],
+                "longitude": p["longitude"],
+                "visit_minutes": p["visit_minutes"],
+                "leg_km": round(leg, 2),
+            })
+        visit_minutes = sum(s["visit_minutes"] for s in stops)
+        travel_minutes = round(_travel_minutes(distance_km))
+        days.append({
+            "day": day + 1,
+            "weekday": WEEKDAYS_TR[weekdays[day]],
+            "places": stops,
+            "distance_km": round(distance_km, 2),
+            "visit_minutes": visit_minutes,
+            "travel_minutes": travel_minutes,
+            "total_minutes": visit_minutes + travel_minutes,
+            "over_budget": visit_minutes + travel_minutes > day_budget_minutes,
+        })
+    return days
+
+
+def format_itinerary_markdown(itinerary, city):
+    """Yapılandırılmış planı arayüz için Markdown metnine çevirir."""
+    lines = [f"**🗺️ {city} için Önerilen {len(itinerary['days'])} Günlük Rota**"]
+    for day in itinerary["days"]:
+        if not day["places"]:
+            continue
+        hours, minutes = divmod(day["total_minutes"], 60)
+        warning = " ⚠️ Yoğun gün" if day["over_budget"] else ""
+        lines.append(f"\n**{day['day']}. Gün ({day['weekday']})** — {day['distance_km']} km, ~{hours} sa {minutes} dk{warning}")
+        for i, stop in enumerate(day["places"]):
+            lines.append(f"{i + 1}. {stop['name']}")
+    if itinerary["unscheduled"]:
+        lines.append("\n**Plana eklenemeyen yerler:**")
+        for item in itinerary["unscheduled"]:
+            lines.append(f"- {item['name']} ({item['reason']})")
+    return "\n".join(lines) + "\n"
@@ -1,18 +1,28 @@
+import argparse
 import os
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from model_catalog import ModelCatalog, MODEL_CATALOG_STUB
+
+parser = argparse.ArgumentParser(description="Kullanılabilir Gemini modellerini listeler (yerel katalog önbelleğinden).")
+parser.add_argument("--refresh", action="store_true", help="Yenileme aralığını beklemeden API'den yeniden çek")
+args = parser.parse_args()
+
 # .env dosyasını yükle
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 
-if not API_KEY:
+if not API_KEY and not MODEL_CATALOG_STUB:
     raise ValueError("🚨 GOOGLE_API_KEY .env dosyasında bulunamadı!")
 
 # API key ile konfigürasyon
-genai.configure(api_key=API_KEY)
+if API_KEY:
+    genai.configure(api_key=API_KEY)
 
-# Kullanılabilir modelleri listele
-models = genai.list_models()
+# Kullanılabilir modelleri listele (katalog dosyası güncelse API çağrılmaz)
+catalog = ModelCatalog()
+models = catalog.refresh(force=args.refresh)
 for m in models:
-    print(m)
\ No newline at end of file
+    methods = ", ".join(m["supported_generation_methods"])
+    print(f"{m['name']:<45} girdi: {m['input_token_limit']:>8} | çıktı: {m['output_token_limit']:>6} | {methods}")
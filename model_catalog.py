@@ -0,0 +1,264 @@
+"""Gemini model kataloğu (yerel önbellekli) ve istek başına model yönlendirici.
+
+Katalog `genai.list_models()` sonucunu diske yazar ve yenileme aralığı dolana kadar oradan okur.
+API yalnızca açılışta (`start`) ve arka plandaki yenileme zamanlayıcısında çağrılır; model seçimi
+(`ModelRouter.choose`) yalnızca bellekteki listeyi okur ve ağı hiç beklemez.
+Yönlendirici isteğin türüne (rota / ipucu / genel soru) ve bağlam büyüklüğüne göre hafif veya
+güçlü modeli seçer; modellerin ölçülen gecikme ve hata oranları kararı etkiler.
+Testlerde `list_models_fn` yerine yerel bir sahte fonksiyon (ör. `stub_list_models`) verilebilir;
+MODEL_CATALOG_STUB=1 ile API'ye hiç gidilmez.
+"""
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+MODEL_CATALOG_FILE = os.getenv("MODEL_CATALOG_FILE", "model_catalog.json")
+MODEL_CATALOG_REFRESH_HOURS = float(os.getenv("MODEL_CATALOG_REFRESH_HOURS", "24"))
+MODEL_CATALOG_STUB = os.getenv("MODEL_CATALOG_STUB", "0") == "1"
+
+STRONG_MODEL = os.getenv("STRONG_MODEL", "gemini-2.5-flash")
+LIGHT_MODEL = os.getenv("LIGHT_MODEL", "gemini-2.5-flash-lite")
+LIGHT_CONTEXT_TOKEN_LIMIT = int(os.getenv("LIGHT_CONTEXT_TOKEN_LIMIT", "3000")) # Bu boyutun üstündeki bağlamlar güçlü modele
+LATENCY_BUDGET_SECONDS = float(os.getenv("MODEL_LATENCY_BUDGET_SECONDS", "20"))
+ERROR_RATE_LIMIT = 0.5
+MIN_SAMPLES_FOR_HEALTH = 5
+EWMA_ALPHA = 0.2
+PROBE_INTERVAL_SECONDS = 60 # Sağlıksız model bu süre sonra tekrar denenir (toparlandıysa istatistik düzelir)
+
+INTENT_ROUTE = "route"
+INTENT_TIP = "tip"
+INTENT_QA = "qa"
+
+_TIP_PATTERN = re.compile(r"\b(ipucu|ipuçları|tavsiye|bilet|saat|ne zaman|açık mı|kapalı mı|giriş)\b", re.IGNORECASE)
+
+# API'ye ulaşılamadığında ve katalog dosyası da yoksa kullanılan asgari liste
+FALLBACK_MODELS = [
+    {"name": STRONG_MODEL, "input_token_limit": 1048576, "output_token_limit": 65536,
+     "supported_generation_methods": ["generateContent", "countTokens"]},
+]
+
+
+def stub_list_models():
+    """`genai.list_models()` yerine geçen yerel sahte liste (testler ve çevrimdışı çalışma için)."""
+    methods = ["generateContent", "countTokens", "createCachedContent"]
+    return [
+        SimpleNamespace(name=f"models/{STRONG_MODEL}", display_name=STRONG_MODEL, input_token_limit=1048576,
+                        output_token_limit=65536, supported_generation_methods=methods),
+        SimpleNamespace(name=f"models/{LIGHT_MODEL}", display_name=LIGHT_MODEL, input_token_limit=1048576,
+                        output_token_limit=65536, supported_generation_methods=methods),
+        SimpleNamespace(name="models/text-embedding-004", display_name="Text Embedding 004", input_token_limit=2048,
+                        output_token_limit=1, supported_generation_methods=["embedContent"]),
+    ]
+
+
+def estimate_tokens(text):
+    """Kaba token tahmini (≈ 4 karakter / token); yönlendirme kararı için yeterli."""
+    return len(text) // 4 + 1
+
+
+def classify_intent(user_question, is_route_request):
+    """İsteği rota, tek yer ipucu veya genel soru olarak sınıflandırır."""
+    if is_route_request:
+        return INTENT_ROUTE
+    if len(user_question) <= 120 and _TIP_PATTERN.search(user_question):
+        return INTENT_TIP
+    return INTENT_QA
+
+
+def _model_to_dict(model):
+    name = getattr(model, "name", "")
+    return {
+        "name": name.split("/", 1)[1] if name.startswith("models/") else name,
+        "display_name": getattr(model, "display_name", ""),
+        "input_token_limit": getattr(model, "input_token_limit", 0),
+        "output_token_limit": getattr(model, "output_token_limit", 0),
+        "supported_generation_methods": list(getattr(model, "supported_generation_methods", [])),
+    }
+
+
+class ModelCatalog:
+    """Kullanılabilir modellerin diskte önbelleklenen listesi."""
+
+    def __init__(self, path=MODEL_CATALOG_FILE, refresh_hours=MODEL_CATALOG_REFRESH_HOURS, list_models_fn=None):
+        self.path = path
+        self.refresh_seconds = refresh_hours * 3600
+        self._list_models_fn = list_models_fn or (stub_list_models if MODEL_CATALOG_STUB else None)
+        self._lock = threading.Lock() # yalnızca bellekteki listeyi korur; ağ çağrısı sırasında tutulmaz
+        self._refresh_lock = threading.Lock() # aynı anda tek yenileme
+        self._models = None
+        self._loaded = False
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0 # son API denemesi (başarısız olsa da); yenileme aralığı buna göre beklenir
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _fetch(self):
+        list_models_fn = self._list_models_fn
+        if list_models_fn is None:
+            import google.generativeai as genai
+            list_models_fn = genai.list_models
+        return [_model_to_dict(m) for m in list_models_fn()]
+
+    def _load_from_disk(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            return payload["models"], payload["fetched_at"]
+        except (OSError, ValueError, KeyError):
+            return None, 0.0
+
+    def _save_to_disk(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self._fetched_at, "models": self._models}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def _ensure_loaded(self):
+        # Çağıran self._lock'u tutar
+        if not self._loaded:
+            self._loaded = True
+            self._models, self._fetched_at = self._load_from_disk()
+
+    def _seconds_until_due(self):
+        with self._lock:
+            self._ensure_loaded()
+            if self._models is None and not self._attempted_at:
+                return 0.0
+            last = max(self._fetched_at, self._attempted_at)
+            return last + self.refresh_seconds - time.time()
+
+    def refresh(self, force=True):
+        """Model listesini API'den yeniden çeker ve diske yazar; başarısızsa mevcut listeyi korur.
+
+        `force=False` iken son denemeden (başarısız olsa da) bu yana yenileme aralığı dolmadıysa API'ye
+        gidilmez. Ağ çağrısı sırasında liste kilidi tutulmaz; `models()` eski listeyi okumaya devam eder.
+        """
+        with self._refresh_lock:
+            if not force and self._seconds_until_due() > 0:
+                return self.models()
+            with self._lock:
+                self._attempted_at = time.time()
+            try:
+                models = self._fetch()
+            except Exception as e:
+                print(f"⚠️ Model listesi alınamadı, önbellekteki katalog kullanılıyor "
+                      f"({self.refresh_seconds / 3600:g} saat sonra tekrar denenecek): {e}")
+                return self.models()
+            with self._lock:
+                self._models = models
+                self._fetched_at = time.time()
+                try:
+                    self._save_to_disk()
+                except OSError as e:
+                    print(f"⚠️ Model kataloğu diske yazılamadı: {e}")
+            print(f"✅ Model kataloğu yenilendi ({len(models)} model).")
+            return models
+
+    def start(self):
+        """Açılışta gerekirse kataloğu yeniler ve yenileme zamanlayıcısını arka planda başlatır."""
+        self.refresh(force=False)
+        if self._thread is None and self.refresh_seconds > 0:
+            self._thread = threading.Thread(target=self._run, name="model-catalog-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(max(1.0, self._seconds_until_due())):
+            try:
+                self.refresh(force=False)
+            except Exception as e:
+                print(f"⚠️ Model kataloğu yenilenemedi: {e}")
+
+    def models(self):
+        """Katalogdaki modelleri döndürür; API'ye hiç gitmez (liste yoksa asgari yedek liste)."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._models if self._models is not None else FALLBACK_MODELS
+
+    def get(self, model_name):
+        for model in self.models():
+            if model["name"] == model_name:
+                return model
+        return None
+
+    def supports(self, model_name, context_tokens=0):
+        """Model katalogda var mı, generateContent destekliyor mu ve bağlamı sığdırabiliyor mu?"""
+        model = self.get(model_name)
+        if model is None or "generateContent" not in model["supported_generation_methods"]:
+            return False
+        return not model["input_token_limit"] or context_tokens <= model["input_token_limit"]
+
+
+class ModelStats:
+    """Model başına gecikme (EWMA) ve hata oranı istatistikleri."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, model_name, latency_seconds, ok):
+        with self._lock:
+            s = self._stats.setdefault(model_name, {"requests": 0, "errors": 0, "ewma_latency": None, "ewma_error": 0.0, "last_call_at": 0.0})
+            s["requests"] += 1
+            s["last_call_at"] = time.time()
+            if not ok:
+                s["errors"] += 1
+            s["ewma_error"] = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * s["ewma_error"]
+            if ok:
+                prev = s["ewma_latency"]
+                s["ewma_latency"] = latency_seconds if prev is None else EWMA_ALPHA * latency_seconds + (1 - EWMA_ALPHA) * prev
+
+    def get(self, model_name):
+        with self._lock:
+            return dict(self._stats.get(model_name, {}))
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
+
+    def is_healthy(self, model_name):
+        s = self.get(model_name)
+        if not s or s["requests"] < MIN_SAMPLES_FOR_HEALTH:
+            return True
+        if time.time() - s["last_call_at"] > PROBE_INTERVAL_SECONDS:
+            return True
+        if s["ewma_error"] > ERROR_RATE_LIMIT:
+            return False
+        return s["ewma_latency"] is None or s["ewma_latency"] <= LATENCY_BUDGET_SECONDS
+
+
+class ModelRouter:
+    """İstek türü ve bağlam boyutuna göre model seçer."""
+
+    def __init__(self, catalog, stats=None, strong_model=STRONG_MODEL, light_model=LIGHT_MODEL):
+        self.catalog = catalog
+        self.stats = stats or ModelStats()
+        self.strong_model = strong_model
+        self.light_model = light_model
+
+    def candidates(self, intent, context_tokens):
+        """Tercih sırasına göre aday modeller."""
+        if intent == INTENT_ROUTE:
+            return [self.strong_model]
+        if intent == INTENT_TIP or context_tokens <= LIGHT_CONTEXT_TOKEN_LIMIT:
+            return [self.light_model, self.strong_model]
+        return [self.strong_model, self.light_model]
+
+    def choose(self, intent, context_tokens):
+        """Uygun ve sağlıklı ilk adayı seçer; hiçbiri sağlıklı değilse hata oranı en düşük olanı."""
+        candidates = [m for m in self.candidates(intent, context_tokens) if self.catalog.supports(m, context_tokens)]
+        if not candidates:
+            return self.strong_model
+        for model_name in candidates:
+            if self.stats.is_healthy(model_name):
+                return model_name
+        return min(candidates, key=lambda m: self.stats.get(m).get("ewma_error", 0.0))
+
+    def record(self, model_name, latency_seconds, ok):
+        self.stats.record(model_name, latency_seconds, ok)
+
@@ -0,0 +1,307 @@
+"""Prompt şablonları: sabit talimatlar system instruction'a, değişken kısımlar kısa kullanıcı mesajına.
+
+Sabit önek (ve rota isteklerinde şehrin "Genel Plan" dokümanı) destekleniyorsa Gemini
+context caching ile önbelleğe alınır; desteklenmiyorsa (ör. minimum token sınırının altında)
+normal system instruction'lı modele sessizce geri dönülür.
+"""
+import datetime
+import json
+import os
+import threading
+
+import google.generativeai as genai
+from google.generativeai import caching
+
+from model_catalog import estimate_tokens
+
+PROMPT_CACHE_TTL_MINUTES = int(os.getenv("PROMPT_CACHE_TTL_MINUTES", "60"))
+# Gemini'nin önbelleğe aldığı en küçük önek (2.5 Flash için 1024 token); altındaki önekler için API'ye gidilmez
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+PROMPT_TOKEN_AUDIT = os.getenv("PROMPT_TOKEN_AUDIT", "1") == "1" # Her şablon türü için bir kez, arka planda token ölçümü
+ROUTE_STRUCTURED_OUTPUT = os.getenv("ROUTE_STRUCTURED_OUTPUT", "1") == "1" # Rota planı JSON şemasıyla istenir
+ROUTE_MAX_DAYS = 14 # Modelin planladığı gün sayısı bu sınırda kesilir
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+NO_ANSWER_MESSAGE = "Bu konuda sağlanan bilgiler arasında detay bulamadım."
+
+QA_SYSTEM_INSTRUCTION = f"""Sen yardımsever bir seyahat asistanısın. Sadece sana verilen bağlamı (context) kullanarak kullanıcının sorusunu cevapla.
+Bağlam; şehirler hakkında günlük planlar, aktivite kategorileri (Kültür, Doğa vb.) ve önemli yerler hakkında detaylar (açıklama, ipucu) içerir.
+Sana verilen bağlamda 10 farklı şehirden alakasız bilgiler olabilir. Sen sadece kullanıcının sorusuyla ilgili olan parçaları dikkate al.
+Örneğin, soru "Eiffel Kulesi" hakkında ise, bağlamdaki "Topkapı Sarayı" veya "Galata Kulesi" bilgilerini dikkate alma.
+Sadece soruyla ilgili bilgileri kullanarak cevap üret.
+Eğer cevap bağlamda açıkça yoksa, kibarca '{NO_ANSWER_MESSAGE}' de. Tahmin yürütme.
+Cevabını Türkçe ver."""
+
+ROUTE_SYSTEM_INSTRUCTION = """Sen son derece organize bir seyahat planlayıcısısın. Kullanıcının isteği doğrultusunda, sadece belirtilen şehir için en verimli 3 günlük gezi rotasını oluştur.
+Planı oluştururken, sana sağlanan bağlamdaki yerleri kullan ve rotayı mantıksal bir sıraya koy.
+**Çıktı Formatı (ÇOK ÖNEMLİ):**
+Cevabının tamamı, her gün için bir ana fikir cümlesi ve ardından o gün yapılacak aktivitelerin **SIRALI LİSTESİ** olmalıdır.
+**Planın tamamını TEK BİR METİN BLOKU** olarak oluştur.
+
+ÖRNEK ÇIKTI FORMATI (Kopyalama yapma, kendi planını oluştur):
+"Paris'te ilk gün Eyfel Kulesi çevresindeki aktivitelerle başlıyoruz. Ardından Seine Nehri'ne geçilecek.
+1. Gün: Eiffel Kulesi. Trocadéro Bahçeleri. Seine Nehri Turu.
+2. Gün: Louvre Müzesi. Notre Dame Katedrali'ni dışarıdan görerek Montmartre'a geçeceğiz.
+3. Gün: Champs-Élysées'de yürüyüş. Arc de Triomphe'u ziyaret. Luxembourg Bahçeleri'nde mola.\""""
+
+ROUTE_JSON_SYSTEM_INSTRUCTION = """Sen son derece organize bir seyahat planlayıcısısın. Kullanıcının isteği doğrultusunda, sadece belirtilen şehir için gezi planı oluştur.
+Yalnızca "Aday Yerler" listesindeki ID'leri kullan; listede olmayan bir yer ekleme. Gün sayısı belirtilmemişse 3 gün planla.
+Her gün için kısa bir tema ve o gün gezilecek yerlerin ID'lerini ziyaret sırasıyla ver; aynı yeri birden fazla güne koyma.
+"summary" alanına planı özetleyen tek bir Türkçe cümle yaz."""
+
+SYSTEM_INSTRUCTIONS = {"qa": QA_SYSTEM_INSTRUCTION, "route": ROUTE_SYSTEM_INSTRUCTION, "route_json": ROUTE_JSON_SYSTEM_INSTRUCTION}
+
+
+# ====================================================
+# >>> Şablonlar <<<
+# ====================================================
+
+def build_context(documents, exclude=()):
+    """Bağlam parçalarını tekrarsız birleştirir; önbellekteki (exclude) parçaları tekrar göndermez."""
+    excluded = set(exclude)
+    unique_docs = [doc for doc in dict.fromkeys(documents) if doc not in excluded]
+    return CONTEXT_SEPARATOR.join(unique_docs) if unique_docs else "Bilgi bulunamadı."
+
+
+def build_qa_prompt(context, user_question, previous_questions=()):
+    """Soru-cevap isteği için kullanıcı mesajı (takip sorularında önceki sorular da eklenir)."""
+    history = ""
+    if previous_questions:
+        history = "Önceki Sorular (yalnızca takip sorusunu anlamak için):\n" + "\n".join(f"- {q}" for q in previous_questions) + "\n\n"
+    return f"""{history}Bağlam (Context):
+{context}
+
+Soru (Question):
+{user_question}
+
+Cevap (Türkçe): """
+
+
+def build_route_prompt(city, context, user_question):
+    """Rota isteği için kullanıcı mesajı (sabit talimatlar system instruction'dadır)."""
+    return f"""Şehir: {city}
+
+Bağlam (Context):
+{context}
+
+Soru (Question):
+{user_question}
+
+{city} Şehri İçin 3 Günlük Gezi Planı (Sıralı Metin): """
+
+
+def build_route_json_prompt(city, candidates, context, user_question):
+    """Yapılandırılmış rota isteği için kullanıcı mesajı; `candidates` ID -> yer adı eşlemesidir."""
+    candidate_lines = "\n".join(f"- {place_id}: {name}" for place_id, name in candidates.items())
+    return f"""Şehir: {city}
+
+Aday Yerler (ID: Yer):
+{candidate_lines}
+
+Bağlam (Context):
+{context}
+
+Soru (Question):
+{user_question}"""
+
+
+def build_legacy_prompt(kind, city, context, user_question):
+    """Eski tek parça (talimat + bağlam + soru) prompt; yalnızca token karşılaştırması için."""
+    kind = "route" if kind == "route_json" else kind
+    user_prompt = build_route_prompt(city, context, user_question) if kind == "route" else build_qa_prompt(context, user_question)
+    return f"{SYSTEM_INSTRUCTIONS[kind]}\n\n{user_prompt}"
+
+
+# ====================================================
+# >>> Yapılandırılmış Rota Çıktısı (JSON) <<<
+# ====================================================
+
+def route_candidate_ids(place_names):
+    """Yer adlarına kısa ID'ler (p1, p2, ...) verir; ID -> yer adı sözlüğü döndürür."""
+    return {f"p{i}": name for i, name in enumerate(place_names, start=1)}
+
+
+def route_generation_config(place_ids):
+    """Modeli gün ve aday yer ID'leriyle sınırlayan JSON çıktı ayarları."""
+    return {
+        "response_mime_type": "application/json",
+        "response_schema": {
+            "type": "OBJECT",
+            "properties": {
+                "summary": {"type": "STRING"},
+                "days": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "day": {"type": "INTEGER"},
+                            "theme": {"type": "STRING"},
+                            "place_ids": {"type": "ARRAY", "items": {"type": "STRING", "format": "enum", "enum": list(place_ids)}},
+                        },
+                        "required": ["day", "place_ids"],
+                    },
+                },
+            },
+            "required": ["days"],
+        },
+    }
+
+
+def parse_route_plan(text, candidates):
+    """Modelin JSON rota çıktısını doğrular; {"summary", "days": [[yer adı, ...], ...], "planned_days"} döndürür.
+
+    Bilinmeyen (veya metin olmayan) ID'ler ve tekrar eden yerler atılır, geçerli yeri kalmayan günler düşer;
+    `planned_days` modelin planladığı gün sayısıdır (düşen günler dahil). İlk ROUTE_MAX_DAYS günden sonrası
+    atılır; böylece `len(days) <= planned_days` her zaman sağlanır. Kullanılabilir gün kalmazsa ValueError.
+    """
+    try:
+        payload = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Rota çıktısı geçerli JSON değil: {e}") from e
+    if not isinstance(payload, dict) or not isinstance(payload.get("days"), list):
+        raise ValueError("Rota çıktısında 'days' listesi yok.")
+
+    planned = sorted((d for d in payload["days"] if isinstance(d, dict)),
+                     key=lambda d: d["day"] if isinstance(d.get("day"), int) else 0)[:ROUTE_MAX_DAYS]
+    seen = set()
+    days = []
+    for day in planned:
+        place_ids = day.get("place_ids")
+        names = []
+        for place_id in place_ids if isinstance(place_ids, list) else []:
+            name = candidates.get(place_id) if isinstance(place_id, str) else None
+            if name and name not in seen:
+                seen.add(name)
+                names.append(name)
+        if names:
+            days.append(names)
+    if not days:
+        raise ValueError("Rota çıktısında aday listesinden geçerli yer yok.")
+    summary = payload.get("summary") if isinstance(payload.get("summary"), str) else ""
+    return {"summary": summary.strip(), "days": days, "planned_days": len(planned)}
+
+
+# ====================================================
+# >>> Model ve Önek Önbelleği <<<
+# ====================================================
+
+class PromptManager:
+    """Şablon türüne (ve isteğe bağlı şehre) göre system instruction'lı / önbellekli modeli sağlar."""
+
+    def __init__(self, model_name, generation_config):
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self._lock = threading.Lock()
+        self._models = {}
+        self._cached_contents = {}
+        self._cache_unsupported = set()
+        self._creating = {} # anahtar -> kilit; aynı önek için tek CachedContent.create çağrısı
+        self._audited = set()
+
+    def _plain_model(self, kind, model_name):
+        key = (kind, model_name)
+        model = self._models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                generation_config=self.generation_config,
+                system_instruction=SYSTEM_INSTRUCTIONS[kind],
+            )
+            self._models[key] = model
+        return model
+
+    def _cached_model(self, kind, city, city_document, model_name):
+        """Önbellekli model; önbellek oluşturma ağ çağrısı genel kilit dışında, anahtar başına bir kez yapılır."""
+        key = (kind, city, model_name)
+        if key in self._cache_unsupported:
+            return None
+        entry = self._cached_contents.get(key)
+        if entry is not None and entry[1] > datetime.datetime.now(datetime.timezone.utc):
+            return entry[0]
+        prefix_tokens = estimate_tokens(SYSTEM_INSTRUCTIONS[kind] + (city_document or ""))
+        if prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+            with self._lock:
+                self._cache_unsupported.add(key)
+            print(f"ℹ️ Prompt öneki önbellek için çok kısa ({kind}, {city or 'statik önek'}: ~{prefix_tokens} "
+                  f"< {PROMPT_CACHE_MIN_TOKENS} token); önbelleksiz model kullanılacak.")
+            return None
+
+        with self._lock:
+            creating = self._creating.setdefault(key, threading.Lock())
+        with creating:
+            # Beklerken başka bir istek oluşturmuş (ya da desteklenmediğini görmüş) olabilir
+            if key in self._cache_unsupported:
+                return None
+            entry = self._cached_contents.get(key)
+            now = datetime.datetime.now(datetime.timezone.utc)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            try:
+                ttl = datetime.timedelta(minutes=PROMPT_CACHE_TTL_MINUTES)
+                cached = caching.CachedContent.create(
+                    model=f"models/{model_name}",
+                    display_name=f"travel-{kind}-{city or 'static'}",
+                    system_instruction=SYSTEM_INSTRUCTIONS[kind],
+                    contents=[city_document] if city_document else None,
+                    ttl=ttl,
+                )
+                model = genai.GenerativeModel.from_cached_content(
+                    cached_content=cached, generation_config=self.generation_config
+                )
+            except Exception as e:
+                print(f"ℹ️ Prompt önbelleği kullanılamıyor ({kind}, {city or 'statik önek'}, {model_name}): {e}")
+                with self._lock:
+                    self._cache_unsupported.add(key)
+                return None
+            # Süresi dolmadan biraz önce yenile
+            entry = (model, now + ttl - datetime.timedelta(minutes=1))
+            with self._lock:
+                self._cached_contents[key] = entry
+            print(f"✅ Prompt öneki önbelleğe alındı ({kind}, {city or 'statik önek'}, {model_name}).")
+        return entry[0]
+
+    def model_for(self, kind, city=None, city_document=None, model_name=None):
+        """(model, önbellekte olan bağlam parçaları) döndürür.
+
+        Rota isteklerinde şehrin Genel Plan dokümanı önekle birlikte önbelleğe alınabilir;
+        bu durumda dokümanın bağlamda tekrar gönderilmemesi için listede döner.
+        `model_name` verilmezse varsayılan model kullanılır (yönlendirici istek başına seçebilir).
+        """
+        model_name = model_name or self.model_name
+        if city_document:
+            model = self._cached_model(kind, city, city_document, model_name)
+            if model is not None:
+                return model, [city_document]
+        model = self._cached_model(kind, None, None, model_name)
+        if model is not None:
+            return model, []
+        with self._lock:
+            return self._plain_model(kind, model_name), []
+
+    def _count_prompt_tokens(self, kind, legacy_prompt, prompt):
+        try:
+            counter = genai.GenerativeModel(model_name=self.model_name)
+            legacy_tokens = counter.count_tokens(legacy_prompt).total_tokens
+            prompt_tokens = counter.count_tokens(prompt).total_tokens
+            system_tokens = counter.count_tokens(SYSTEM_INSTRUCTIONS[kind]).total_tokens
+            print(f"📏 Token ölçümü ({kind}): önce {legacy_tokens} | sonra istek başına {prompt_tokens} "
+                  f"+ system instruction {system_tokens}")
+        except Exception as e:
+            print(f"ℹ️ Token ölçümü yapılamadı ({kind}): {e}")
+
+    def audit_tokens(self, kind, legacy_prompt, prompt, response=None):
+        """Eski/yeni prompt token sayılarını (tür başına bir kez, arka planda) ve cevabın kullanım bilgisini loglar."""
+        if PROMPT_TOKEN_AUDIT:
+            with self._lock:
+                first = kind not in self._audited
+                self._audited.add(kind)
+            if first:
+                # count_tokens çağrıları cevabı bekletmesin
+                threading.Thread(target=self._count_prompt_tokens, args=(kind, legacy_prompt, prompt),
+                                 name="prompt-token-audit", daemon=True).start()
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            print(f"📏 Token kullanımı ({kind}): girdi {usage.prompt_token_count}, "
+                  f"önbellekten {getattr(usage, 'cached_content_token_count', 0)}, "
+                  f"çıktı {usage.candidates_token_count}")
@@ -0,0 +1,182 @@
+"""Sorgu embedding'i ve cevap önbellekleri ile kalıcı sorgu günlüğü.
+
+Sorgu günlüğü (JSONL) en sık sorulan soruları süreç yeniden başlatmaları arasında taşır; açılıştaki
+ısınma (warm-up) adımı bu listeyi tekrar oynatarak önbellekleri ilk kullanıcı gelmeden doldurur.
+Satırlar istek yolunda diske yazılmaz: bellekte biriktirilir ve arka plandaki yazıcı iş parçacığı
+QUERY_LOG_FLUSH_SECONDS aralıklarla (ve kapanışta) toplu olarak ekler.
+
+Gizlilik: Günlüğe yalnızca soru metni yazılır (konum, oturum, IP ve zaman bilgisi tutulmaz), ancak
+kullanıcıların soruya yazdığı her şey (ad, otel adresi, uçuş bilgisi vb.) olduğu gibi saklanır ve
+ısınmada Gemini'ye tekrar gönderilebilir. Dosya yalnızca sahibinin okuyabileceği izinlerle (0600)
+DATA_DIR altında oluşturulur; sıkıştırmada seyrek sorular silinir. Kişisel veri saklanmaması gereken
+ortamlarda QUERY_LOG_FILE boş bırakılarak günlük tamamen kapatılmalıdır.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+DATA_DIR = os.getenv("DATA_DIR", "data") # Çalışma zamanında üretilen kalıcı dosyalar (sorgu günlüğü)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")) # 0 ise kapalı
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256")) # 0 ise kapalı
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+QUERY_LOG_FILE = os.getenv("QUERY_LOG_FILE", os.path.join(DATA_DIR, "query_log.jsonl")) # Boş bırakılırsa günlük tutulmaz
+QUERY_LOG_FLUSH_SECONDS = float(os.getenv("QUERY_LOG_FLUSH_SECONDS", "2"))
+QUERY_LOG_FLUSH_LINES = 200 # Bu kadar satır birikince yazıcı beklemeden uyandırılır
+QUERY_LOG_MAX_LINES = 5000 # Aşılınca dosya soru başına tek satıra sıkıştırılır
+QUERY_LOG_MAX_QUESTION_CHARS = 500
+
+
+def _private_opener(path, flags):
+    # Günlük kullanıcı metni içerir: yeni dosyalar yalnızca sahibine açık oluşturulur
+    return os.open(path, flags, 0o600)
+
+
+class LruCache:
+    """İş parçacığı güvenli, boyut (ve isteğe bağlı süre) sınırlı LRU önbellek."""
+
+    def __init__(self, maxsize, ttl_seconds=None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._items = OrderedDict() # anahtar -> (eklenme zamanı, değer)
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and self.ttl_seconds is not None and time.time() - item[0] > self.ttl_seconds:
+                del self._items[key]
+                item = None
+            if item is None:
+                self._misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.time(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {"size": len(self._items), "max_size": self.maxsize, "hits": self._hits, "misses": self._misses,
+                    "hit_ratio": round(self._hits / total, 4) if total else 0.0}
+
+
+class QueryLog:
+    """Soruların sıklığını tutan, satır eklemeli (JSONL) kalıcı günlük; diske arka planda toplu yazılır."""
+
+    def __init__(self, path, normalize=lambda text: text.strip().casefold(), flush_seconds=QUERY_LOG_FLUSH_SECONDS):
+        self.path = path
+        self.normalize = normalize
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock() # sayaçlar ve bekleyen satırlar
+        self._write_lock = threading.Lock() # dosya (ekleme ve sıkıştırma tek yazarla)
+        self._counts = Counter()
+        self._texts = {} # normalize anahtar -> ilk görülen soru metni
+        self._pending = [] # henüz diske yazılmamış sorular
+        self._lines = 0
+        self._closed = False
+        self._wakeup = threading.Event()
+        self._load()
+        self._writer = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._add(entry["q"], int(entry.get("count", 1)))
+                    except (ValueError, KeyError, TypeError):
+                        continue # yarım yazılmış satırlar atlanır
+                    self._lines += 1
+            print(f"📒 Sorgu günlüğü okundu: {len(self._counts)} farklı soru ({self.path}).")
+        except OSError as e:
+            print(f"⚠️ Sorgu günlüğü okunamadı: {e}")
+
+    def _add(self, question, count=1):
+        key = self.normalize(question)
+        if key:
+            self._counts[key] += count
+            self._texts.setdefault(key, question)
+
+    def record(self, question):
+        """Soruyu sayar ve yazılmak üzere kuyruğa alır (dosyaya dokunmaz)."""
+        question = question.strip()[:QUERY_LOG_MAX_QUESTION_CHARS]
+        if not question:
+            return
+        with self._lock:
+            self._add(question)
+            self._pending.append(question)
+            if len(self._pending) >= QUERY_LOG_FLUSH_LINES:
+                self._wakeup.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Bekleyen satırları dosyaya ekler; satır sınırı aşılırsa dosyayı sıkıştırır."""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                if not pending:
+                    return
+                compact = self._lines + len(pending) > QUERY_LOG_MAX_LINES
+                if compact:
+                    # Seyrek sorular bırakılır; hem dosya hem bellek sınırlı kalır (bekleyenler sayaçlara dahildir)
+                    kept = self._counts.most_common(QUERY_LOG_MAX_LINES // 2)
+                    self._counts = Counter(dict(kept))
+                    self._texts = {key: self._texts[key] for key, _ in kept}
+                    entries = [{"q": self._texts[key], "count": count} for key, count in kept]
+                else:
+                    entries = [{"q": question} for question in pending]
+            text = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if compact:
+                    tmp_path = f"{self.path}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8", opener=_private_opener) as f:
+                        f.write(text)
+                    os.replace(tmp_path, self.path)
+                    self._lines = len(entries)
+                else:
+                    with open(self.path, "a", encoding="utf-8", opener=_private_opener) as f:
+                        f.write(text)
+                    self._lines += len(entries)
+            except OSError as e:
+                print(f"⚠️ Sorgu günlüğüne yazılamadı ({len(pending)} soru): {e}")
+
+    def close(self):
+        """Yazıcıyı durdurur ve bekleyen satırları yazar."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+    def top(self, n):
+        """En sık sorulan `n` sorunun metinleri (sıklık sırasıyla)."""
+        with self._lock:
+            return [self._texts[key] for key, _ in self._counts.most_common(n)]
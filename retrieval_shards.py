@@ -0,0 +1,585 @@
+"""Parçalı (sharded) vektör araması: şehirler birden fazla arama sürecine dağıtılır.
+
+Her parça (shard) kendi ChromaDB koleksiyonlarını tutan ayrı bir süreçtir ve TCP üzerinden, uzunluk
+önekli JSON çerçeveleriyle sorgu kabul eder (pickle kullanılmaz; gelen veri kod çalıştıramaz).
+Bağlantı, SHARD_AUTHKEY ile karşılıklı HMAC el sıkışmasıyla doğrulanır. Koordinatör (`ShardCluster`)
+ChromaDB istemcisinin, `ShardedCollection` ise koleksiyonun işlem hattında kullanılan arayüzünü
+(query / get / upsert / count) taklit eder; bu sayede travel_service'teki arama kodu iki modda da aynıdır.
+
+    - Sorgular tüm parçalara paralel gönderilir, en yakın sonuçlar mesafeye göre birleştirilir.
+    - Her parçanın süresi SHARD_TIMEOUT_SECONDS (bağlantı için SHARD_CONNECT_TIMEOUT_SECONDS) ile
+      sınırlıdır; cevap vermeyen parça atlanır, kısmi sonuç döner (sonuç sözlüğünde "partial": True)
+      ve parça SHARD_RETRY_BACKOFF_SECONDS boyunca denenmez.
+    - Filtrede `source_city` geçen sorgular yalnızca o şehrin sahibi olan parçaya gider.
+    - `get` ve `count` kısmi sonuç döndürmez; hedef parçalardan biri cevap vermezse ShardUnavailableError.
+    - Doğrulanmamış bağlantıdan yalnızca SHARD_HANDSHAKE_MAX_FRAME_BYTES boyutunda çerçeve okunur ve
+      parça sunucusu aynı anda en fazla SHARD_MAX_CONNECTIONS bağlantı kabul eder.
+
+Modlar (SHARD_MODE):
+    off     Tek süreç, yerel ChromaDB (varsayılan)
+    local   SHARD_COUNT kadar parça süreci bu makinede başlatılır (geliştirme / test; anahtar her
+            başlatmada rastgele üretilir)
+    remote  SHARD_ADDRESSES="host:port,host:port" adreslerindeki parçalara bağlanılır
+
+Parça sunucusu başlatmak için (SHARD_AUTHKEY zorunludur, koordinatörle aynı olmalıdır):
+    SHARD_AUTHKEY=... python retrieval_shards.py --port 7001 [--host 10.0.0.5] [--path shard_db]
+Varsayılan olarak yalnızca 127.0.0.1 dinlenir; başka bir arayüz yalnızca özel ağda verilmelidir.
+"""
+import argparse
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+SHARD_MODE = os.getenv("SHARD_MODE", "off") # "off" | "local" | "remote"
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "2")) # local modda başlatılacak parça süreci sayısı
+SHARD_ADDRESSES = os.getenv("SHARD_ADDRESSES", "") # remote mod: "host:port,host:port"
+SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY", "") # Varsayılanı yok: remote mod ve sunucu bu olmadan başlamaz
+SHARD_AUTHKEY_MIN_LENGTH = 16
+SHARD_TIMEOUT_SECONDS = float(os.getenv("SHARD_TIMEOUT_SECONDS", "2")) # Sorgu başına parça süresi
+SHARD_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SHARD_CONNECT_TIMEOUT_SECONDS", "0.5"))
+SHARD_RETRY_BACKOFF_SECONDS = float(os.getenv("SHARD_RETRY_BACKOFF_SECONDS", "5")) # Erişilemeyen parça bu süre atlanır
+SHARD_BUILD_TIMEOUT_SECONDS = 300 # upsert / sayım / silme gibi yükleme işlemleri için
+SHARD_START_TIMEOUT_SECONDS = 60
+SHARD_MAX_FRAME_BYTES = 256 * 1024 * 1024
+SHARD_HANDSHAKE_MAX_FRAME_BYTES = 1024 # El sıkışma çerçeveleri (nonce + MAC) bunun çok altında kalır
+SHARD_MAX_CONNECTIONS = int(os.getenv("SHARD_MAX_CONNECTIONS", "128")) # Parça sunucusundaki eşzamanlı bağlantı sınırı
+
+_FRAME_HEADER = struct.Struct(">I")
+_NONCE_BYTES = 32
+
+
+class ShardUnavailableError(RuntimeError):
+    """Hedeflenen parçaların hiçbiri (ya da tamamı gereken işlemde biri) zamanında cevap vermedi."""
+
+
+class ShardAuthError(ConnectionError):
+    """Parça ile el sıkışma doğrulanamadı (yanlış SHARD_AUTHKEY)."""
+
+
+# ====================================================
+# >>> Yardımcılar <<<
+# ====================================================
+
+def parse_addresses(text):
+    """'host:port,host:port' metnini (host, port) listesine çevirir."""
+    addresses = []
+    for item in text.split(","):
+        item = item.strip()
+        if item:
+            host, _, port = item.rpartition(":")
+            addresses.append((host or "127.0.0.1", int(port)))
+    return addresses
+
+
+def partition_cities(city_sizes, shard_count):
+    """Şehirleri doküman sayısına göre parçalara dengeli dağıtır (büyükten küçüğe, en boş parçaya)."""
+    loads = [0] * shard_count
+    owners = {}
+    for city, size in sorted(city_sizes.items(), key=lambda item: (-item[1], item[0])):
+        shard_index = loads.index(min(loads))
+        owners[city] = shard_index
+        loads[shard_index] += size
+    return owners
+
+
+def where_cities(where):
+    """Filtredeki `source_city` kısıtını şehir kümesi olarak döndürür; kısıt yoksa None."""
+    if not where:
+        return None
+    if "$and" in where:
+        for clause in where["$and"]:
+            cities = where_cities(clause)
+            if cities is not None:
+                return cities
+        return None
+    condition = where.get("source_city")
+    if condition is None:
+        return None
+    if isinstance(condition, dict):
+        if "$eq" in condition:
+            return {condition["$eq"]}
+        if "$in" in condition:
+            return set(condition["$in"])
+        return None
+    return {condition}
+
+
+def require_authkey(authkey=SHARD_AUTHKEY):
+    """Açıkça tanımlanmış, yeterince uzun bir anahtar ister; bayt olarak döndürür."""
+    if not authkey or len(authkey) < SHARD_AUTHKEY_MIN_LENGTH:
+        raise ValueError(f"SHARD_AUTHKEY tanımlanmalı ve en az {SHARD_AUTHKEY_MIN_LENGTH} karakter olmalıdır "
+                         "(örn. python -c \"import secrets; print(secrets.token_hex(32))\").")
+    return authkey.encode("utf-8") if isinstance(authkey, str) else authkey
+
+
+# ====================================================
+# >>> Protokol (uzunluk önekli JSON + HMAC el sıkışması) <<<
+# ====================================================
+
+def _json_default(value):
+    # NumPy dizileri ve skalerleri (embedding'ler, mesafeler) JSON listesine/sayısına çevrilir
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"JSON'a çevrilemeyen tür: {type(value).__name__}")
+
+
+def send_frame(sock, message):
+    body = json.dumps(message, ensure_ascii=False, default=_json_default).encode("utf-8")
+    sock.sendall(_FRAME_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock, size, deadline=None):
+    chunks = []
+    while size:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Parça cevabı zamanında gelmedi.")
+            sock.settimeout(remaining)
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise EOFError("Bağlantı kapandı.")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock, deadline=None, max_bytes=SHARD_MAX_FRAME_BYTES):
+    (size,) = _FRAME_HEADER.unpack(_recv_exact(sock, _FRAME_HEADER.size, deadline))
+    if size > max_bytes:
+        raise ValueError(f"Çerçeve çok büyük: {size} bayt")
+    return json.loads(_recv_exact(sock, size, deadline).decode("utf-8"))
+
+
+def _mac(authkey, nonce_hex):
+    return hmac.new(authkey, bytes.fromhex(nonce_hex), hashlib.sha256).hexdigest()
+
+
+def server_handshake(sock, authkey):
+    """Sunucu tarafı: istemcinin anahtarı bildiğini doğrular, sonra kendi bildiğini kanıtlar."""
+    nonce = secrets.token_hex(_NONCE_BYTES)
+    send_frame(sock, {"nonce": nonce})
+    # Anahtar doğrulanmadan büyük çerçeve için bellek ayrılmaz
+    reply = recv_frame(sock, time.monotonic() + SHARD_CONNECT_TIMEOUT_SECONDS * 4, SHARD_HANDSHAKE_MAX_FRAME_BYTES)
+    if not isinstance(reply, dict) or not hmac.compare_digest(str(reply.get("mac", "")), _mac(authkey, nonce)):
+        send_frame(sock, {"ok": False})
+        raise ShardAuthError("İstemci doğrulanamadı.")
+    client_nonce = str(reply.get("nonce", ""))
+    if len(client_nonce) != 2 * _NONCE_BYTES:
+        raise ShardAuthError("Geçersiz istemci nonce.")
+    send_frame(sock, {"ok": True, "mac": _mac(authkey, client_nonce)})
+
+
+def client_handshake(sock, authkey, deadline):
+    challenge = recv_frame(sock, deadline, SHARD_HANDSHAKE_MAX_FRAME_BYTES)
+    nonce = secrets.token_hex(_NONCE_BYTES)
+    send_frame(sock, {"mac": _mac(authkey, str(challenge["nonce"])), "nonce": nonce})
+    reply = recv_frame(sock, deadline, SHARD_HANDSHAKE_MAX_FRAME_BYTES)
+    if not reply.get("ok") or not hmac.compare_digest(str(reply.get("mac", "")), _mac(authkey, nonce)):
+        raise ShardAuthError("Parça doğrulanamadı (SHARD_AUTHKEY eşleşmiyor).")
+
+
+# ====================================================
+# >>> Parça Sunucusu <<<
+# ====================================================
+
+class ShardServer:
+    """Tek bir parça süreci: adlandırılmış ChromaDB koleksiyonlarını tutar ve istekleri cevaplar."""
+
+    def __init__(self, path=None, max_connections=SHARD_MAX_CONNECTIONS):
+        import chromadb
+        self.client = chromadb.PersistentClient(path=path) if path else chromadb.EphemeralClient()
+        self._connection_slots = threading.BoundedSemaphore(max_connections)
+
+    def collection(self, name):
+        return self.client.get_or_create_collection(name=name)
+
+    def dispatch(self, request):
+        op = request["op"]
+        if op == "ping":
+            return {"pid": os.getpid()}
+        if op == "collections":
+            # Koordinatör yeniden bağlandığında hangi şehrin hangi parçada olduğunu buradan öğrenir
+            info = {}
+            for collection in self.client.list_collections():
+                name = getattr(collection, "name", collection)
+                metadatas = self.collection(name).get(include=["metadatas"])["metadatas"]
+                info[name] = {"count": len(metadatas), "cities": sorted({m["source_city"] for m in metadatas})}
+            return info
+        if op == "delete_collection":
+            try:
+                self.client.delete_collection(request["name"])
+            except Exception:
+                pass # zaten yoksa sorun değil
+            return True
+
+        collection = self.collection(request["name"])
+        if op == "count":
+            return collection.count()
+        if op == "upsert":
+            collection.upsert(ids=request["ids"], documents=request["documents"],
+                              metadatas=request["metadatas"], embeddings=request["embeddings"])
+            return collection.count()
+        if op == "get":
+            result = collection.get(where=request.get("where") or None, include=request["include"])
+            return {key: result[key] for key in ["ids"] + list(request["include"])}
+        if op == "query":
+            n_results = min(request["n_results"], collection.count())
+            if n_results == 0:
+                return {key: [] for key in ["ids"] + list(request["include"])}
+            result = collection.query(query_embeddings=[request["vector"]], n_results=n_results,
+                                      where=request.get("where") or None, include=request["include"])
+            return {key: result[key][0] for key in ["ids"] + list(request["include"])}
+        raise ValueError(f"Bilinmeyen işlem: {op}")
+
+    def handle(self, sock, authkey):
+        try:
+            self._handle(sock, authkey)
+        finally:
+            self._connection_slots.release()
+
+    def _handle(self, sock, authkey):
+        with sock:
+            try:
+                server_handshake(sock, authkey)
+            except Exception as e:
+                print(f"⚠️ Bağlantı reddedildi: {e}", file=sys.stderr, flush=True)
+                return
+            sock.settimeout(None)
+            while True:
+                try:
+                    request = recv_frame(sock)
+                except (EOFError, OSError, ValueError):
+                    return
+                try:
+                    response = {"ok": True, "result": self.dispatch(request)}
+                except Exception as e:
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                try:
+                    send_frame(sock, response)
+                except OSError:
+                    return
+
+    def serve(self, address, authkey, announce=False):
+        authkey = require_authkey(authkey)
+        with socket.create_server(address) as listener:
+            host, port = listener.getsockname()[:2]
+            if announce:
+                # local mod: koordinatör adresi stdout'un ilk satırından okur
+                print(f"SHARD_READY {host}:{port}", flush=True)
+            print(f"🧩 Parça sunucusu dinliyor: {host}:{port} (pid {os.getpid()})", file=sys.stderr, flush=True)
+            while True:
+                sock, peer = listener.accept()
+                if not self._connection_slots.acquire(blocking=False):
+                    print(f"⚠️ Bağlantı sınırı dolu, {peer[0]} reddedildi.", file=sys.stderr, flush=True)
+                    sock.close()
+                    continue
+                sock.settimeout(SHARD_CONNECT_TIMEOUT_SECONDS * 4) # el sıkışma süresi
+                threading.Thread(target=self.handle, args=(sock, authkey), daemon=True).start()
+
+
+def _exit_when_parent_closes():
+    """local mod: koordinatör süreci kapanınca (stdin EOF) parça da kapanır."""
+    sys.stdin.read()
+    os._exit(0)
+
+
+# ====================================================
+# >>> Koordinatör <<<
+# ====================================================
+
+class ShardClient:
+    """Tek bir parçaya bağlantı havuzu ile istek gönderir."""
+
+    def __init__(self, name, address, authkey):
+        self.name = name
+        self.address = address
+        self.authkey = require_authkey(authkey)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._down_until = 0.0 # erişilemeyen parça bu zamana (monotonic) kadar denenmez
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self._down_until
+
+    def _mark_down(self):
+        with self._lock:
+            self._down_until = time.monotonic() + SHARD_RETRY_BACKOFF_SECONDS
+        self.close()
+
+    def _connect(self, deadline):
+        timeout = max(min(SHARD_CONNECT_TIMEOUT_SECONDS, deadline - time.monotonic()), 0.001)
+        try:
+            sock = socket.create_connection(self.address, timeout=timeout)
+        except OSError as e:
+            self._mark_down()
+            raise ConnectionError(f"{self.name} bağlantısı kurulamadı ({e}); {SHARD_RETRY_BACKOFF_SECONDS:g} sn denenmeyecek.") from e
+        try:
+            client_handshake(sock, self.authkey, deadline)
+        except BaseException as e:
+            sock.close()
+            if isinstance(e, (OSError, EOFError)):
+                self._mark_down()
+            if isinstance(e, socket.timeout):
+                raise TimeoutError(f"{self.name} el sıkışması zamanında tamamlanmadı.") from e
+            raise
+        return sock
+
+    def call(self, request, timeout=SHARD_TIMEOUT_SECONDS):
+        if not self.healthy:
+            raise ConnectionError(f"{self.name} geçici olarak devre dışı (yakın zamanda erişilemedi).")
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            sock = self._idle.pop() if self._idle else None
+        pooled = sock is not None
+        if sock is None:
+            sock = self._connect(deadline)
+        while True:
+            try:
+                sock.settimeout(max(deadline - time.monotonic(), 0.001))
+                send_frame(sock, request)
+                response = recv_frame(sock, deadline)
+                break
+            except BaseException as e:
+                # Cevabı gelmemiş bağlantı tekrar kullanılamaz (geç gelen cevap sonraki isteğe karışır)
+                sock.close()
+                if pooled and isinstance(e, (EOFError, ConnectionError)):
+                    # Boştaki bağlantı parça yeniden başladığı için bayatlamış olabilir: parçayı devre dışı
+                    # bırakmadan önce bir kez taze bağlantıyla dene (diğer boştaki bağlantılar da bayattır)
+                    pooled = False
+                    self.close()
+                    sock = self._connect(deadline)
+                    continue
+                if isinstance(e, (socket.timeout, EOFError, ConnectionError)):
+                    self._mark_down()
+                if isinstance(e, socket.timeout):
+                    raise TimeoutError(f"{self.name} {timeout:g} sn içinde cevap vermedi.") from e
+                raise
+        with self._lock:
+            self._idle.append(sock)
+        if not response["ok"]:
+            raise RuntimeError(f"{self.name}: {response['error']}")
+        return response["result"]
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+class ShardCluster:
+    """Parça kümesi; ChromaDB istemcisinin işlem hattında kullanılan kısmını taklit eder."""
+
+    def __init__(self, addresses, authkey=SHARD_AUTHKEY, processes=()):
+        authkey = require_authkey(authkey)
+        self.shards = [ShardClient(f"shard-{i}", address, authkey) for i, address in enumerate(addresses)]
+        self.processes = list(processes)
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 4 * len(self.shards)), thread_name_prefix="shard-fanout")
+        self._stats_lock = threading.Lock()
+        self._stats = {"queries": 0, "targeted_queries": 0, "partial_results": 0, "shard_timeouts": 0, "shard_errors": 0}
+        self._closed = False
+        atexit.register(self.close)
+
+    @classmethod
+    def start_local(cls, shard_count=SHARD_COUNT):
+        """Bu makinede `shard_count` parça süreci başlatır (her biri ayrı ChromaDB örneği).
+
+        Anahtar her kümede rastgele üretilir ve yalnızca alt süreçlerin ortamına verilir.
+        """
+        authkey = secrets.token_hex(32)
+        env = dict(os.environ, SHARD_AUTHKEY=authkey)
+        processes, addresses = [], []
+        try:
+            for _ in range(shard_count):
+                process = subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), "--host", "127.0.0.1", "--port", "0", "--announce", "--parent-watch"],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env, text=True,
+                )
+                processes.append(process)
+            deadline = time.time() + SHARD_START_TIMEOUT_SECONDS
+            for process in processes:
+                line = process.stdout.readline().strip()
+                if not line.startswith("SHARD_READY ") or time.time() > deadline:
+                    raise RuntimeError(f"Parça süreci başlatılamadı (çıktı: {line!r}).")
+                addresses.extend(parse_addresses(line.split(" ", 1)[1]))
+        except Exception:
+            for process in processes:
+                process.kill()
+            raise
+        print(f"🧩 {shard_count} yerel parça süreci başlatıldı: {', '.join(f'{h}:{p}' for h, p in addresses)}")
+        return cls(addresses, authkey, processes)
+
+    @classmethod
+    def from_env(cls):
+        if SHARD_MODE == "local":
+            return cls.start_local()
+        if SHARD_MODE == "remote":
+            addresses = parse_addresses(SHARD_ADDRESSES)
+            if not addresses:
+                raise ValueError("SHARD_MODE=remote için SHARD_ADDRESSES tanımlanmalıdır.")
+            print(f"🧩 {len(addresses)} uzak parçaya bağlanılıyor.")
+            return cls(addresses, require_authkey(SHARD_AUTHKEY))
+        raise ValueError(f"Parçalı mod kapalı veya geçersiz: SHARD_MODE={SHARD_MODE!r}")
+
+    def fan_out(self, shards, request, timeout=SHARD_TIMEOUT_SECONDS):
+        """İsteği parçalara paralel gönderir; (başarılı [(parça, sonuç)], başarısız parça adları) döndürür."""
+        futures = {self._executor.submit(shard.call, request, timeout): shard for shard in shards}
+        done, not_done = wait(futures, timeout=timeout + SHARD_CONNECT_TIMEOUT_SECONDS + 0.5)
+        results, failed = [], []
+        for future in done:
+            shard = futures[future]
+            error = future.exception()
+            if error is None:
+                results.append((shard, future.result()))
+                continue
+            failed.append(shard.name)
+            self._count("shard_timeouts" if isinstance(error, TimeoutError) else "shard_errors")
+            print(f"⚠️ Parça cevap vermedi ({shard.name}): {error}")
+        for future in not_done:
+            failed.append(futures[future].name)
+            self._count("shard_timeouts")
+            print(f"⚠️ Parça zaman aşımına uğradı ({futures[future].name}).")
+        if shards and not results:
+            raise ShardUnavailableError(f"Hiçbir parça cevap vermedi ({', '.join(failed)}).")
+        return results, failed
+
+    def get_or_create_collection(self, name):
+        """Koleksiyonun parçalardaki durumunu (şehir -> parça) öğrenip koleksiyon nesnesi döndürür."""
+        owners = {}
+        results, _ = self.fan_out(self.shards, {"op": "collections"}, SHARD_BUILD_TIMEOUT_SECONDS)
+        for shard, collections in results:
+            for city in collections.get(name, {}).get("cities", []):
+                owners[city] = shard
+        return ShardedCollection(self, name, owners)
+
+    def delete_collection(self, name):
+        self.fan_out(self.shards, {"op": "delete_collection", "name": name}, SHARD_BUILD_TIMEOUT_SECONDS)
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            return {"mode": "local" if self.processes else "remote", "shards": len(self.shards), **self._stats}
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for shard in self.shards:
+            shard.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+
+
+class ShardedCollection:
+    """Parçalara dağıtılmış tek bir mantıksal koleksiyon (ChromaDB Collection arayüzüyle)."""
+
+    def __init__(self, cluster, name, owners=None):
+        self.cluster = cluster
+        self.name = name
+        self.owners = dict(owners or {}) # şehir -> ShardClient
+
+    def _targets(self, where):
+        cities = where_cities(where)
+        if cities is None or any(city not in self.owners for city in cities):
+            return self.cluster.shards
+        return list({id(self.owners[city]): self.owners[city] for city in cities}.values())
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        """Dokümanları şehirlerine göre parçalara dağıtarak yükler (yeni şehirler en boş parçaya gider)."""
+        shards = self.cluster.shards
+        city_sizes = {}
+        for metadata in metadatas:
+            city_sizes[metadata["source_city"]] = city_sizes.get(metadata["source_city"], 0) + 1
+        new_cities = {city: size for city, size in city_sizes.items() if city not in self.owners}
+        if new_cities:
+            assigned = partition_cities(new_cities, len(shards))
+            self.owners.update({city: shards[index] for city, index in assigned.items()})
+
+        batches = {shard.name: (shard, {"ids": [], "documents": [], "metadatas": [], "embeddings": []}) for shard in shards}
+        for i, metadata in enumerate(metadatas):
+            batch = batches[self.owners[metadata["source_city"]].name][1]
+            batch["ids"].append(ids[i])
+            batch["documents"].append(documents[i])
+            batch["metadatas"].append(metadata)
+            batch["embeddings"].append(embeddings[i])
+        for shard, batch in batches.values():
+            if batch["ids"]:
+                shard.call({"op": "upsert", "name": self.name, **batch}, SHARD_BUILD_TIMEOUT_SECONDS)
+                print(f"   - {shard.name}: {len(batch['ids'])} doküman ({len({m['source_city'] for m in batch['metadatas']})} şehir)")
+
+    def count(self, timeout=SHARD_BUILD_TIMEOUT_SECONDS):
+        """Tüm parçalardaki doküman sayısı; eksik toplam (yeniden yüklemeyi tetikleyeceği için) döndürülmez."""
+        results, failed = self.cluster.fan_out(self.cluster.shards, {"op": "count", "name": self.name}, timeout)
+        if failed:
+            raise ShardUnavailableError(f"Sayım tamamlanamadı, cevap vermeyen parçalar: {', '.join(failed)}")
+        return sum(count for _, count in results)
+
+    def get(self, where=None, include=("metadatas", "documents")):
+        """Hedef parçalardaki eşleşen dokümanlar; eksik sonuç (önbelleğe alınabileceği için) döndürülmez."""
+        include = list(include)
+        results, failed = self.cluster.fan_out(self._targets(where), {"op": "get", "name": self.name, "where": where, "include": include})
+        if failed:
+            raise ShardUnavailableError(f"Dokümanlar eksiksiz alınamadı, cevap vermeyen parçalar: {', '.join(failed)}")
+        merged = {key: [] for key in ["ids"] + include}
+        for _, result in results:
+            for key in merged:
+                merged[key].extend(result[key])
+        return merged
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("metadatas", "documents", "distances")):
+        """Sorguyu hedef parçalara paralel gönderir ve en yakın `n_results` sonucu birleştirir."""
+        include = list(dict.fromkeys(list(include) + ["distances"]))
+        targets = self._targets(where)
+        self.cluster._count("queries")
+        if len(targets) < len(self.cluster.shards):
+            self.cluster._count("targeted_queries")
+        request = {"op": "query", "name": self.name, "vector": query_embeddings[0], "n_results": n_results,
+                   "where": where, "include": include}
+        results, failed = self.cluster.fan_out(targets, request)
+        if failed:
+            self.cluster._count("partial_results")
+            print(f"⚠️ Kısmi sonuç: {len(results)}/{len(targets)} parça cevap verdi.")
+
+        rows = []
+        for _, result in results:
+            for i in range(len(result["ids"])):
+                rows.append({key: result[key][i] for key in ["ids"] + include})
+        rows.sort(key=lambda row: row["distances"])
+        rows = rows[:n_results]
+        merged = {key: [[row[key] for row in rows]] for key in ["ids"] + include}
+        merged["partial"] = bool(failed)
+        return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parçalı arama için tek bir parça sunucusu başlatır.")
+    parser.add_argument("--host", default="127.0.0.1", help="Dinlenecek arayüz (yalnızca özel ağ adresi verin)")
+    parser.add_argument("--port", type=int, default=7001)
+    parser.add_argument("--path", default=None, help="Kalıcı ChromaDB klasörü (verilmezse bellek içi)")
+    parser.add_argument("--announce", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--parent-watch", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.parent_watch:
+        threading.Thread(target=_exit_when_parent_closes, daemon=True).start()
+    try:
+        authkey = require_authkey(SHARD_AUTHKEY)
+    except ValueError as e:
+        parser.error(str(e))
+    ShardServer(args.path).serve((args.host, args.port), authkey, announce=args.announce)
@@ -0,0 +1,138 @@
+"""Oturum (kullanıcı sekmesi) bazında sohbet durumu.
+
+İlk soruda tespit edilen şehrin aday dokümanları (ID, metin, metadata, embedding) oturumda saklanır.
+Aynı şehirde kalan takip soruları vektör veritabanına yeniden gitmeden bu aday kümesi yerelde
+yeniden sıralanarak cevaplanır. Boşta kalan oturumlar düşer; her oturumun bellek kullanımı sınırlıdır.
+Aday embedding'leri EMBEDDING_STORAGE_DTYPE türünde (float16 / int8) saklanabilir.
+"""
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from embedding_storage import normalize_rows, quantize, quantized_scores, storage_nbytes
+
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800")) # 30 dk işlem yoksa oturum düşer
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(2 * 1024 * 1024))) # Oturum başına bellek sınırı
+SESSION_HISTORY_TURNS = 6 # Saklanan son soru-cevap sayısı
+HISTORY_ANSWER_CHARS = 300 # Geçmişte cevapların yalnızca başı tutulur
+
+
+class SessionState:
+    """Tek bir oturumun şehir, aday dokümanlar ve kısa sohbet geçmişi."""
+
+    def __init__(self):
+        self.city = None
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.embeddings = None # (n, d) saklama türünde kodlar; satırlar birim uzunlukta normalize edilmiştir
+        self.scales = None # int8 saklamada satır ölçekleri
+        self.generation = None # Adayların geldiği veri nesli (hot-reload sonrası eski adaylar kullanılmaz)
+        self.history = deque(maxlen=SESSION_HISTORY_TURNS)
+        self.last_used = time.time()
+        self.reused_retrievals = 0
+
+    def touch(self):
+        self.last_used = time.time()
+
+    def is_expired(self, now=None):
+        return (now or time.time()) - self.last_used > SESSION_IDLE_TTL_SECONDS
+
+    def has_candidates(self, city, generation=None):
+        if generation is not None and self.generation != generation:
+            return False
+        return city is not None and self.city == city and self.embeddings is not None and len(self.ids) > 0
+
+    def set_candidates(self, city, ids, documents, metadatas, embeddings, query_vector=None, generation=None):
+        """Şehrin aday doküman kümesini saklar (embedding'ler kosinüs benzerliği için normalize edilir).
+
+        `query_vector` verilirse adaylar ona benzerliğe göre sıralanır; bellek sınırında en az ilgililer atılır.
+        """
+        vectors = normalize_rows(embeddings)
+        order = np.arange(len(ids))
+        if query_vector is not None and len(ids):
+            query = np.asarray(query_vector, dtype=np.float32)
+            order = np.argsort(-(vectors @ query))
+        self.city = city
+        self.generation = generation
+        self.ids = [ids[i] for i in order]
+        self.documents = [documents[i] for i in order]
+        self.metadatas = [metadatas[i] for i in order]
+        self.embeddings, self.scales = quantize(vectors[order])
+        self.enforce_memory_cap()
+
+    def clear_candidates(self):
+        self.city = None
+        self.ids, self.documents, self.metadatas = [], [], []
+        self.embeddings = None
+        self.scales = None
+
+    def rerank(self, query_vector, k):
+        """Aday kümesini sorgu vektörüne göre yeniden sıralar; (ids, documents, metadatas, skorlar) döndürür."""
+        scores = quantized_scores(self.embeddings, self.scales, normalize_rows(query_vector))
+        order = np.argsort(-scores)[:k]
+        self.reused_retrievals += 1
+        return ([self.ids[i] for i in order], [self.documents[i] for i in order],
+                [self.metadatas[i] for i in order], scores[order])
+
+    def add_turn(self, question, answer):
+        self.history.append((question, answer[:HISTORY_ANSWER_CHARS]))
+        self.enforce_memory_cap()
+
+    def recent_questions(self):
+        return [question for question, _ in self.history]
+
+    def nbytes(self):
+        """Oturumun yaklaşık bellek kullanımı (bayt)."""
+        size = storage_nbytes(self.embeddings, self.scales) if self.embeddings is not None else 0
+        size += sum(len(doc.encode("utf-8")) for doc in self.documents)
+        size += sum(len(q.encode("utf-8")) + len(a.encode("utf-8")) for q, a in self.history)
+        return size
+
+    def enforce_memory_cap(self):
+        """Sınır aşılırsa önce eski geçmişi, sonra aday kümesinin sonunu (en az ilgili kısmı) atar.
+
+        Boyut bir kez hesaplanır ve atılan parçalar düşülerek güncellenir; kesme tek seferde yapılır.
+        """
+        size = self.nbytes()
+        while size > SESSION_MAX_BYTES and len(self.history) > 1:
+            question, answer = self.history.popleft()
+            size -= len(question.encode("utf-8")) + len(answer.encode("utf-8"))
+        if self.embeddings is None:
+            return
+        keep = len(self.ids)
+        row_bytes = storage_nbytes(self.embeddings, self.scales) // keep if keep else 0
+        while keep > 0 and size > SESSION_MAX_BYTES:
+            keep -= 1
+            size -= row_bytes + len(self.documents[keep].encode("utf-8"))
+        if keep == 0:
+            self.clear_candidates()
+        elif keep < len(self.ids):
+            self.ids, self.documents, self.metadatas = self.ids[:keep], self.documents[:keep], self.metadatas[:keep]
+            self.embeddings = self.embeddings[:keep]
+            if self.scales is not None:
+                self.scales = self.scales[:keep]
+
+    def release(self):
+        """Oturum düşürülürken büyük tamponları bırakır."""
+        self.clear_candidates()
+        self.history.clear()
+
+
+def session_for(state):
+    """Gradio'dan gelen durumu geçerli bir oturuma çevirir (yoksa veya süresi dolduysa yenisini açar)."""
+    if isinstance(state, SessionState) and not state.is_expired():
+        state.touch()
+        return state
+    if isinstance(state, SessionState):
+        state.release()
+    return SessionState()
+
+
+def release_session(state):
+    """gr.State delete_callback'i: oturum süresi dolunca/sekme kapanınca çağrılır."""
+    if isinstance(state, SessionState):
+        print(f"🧹 Oturum düşürüldü (şehir: {state.city}, yeniden kullanılan arama: {state.reused_retrievals}).")
+        state.release()
@@ -0,0 +1,103 @@
+"""Aynı anda uçuşta olan özdeş isteklerin birleştirilmesi (single-flight).
+
+Aynı anahtarla gelen ilk istek "lider" olur ve hesaplamayı yapar; lider bitene kadar gelen özdeş
+istekler yeni bir embedding/ChromaDB/Gemini turu başlatmaz, liderin sonucunu bekleyip paylaşır.
+
+Anlamsal kurallar:
+    - Sonuç önbelleğe alınmaz: lider bittiği anda kayıt silinir, sonraki istek yeni bir hesaplama başlatır.
+    - Hatalar paylaşılır: lider bir Exception fırlatırsa aynı hata bekleyen tüm isteklere de fırlatılır
+      (kota/API hatasında yeniden deneme fırtınası oluşmaz). Hata sözlüğü döndüren sonuçlar da aynen paylaşılır.
+    - İptal: lider Exception dışı bir sebeple (KeyboardInterrupt, SystemExit, GeneratorExit vb.) yarıda
+      kalırsa bekleyenler uyandırılır ve her biri hesaplamayı kendisi yapar.
+    - Bekleyen bir isteğin vazgeçmesi lideri etkilemez; `wait_timeout` dolan bekleyen de kendisi hesaplar.
+"""
+import os
+import threading
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "120")) # Bekleyenin lidere en fazla süresi
+
+
+class _Flight:
+    """Uçuştaki tek bir hesaplama."""
+
+    __slots__ = ("done", "result", "error", "aborted", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.aborted = False
+        self.followers = 0
+
+
+class SingleFlight:
+    """Anahtar başına tek bir uçuştaki hesaplama; özdeş eşzamanlı çağrılar onun sonucunu paylaşır."""
+
+    def __init__(self, wait_timeout=SINGLE_FLIGHT_WAIT_SECONDS):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._leaders = 0
+        self._shared = 0
+        self._shared_errors = 0
+        self._fallbacks = 0
+        self._max_followers = 0
+
+    def do(self, key, fn):
+        """`fn()` sonucunu döndürür: (sonuç, paylaşıldı_mı). Aynı anahtar uçuştaysa onun sonucu beklenir."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._leaders += 1
+            else:
+                flight.followers += 1
+
+        if leader:
+            return self._lead(key, flight, fn), False
+
+        if flight.done.wait(self.wait_timeout) and not flight.aborted:
+            with self._lock:
+                self._shared += 1
+                if flight.error is not None:
+                    self._shared_errors += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        # Lider iptal edildi ya da bekleme süresi doldu: istek kendi başına hesaplanır
+        with self._lock:
+            self._fallbacks += 1
+        return fn(), False
+
+    def _lead(self, key, flight, fn):
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        except BaseException:
+            flight.aborted = True
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                self._max_followers = max(self._max_followers, flight.followers)
+            flight.done.set()
+
+    def stats(self):
+        """Paylaşım sayaçları: lider (gerçek hesaplama), paylaşılan, geri dönüş ve uçuştaki anahtar sayısı."""
+        with self._lock:
+            total = self._leaders + self._shared + self._fallbacks
+            return {
+                "leaders": self._leaders,
+                "shared": self._shared,
+                "shared_errors": self._shared_errors,
+                "fallbacks": self._fallbacks,
+                "inflight_keys": len(self._flights),
+                "max_followers": self._max_followers,
+                "share_ratio": round(self._shared / total, 4) if total else 0.0,
+            }
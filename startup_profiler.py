@@ -0,0 +1,217 @@
+"""Açılış ve bellek profilleme modu.
+
+PROFILE_STARTUP=1 ortam değişkeni veya --profile argümanıyla açılır. Kapalıyken tüm ölçüm noktaları
+boş bağlam yöneticisidir. Açıkken şunlar kaydedilir ve makinece okunabilir bir JSON rapora yazılır:
+    - ağır importların süre/RSS dökümü ("import:..." fazları)
+    - başlatma fazlarının duvar saati süresi ve RSS farkı (iç içe fazlar "üst/alt" adıyla)
+    - tracemalloc ile en büyük bellek ayırmaları (açılış sonu anlık görüntüsü; izleme sonra kapatılır)
+    - istenen isteklerin cProfile örnekleri (PROFILE_REQUEST_EVERY ya da arm_requests() ile)
+
+Bu modül, ölçülecek importlardan önce import edilmelidir.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_ENABLED = os.getenv("PROFILE_STARTUP", "0") == "1" or "--profile" in sys.argv
+PROFILE_REPORT_FILE = os.getenv("PROFILE_REPORT_FILE", "startup_profile.json")
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "1") == "1" # Açılışı belirgin yavaşlatır; 0 ile kapatılabilir
+PROFILE_REQUEST_EVERY = int(os.getenv("PROFILE_REQUEST_EVERY", "0")) # Her N. isteği cProfile ile örnekle (0: kapalı)
+TRACEMALLOC_TOP = 25
+PROFILE_TOP_FUNCTIONS = 30
+MAX_REQUEST_SAMPLES = 20
+
+
+def current_rss_bytes():
+    """Sürecin anlık RSS değeri (psutil varsa onunla, yoksa /proc'tan; ikisi de yoksa tepe RSS)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StartupProfiler:
+    """Faz süreleri, RSS farkları, tracemalloc ve istek profillerini toplar."""
+
+    def __init__(self, enabled=PROFILE_ENABLED, report_path=PROFILE_REPORT_FILE):
+        self.enabled = enabled
+        self.report_path = report_path
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.phases = []
+        self.tracemalloc_top = []
+        self.tracemalloc_totals = None
+        self.requests = []
+        self._request_counter = 0
+        self._armed_requests = 0
+        self._request_profiling = False # cProfile aynı anda tek istekte çalıştırılır
+        self._startup_seconds = None
+        self._owns_tracemalloc = False
+        if self.enabled and PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._owns_tracemalloc = True
+        if self.enabled:
+            print(f"🔬 Profilleme modu açık (rapor: {self.report_path}).")
+
+    @contextmanager
+    def phase(self, name):
+        """Bir başlatma fazını ölçer (süre, RSS farkı, tracemalloc farkı)."""
+        if not self.enabled:
+            yield
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        full_name = "/".join(stack + [name])
+        stack.append(name)
+        rss_before = current_rss_bytes()
+        traced_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            stack.pop()
+            rss_after = current_rss_bytes()
+            record = {
+                "name": full_name,
+                "depth": len(stack),
+                "start_offset_seconds": round(start - self._start, 4),
+                "wall_seconds": round(wall, 4),
+                "rss_before_bytes": rss_before,
+                "rss_after_bytes": rss_after,
+                "rss_delta_bytes": rss_after - rss_before,
+            }
+            if traced_before is not None:
+                record["traced_delta_bytes"] = tracemalloc.get_traced_memory()[0] - traced_before
+            with self._lock:
+                self.phases.append(record)
+            print(f"🔬 {full_name}: {wall:.3f} sn, RSS {(rss_after - rss_before) / 1e6:+.1f} MB")
+
+    def finish_startup(self):
+        """Açılış sonu: toplam süreyi ve tracemalloc'un en büyük ayırmalarını kaydeder, raporu yazar."""
+        if not self.enabled:
+            return
+        self._startup_seconds = time.perf_counter() - self._start
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            self.tracemalloc_top = [
+                {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]
+            ]
+            current, peak = tracemalloc.get_traced_memory()
+            self.tracemalloc_totals = {"current_bytes": current, "peak_bytes": peak}
+            if self._owns_tracemalloc:
+                # İzleme her ayırmayı yavaşlatır ve iz belleği tutar; açılış ölçüldükten sonra servis bunu ödemesin
+                del snapshot
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+        print(f"🔬 Açılış tamamlandı: {self._startup_seconds:.2f} sn, RSS {current_rss_bytes() / 1e6:.1f} MB")
+        self.write_report()
+
+    def arm_requests(self, count=1):
+        """Sonraki `count` isteğin cProfile ile örneklenmesini ister."""
+        with self._lock:
+            self._armed_requests += count
+
+    def _should_profile_request(self):
+        with self._lock:
+            self._request_counter += 1
+            if self._request_profiling:
+                return False
+            if self._armed_requests > 0:
+                self._armed_requests -= 1
+            elif not (PROFILE_REQUEST_EVERY > 0 and self._request_counter % PROFILE_REQUEST_EVERY == 0):
+                return False
+            self._request_profiling = True
+            return True
+
+    @contextmanager
+    def request(self, name):
+        """İstek örneklenecekse cProfile ile profiller ve en pahalı fonksiyonları rapora ekler.
+
+        Yalnızca çağıran iş parçacığı ölçülür; embedding batcher'ın işçi iş parçacığındaki süre bekleme olarak görünür.
+        """
+        if not self.enabled or not self._should_profile_request():
+            yield
+            return
+        profile = cProfile.Profile()
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall = time.perf_counter() - start
+            stats = pstats.Stats(profile, stream=io.StringIO()).sort_stats("cumulative")
+            top = []
+            for (filename, lineno, function), (cc, ncalls, tottime, cumtime, _) in stats.stats.items():
+                top.append({"function": f"{os.path.basename(filename)}:{lineno}({function})", "ncalls": ncalls,
+                            "tottime": round(tottime, 5), "cumtime": round(cumtime, 5)})
+            top.sort(key=lambda item: item["cumtime"], reverse=True)
+            with self._lock:
+                self.requests.append({"name": name, "at": time.time(), "wall_seconds": round(wall, 4),
+                                      "rss_delta_bytes": current_rss_bytes() - rss_before,
+                                      "top_functions": top[:PROFILE_TOP_FUNCTIONS]})
+                del self.requests[:-MAX_REQUEST_SAMPLES]
+                self._request_profiling = False
+            print(f"🔬 İstek profili ({name}): {wall:.3f} sn")
+            self.write_report()
+
+    def report(self):
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "pid": os.getpid(),
+                "python": sys.version.split()[0],
+                "argv": sys.argv,
+                "startup_seconds": round(self._startup_seconds, 4) if self._startup_seconds is not None else None,
+                "rss_bytes": current_rss_bytes(),
+                "imports": [p for p in self.phases if p["name"].split("/")[-1].startswith("import:")],
+                "phases": list(self.phases),
+                "tracemalloc": {"totals": self.tracemalloc_totals, "top": list(self.tracemalloc_top)},
+                "requests": list(self.requests),
+            }
+
+    def write_report(self):
+        if not self.enabled:
+            return
+        # Eşzamanlı yazıcılar (istek profilleri, /admin/profile) birbirinin geçici dosyasını ezmesin diye benzersiz ad
+        directory = os.path.dirname(os.path.abspath(self.report_path))
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, prefix=".profile-",
+                                             suffix=".tmp", delete=False) as f:
+                tmp_path = f.name
+                json.dump(self.report(), f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.report_path)
+        except OSError as e:
+            print(f"⚠️ Profil raporu yazılamadı: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+# Süreç genelinde tek profilleyici
+profiler = StartupProfiler()
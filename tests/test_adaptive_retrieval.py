@@ -0,0 +1,53 @@
+import importlib
+
+import pytest
+
+import adaptive_retrieval
+from adaptive_retrieval import cutoff_index, select_relevant, similarity_from_distance
+
+
+@pytest.fixture
+def default_settings(monkeypatch):
+    """Ortam değişkenleri olmadan yüklenmiş modül (test sonrası gerçek ortamla yeniden yüklenir)."""
+    for name in ("RETRIEVAL_CUTOFF", "RETRIEVAL_MIN_SIMILARITY", "RETRIEVAL_MIN_GAP"):
+        monkeypatch.delenv(name, raising=False)
+    yield importlib.reload(adaptive_retrieval)
+    monkeypatch.undo()
+    importlib.reload(adaptive_retrieval)
+
+
+def test_default_mode_is_threshold_only(default_settings):
+    assert default_settings.RETRIEVAL_CUTOFF == "threshold"
+    # Kırılma kuralı kapalıyken düz bir kuyruk atılmaz
+    assert default_settings.cutoff_index([0.45, 0.30, 0.29, 0.28]) == 4
+
+
+@pytest.mark.parametrize("scores, mode, expected", [
+    ([0.45, 0.30, 0.29, 0.28], "gap", 1),
+    ([0.45, 0.30, 0.29, 0.28], "threshold", 4),
+    ([0.60, 0.55, 0.20, 0.18], "threshold", 2),
+    ([0.60, 0.55, 0.50, 0.18], "gap", 3),
+    ([0.70, 0.50, 0.45, 0.10], "both", 1),
+    ([0.50, 0.49, 0.48], "gap", 3), # kırılma eşiği aşılmıyor
+    ([0.10, 0.05], "threshold", 0), # alakalı sonuç yok
+    ([0.10, 0.05], "both", 0),
+    ([], "both", 0),
+    ([0.9], "gap", 1),
+])
+def test_cutoff_index_modes(scores, mode, expected):
+    assert cutoff_index(scores, min_similarity=0.25, min_gap=0.08, mode=mode) == expected
+
+
+def test_threshold_stops_at_first_score_below_floor():
+    assert cutoff_index([0.5, 0.4, 0.1, 0.3], min_similarity=0.25, mode="threshold") == 2
+
+
+def test_select_relevant_slices_all_lists_consistently():
+    ids, documents, metadatas, scores = select_relevant(["a", "b", "c"], ["A", "B", "C"], [{}, {}, {}], [0.5, 0.4, 0.01])
+    assert ids == ["a", "b"] and documents == ["A", "B"] and len(metadatas) == 2 and scores == [0.5, 0.4]
+
+
+def test_similarity_from_squared_l2_distance():
+    assert similarity_from_distance(0.0) == 1.0
+    assert similarity_from_distance(2.0) == 0.0
+    assert similarity_from_distance(4.0) == -1.0
@@ -0,0 +1,120 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("chromadb")
+pytest.importorskip("google.generativeai")
+from google.api_core import exceptions as google_exceptions
+from starlette.testclient import TestClient
+
+import api_server
+import travel_service
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(travel_service, "THUMBNAIL_CACHE_DIR", str(tmp_path / "thumbs"))
+    monkeypatch.setattr(travel_service, "thumbnail_index", None)
+    monkeypatch.setattr(travel_service, "is_ready", lambda: True)
+    monkeypatch.setattr(travel_service.snapshots, "current", lambda: SimpleNamespace(generation=1))
+    with TestClient(api_server.create_api_app()) as test_client:
+        yield test_client
+
+
+def answer(**overrides):
+    result = {"answer": "Kolezyum'u sabah gezin.", "city": "Roma", "is_route_request": False, "itinerary": None,
+              "images": [], "context": "bağlam", "error": None}
+    return {**result, **overrides}
+
+
+@pytest.mark.parametrize("days", [True, 2.7, "3", [3], 0, 15])
+def test_route_rejects_invalid_days(client, monkeypatch, days):
+    monkeypatch.setattr(travel_service, "plan_city_route", lambda *_: pytest.fail("planlayıcı çağrılmamalı"))
+    response = client.post("/route", json={"city": "Roma", "days": days})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("start_weekday", [True, 7, "Cumartesii", 1.5])
+def test_route_rejects_invalid_start_weekday(client, start_weekday):
+    assert client.post("/route", json={"city": "Roma", "start_weekday": start_weekday}).status_code == 400
+
+
+def test_route_passes_validated_arguments(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(travel_service, "plan_city_route", lambda *args: calls.append(args) or {"days": []})
+    response = client.post("/route", json={"city": "Roma", "days": 2, "start_weekday": "salı", "places": ["Pantheon"]})
+    assert response.status_code == 200
+    assert calls == [("Roma", ["Pantheon"], 2, 1)]
+    monkeypatch.setattr(travel_service, "plan_city_route", lambda *args: None)
+    assert client.post("/route", json={"city": "Atlantis"}).status_code == 404
+
+
+@pytest.mark.parametrize("body", [None, {}, {"question": "  "}, {"question": 3}, {"question": "Roma?", "location": [41, 12]}])
+def test_ask_rejects_invalid_body(client, body):
+    assert client.post("/ask", json=body).status_code == 400
+
+
+@pytest.mark.parametrize("query", ["lat=91&lon=0", "lat=0&lon=nan", "lat=0&lon=0&radius_km=-1", "lat=x&lon=0", "lon=0"])
+def test_nearby_rejects_invalid_coordinates(client, query):
+    assert client.get(f"/nearby?{query}").status_code == 400
+
+
+def test_endpoints_return_503_before_ready(client, monkeypatch):
+    monkeypatch.setattr(travel_service, "is_ready", lambda: False)
+    monkeypatch.setattr(travel_service.snapshots, "current", lambda: None)
+    assert client.get("/health").status_code == 503
+    assert client.post("/ask", json={"question": "Roma?"}).status_code == 503
+    assert client.post("/ask", json={"question": "Roma?", "stream": True}).status_code == 503
+    assert client.post("/route", json={"city": "Roma"}).status_code == 503
+    assert client.get("/nearby?lat=41.9&lon=12.5").status_code == 503
+
+
+def test_stream_is_newline_delimited_json(client, monkeypatch):
+    events = [
+        {"type": "meta", "city": "Roma", "is_route_request": False},
+        {"type": "delta", "text": "Kolezyum'u\nsabah "},
+        {"type": "delta", "text": "gezin."},
+        {"type": "final", **answer(), "context": "gizli bağlam"},
+    ]
+    monkeypatch.setattr(travel_service, "stream_answer", lambda question, location: iter(events))
+    response = client.post("/ask", json={"question": "Roma'da ne yapılır?", "stream": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.split("\n")
+    assert lines[-1] == "" and len(lines) == len(events) + 1
+    parsed = [json.loads(line) for line in lines[:-1]]
+    assert [event["type"] for event in parsed] == ["meta", "delta", "delta", "final"]
+    assert parsed[1]["text"] == "Kolezyum'u\nsabah " # metindeki satır sonu çerçeveyi bölmez
+    assert "context" not in parsed[-1] and parsed[-1]["answer"] == answer()["answer"]
+
+
+@pytest.mark.parametrize("error, status", [
+    (google_exceptions.ResourceExhausted("quota"), 429),
+    (google_exceptions.DeadlineExceeded("yavaş"), 504),
+    (google_exceptions.ServiceUnavailable("kapalı"), 503),
+    (google_exceptions.InvalidArgument("API key not valid"), 502),
+    (TimeoutError("embedding"), 504),
+    (travel_service.ShardUnavailableError("parça yok"), 503),
+    (KeyError("hata"), 500),
+])
+def test_service_failures_map_to_http_status(client, monkeypatch, error, status):
+    assert travel_service.error_status(error) == status
+    failed = travel_service.error_result("hata", status=travel_service.error_status(error))
+    monkeypatch.setattr(travel_service, "answer_question", lambda question, location: failed)
+    response = client.post("/ask", json={"question": "Roma?"})
+    assert response.status_code == status
+    assert response.json() == {"error": "hata"}
+
+
+def test_ask_returns_public_fields(client, monkeypatch):
+    monkeypatch.setattr(travel_service, "answer_question", lambda question, location: answer())
+    body = client.post("/ask", json={"question": "Roma?"}).json()
+    assert body["answer"] == answer()["answer"] and "context" not in body
+    assert client.post("/ask", json={"question": "Roma?", "include_context": True}).json()["context"] == "bağlam"
+
+
+def test_metrics_runs_service_metrics(client, monkeypatch):
+    monkeypatch.setattr(travel_service, "service_metrics", lambda: {"documents": 3})
+    assert client.get("/metrics").json() == {"documents": 3}
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from embedding_batcher import EmbeddingBatcher
+
+
+class FakeModel:
+    """Her metin için (uzunluk, çağrı no) döndüren, çağrıları kaydeden sahte model."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        self.started.set()
+        self.release.wait()
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [(len(text), len(self.calls)) for text in texts]
+
+
+def encode_concurrently(batcher, texts, timeout=5):
+    results = [None] * len(texts)
+
+    def worker(i, text):
+        try:
+            results[i] = batcher.encode(text, timeout=timeout)
+        except BaseException as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, text)) for i, text in enumerate(texts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout + 1)
+    return results
+
+
+def test_concurrent_queries_share_batches_and_duplicates_are_encoded_once():
+    model = FakeModel(delay=0.05)
+    batcher = EmbeddingBatcher(model, max_batch_size=4, max_wait_ms=50)
+    texts = ["a", "bb", "a", "ccc", "dddd", "bb", "e", "ff"]
+    results = encode_concurrently(batcher, texts)
+    assert [r[0] for r in results] == [len(t) for t in texts]
+    stats = batcher.stats()
+    assert stats["total_queries"] == len(texts)
+    assert stats["total_batches"] < len(texts)
+    assert max(stats["batch_size_histogram"]) <= 4
+    assert all(len(call) == len(set(call)) for call in model.calls)
+    batcher.close()
+
+
+def test_single_query_waits_at_most_max_wait():
+    batcher = EmbeddingBatcher(FakeModel(), max_batch_size=16, max_wait_ms=20)
+    start = time.monotonic()
+    assert batcher.encode("tek", timeout=2) == (3, 1)
+    assert time.monotonic() - start < 1
+    batcher.close()
+
+
+def test_model_error_is_raised_to_every_waiter_and_worker_survives():
+    model = FakeModel(error=ValueError("model hatası"))
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait_ms=30)
+    results = encode_concurrently(batcher, ["a", "b", "c"])
+    assert all(isinstance(r, ValueError) for r in results)
+    model.error = None
+    assert batcher.encode("yeni", timeout=2)[0] == 4
+    batcher.close()
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_worker_death_fails_pending_queries_instead_of_hanging():
+    model = FakeModel(error=SystemExit()) # BaseException: işçi iş parçacığı ölür
+    model.release.clear()
+    batcher = EmbeddingBatcher(model, max_batch_size=1, max_wait_ms=0)
+    results = []
+    first = threading.Thread(target=lambda: results.append(_capture(batcher.encode, "ilk")))
+    first.start()
+    assert model.started.wait(2)
+    queued = threading.Thread(target=lambda: results.append(_capture(batcher.encode, "kuyrukta")))
+    queued.start()
+    time.sleep(0.05)
+    model.release.set()
+    first.join(2)
+    queued.join(2)
+    assert not first.is_alive() and not queued.is_alive()
+    assert len(results) == 2 and all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError):
+        batcher.encode("sonra", timeout=1)
+    batcher._worker.join(2)
+
+
+def test_close_drains_queue_then_rejects_new_queries():
+    model = FakeModel()
+    model.release.clear()
+    batcher = EmbeddingBatcher(model, max_batch_size=1, max_wait_ms=0)
+    results = []
+    threads = [threading.Thread(target=lambda t=t: results.append(batcher.encode(t, timeout=5))) for t in ("a", "bb")]
+    for thread in threads:
+        thread.start()
+    assert model.started.wait(2)
+    time.sleep(0.05)
+    closer = threading.Thread(target=batcher.close)
+    closer.start()
+    model.release.set()
+    closer.join(2)
+    for thread in threads:
+        thread.join(2)
+    assert sorted(r[0] for r in results) == [1, 2]
+    with pytest.raises(RuntimeError):
+        batcher.encode("kapalı")
+
+
+def _capture(fn, *args):
+    try:
+        return fn(*args)
+    except BaseException as e:
+        return e
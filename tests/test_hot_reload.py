@@ -0,0 +1,125 @@
+import threading
+from types import SimpleNamespace
+
+from hot_reload import DataSnapshot, SnapshotManager, file_signature
+
+
+class FakeData(dict):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    def __init__(self):
+        self.deleted = []
+
+    def delete_collection(self, name):
+        self.deleted.append(name)
+
+
+def make_snapshot(generation, client, collection_name):
+    return DataSnapshot(generation, FakeData(), client, SimpleNamespace(name=collection_name), {},
+                        f"fingerprint-{generation}", ())
+
+
+def test_retired_snapshot_is_released_after_last_request_drains():
+    client = FakeClient()
+    manager = SnapshotManager()
+    first = make_snapshot(1, client, "koleksiyon_a")
+    manager.publish(first)
+
+    with manager.acquire() as used:
+        assert used is first and first.inflight == 1
+        manager.publish(make_snapshot(2, client, "koleksiyon_b"))
+        assert manager.current().generation == 2
+        # Devam eden istek eski nesli kullanmayı sürdürür; henüz bırakılmaz
+        assert first.retired and not first.data.closed and client.deleted == []
+
+    assert first.inflight == 0
+    assert first.data.closed
+    assert client.deleted == ["koleksiyon_a"]
+
+
+def test_idle_snapshot_is_released_immediately_on_publish():
+    client = FakeClient()
+    manager = SnapshotManager()
+    first = make_snapshot(1, client, "koleksiyon_a")
+    manager.publish(first)
+    manager.publish(make_snapshot(2, client, "koleksiyon_b"))
+    assert first.data.closed and client.deleted == ["koleksiyon_a"]
+
+
+def test_collection_shared_with_new_generation_is_not_dropped():
+    client = FakeClient()
+    manager = SnapshotManager()
+    first = make_snapshot(1, client, "ayni_icerik")
+    manager.publish(first)
+    manager.publish(make_snapshot(2, client, "ayni_icerik"))
+    assert first.data.closed
+    assert client.deleted == []
+
+
+def test_release_failure_does_not_reach_the_request(capsys):
+    class BrokenData(FakeData):
+        def close(self):
+            raise OSError("mmap kapatılamadı")
+
+    client = FakeClient()
+    manager = SnapshotManager()
+    first = DataSnapshot(1, BrokenData(), client, SimpleNamespace(name="koleksiyon_a"), {}, "fingerprint-1", ())
+    manager.publish(first)
+
+    with manager.acquire() as used:
+        manager.publish(make_snapshot(2, client, "koleksiyon_b"))
+        result = used.generation
+    # İstek kendi sonucunu alır; bırakma hatası yalnızca loglanır
+    assert result == 1
+    assert "bırakılırken hata" in capsys.readouterr().out
+    assert first.inflight == 0
+    with manager.acquire() as used:
+        assert used.generation == 2
+
+
+def test_acquire_without_snapshot_yields_none():
+    with SnapshotManager().acquire() as snapshot:
+        assert snapshot is None
+
+
+def test_concurrent_requests_pin_their_generation():
+    client = FakeClient()
+    manager = SnapshotManager()
+    first = make_snapshot(1, client, "koleksiyon_a")
+    manager.publish(first)
+    entered = threading.Barrier(5)
+    release = threading.Event()
+    seen = []
+
+    def request():
+        with manager.acquire() as snapshot:
+            entered.wait(2)
+            release.wait(2)
+            seen.append(snapshot.generation)
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    entered.wait(2)
+    manager.publish(make_snapshot(2, client, "koleksiyon_b"))
+    assert first.inflight == 4 and not first.data.closed
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert seen == [1, 1, 1, 1]
+    assert first.inflight == 0 and first.data.closed
+    assert client.deleted == ["koleksiyon_a"]
+
+
+def test_file_signature_changes_with_content(tmp_path):
+    path = tmp_path / "travel_routes.json"
+    missing = file_signature([str(path)])
+    path.write_text("{}", encoding="utf-8")
+    created = file_signature([str(path)])
+    path.write_text('{"Paris": {}}', encoding="utf-8")
+    assert missing != created != file_signature([str(path)])
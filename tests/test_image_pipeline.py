@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+import image_pipeline
+from image_pipeline import CacheHeadersMiddleware, ThumbnailIndex, manifest_path_for
+
+
+def write_image(path, size=(1600, 1200), color=(200, 80, 40)):
+    Image.new("RGB", size, color).save(path, "JPEG", quality=95)
+    return str(path)
+
+
+def test_thumbnail_is_resized_webp_named_by_content(tmp_path):
+    source = write_image(tmp_path / "kolezyum.jpg")
+    index = ThumbnailIndex(str(tmp_path / "cache"))
+    entry = index.ensure(source)
+
+    assert os.path.basename(entry["path"]) == f"{image_pipeline._content_key(open(source, 'rb').read())}.webp"
+    assert (entry["width"], entry["height"]) == (480, 360)
+    with Image.open(entry["path"]) as thumb:
+        assert thumb.format == "WEBP" and thumb.size == (480, 360)
+    assert os.path.getsize(entry["path"]) < os.path.getsize(source)
+
+    # Aynı içerikli başka bir görsel aynı küçük resmi paylaşır
+    copy = tmp_path / "kopya.jpg"
+    copy.write_bytes(open(source, "rb").read())
+    assert index.ensure(str(copy))["path"] == entry["path"]
+
+
+def test_fresh_entry_is_a_cache_hit(tmp_path, monkeypatch):
+    source = write_image(tmp_path / "pantheon.jpg")
+    index = ThumbnailIndex(str(tmp_path / "cache"))
+    entry = index.ensure(source)
+    monkeypatch.setattr(image_pipeline, "_make_thumbnail", lambda *_: pytest.fail("yeniden üretilmemeli"))
+    monkeypatch.setattr(image_pipeline, "_content_key", lambda *_: pytest.fail("yeniden özetlenmemeli"))
+    assert index.ensure(source) is entry
+    assert index.get(source) is entry
+
+
+def test_changed_source_mtime_rebuilds_thumbnail(tmp_path):
+    source = write_image(tmp_path / "trevi.jpg")
+    index = ThumbnailIndex(str(tmp_path / "cache"))
+    first = index.ensure(source)
+    write_image(source, size=(800, 1600), color=(10, 120, 200))
+    os.utime(source, (first["source_mtime"] + 10, first["source_mtime"] + 10))
+
+    second = index.ensure(source)
+    assert second["path"] != first["path"]
+    assert (second["width"], second["height"]) == (240, 480)
+
+
+def test_manifest_is_kept_outside_the_served_directory(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    (cache_dir / "manifest.json").write_text("{}", encoding="utf-8") # eski sürümden kalan
+    source = write_image(tmp_path / "louvre.jpg")
+    index = ThumbnailIndex(str(cache_dir))
+    assert index.build_all({"Paris": {"Places": {"Louvre": {"image": source}, "Eksik": {"image": "yok.jpg"}}}}) == 1
+
+    assert os.listdir(cache_dir) == [os.path.basename(index.get(source)["path"])]
+    assert os.path.exists(manifest_path_for(str(cache_dir)))
+    assert ThumbnailIndex(str(cache_dir)).get(source)["path"] == index.get(source)["path"]
+
+
+def test_concurrent_builds_of_the_same_image_do_not_collide(tmp_path):
+    source = write_image(tmp_path / "vatikan.jpg")
+    cache_dir = str(tmp_path / "cache")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ThumbnailIndex(cache_dir).ensure(source))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(results) == 8 and all(results)
+    assert len({entry["path"] for entry in results}) == 1
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+
+
+def served_headers(path):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"cache-control", b"no-cache")]})
+        await send({"type": "http.response.body", "body": b""})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    middleware = CacheHeadersMiddleware(app, path_fragment="/thumbnails/")
+    asyncio.run(middleware({"type": "http", "path": path}, None, send))
+    return dict(messages[0]["headers"])
+
+
+def test_only_content_addressed_webp_files_are_immutable():
+    assert served_headers("/thumbnails/0123456789abcdef01234567.webp")[b"cache-control"] == image_pipeline.CACHE_CONTROL_HEADER
+    assert served_headers("/thumbnails/manifest.json")[b"cache-control"] == b"no-cache"
+    assert served_headers("/thumbnails/kolezyum.webp")[b"cache-control"] == b"no-cache"
+    assert served_headers("/api/0123456789abcdef01234567.webp")[b"cache-control"] == b"no-cache"
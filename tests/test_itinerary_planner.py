@@ -0,0 +1,106 @@
+import pytest
+
+import itinerary_planner
+from itinerary_planner import (balanced_kmeans, format_itinerary_markdown, order_day, parse_closed_weekdays,
+                               places_from_city, plan_itinerary)
+
+
+def place(name, lat, lon, minutes=60, closed=()):
+    return {"name": name, "latitude": lat, "longitude": lon, "visit_minutes": minutes, "closed_weekdays": set(closed)}
+
+
+def route_km(ordered):
+    return sum(itinerary_planner.haversine_km(a["latitude"], a["longitude"], b["latitude"], b["longitude"])
+               for a, b in zip(ordered, ordered[1:]))
+
+
+def names(itinerary):
+    return [[stop["name"] for stop in day["places"]] for day in itinerary["days"]]
+
+
+def test_clusters_are_balanced_and_follow_geography():
+    # Üç ayrı semt, semt başına üç yer
+    groups = [(41.89, 12.49), (41.90, 12.45), (41.93, 12.47)]
+    points = [(lat + i * 0.002, lon + i * 0.002) for lat, lon in groups for i in range(3)]
+    assignment = balanced_kmeans([(lon * 83, lat * 110) for lat, lon in points], 3)
+    assert sorted(assignment.count(j) for j in range(3)) == [3, 3, 3]
+    assert len({assignment[i] for i in range(0, 3)}) == 1 and len({assignment[i] for i in range(3, 6)}) == 1
+
+    itinerary = plan_itinerary([place(f"{g}{i}", lat, lon) for g, (lat, lon) in zip("ABC", points[::3]) for i in range(3)]
+                               + [place("D0", 41.891, 12.491)], num_days=2, start_weekday=0)
+    assert sorted(len(day) for day in names(itinerary)) == [5, 5]
+
+
+def test_day_order_beats_input_order():
+    line = [place(f"P{i}", 41.90, 12.40 + i * 0.01) for i in range(7)]
+    shuffled = [line[i] for i in (3, 0, 6, 1, 5, 2, 4)]
+    ordered = order_day(shuffled)
+    assert route_km(ordered) < route_km(shuffled)
+    assert [p["name"] for p in ordered] in ([f"P{i}" for i in range(7)], [f"P{i}" for i in reversed(range(7))])
+    assert order_day(line[:2]) == line[:2]
+
+
+def test_place_on_its_closed_day_is_moved_to_an_open_day():
+    near = [place("A", 41.890, 12.490), place("B", 41.891, 12.491), place("C", 41.892, 12.492, closed=[0])]
+    far = [place("D", 41.930, 12.450), place("E", 41.931, 12.451), place("F", 41.932, 12.452, closed=[0, 1])]
+    itinerary = plan_itinerary(near + far, num_days=2, start_weekday=0)
+    days = names(itinerary)
+    assert [day["weekday"] for day in itinerary["days"]] == ["Pazartesi", "Salı"]
+    assert "C" in days[1] # Pazartesi kapalı
+    assert "F" not in sum(days, []) # iki plan gününde de kapalı
+    assert itinerary["unscheduled"] == [{"name": "F", "reason": "Plan günlerinin hepsinde kapalı"}]
+
+
+def test_places_without_coordinates_are_unscheduled():
+    itinerary = plan_itinerary([place("A", 41.89, 12.49), place("Kayıp", None, 12.49)], num_days=3, start_weekday=2)
+    assert names(itinerary) == [["A"], [], []]
+    assert itinerary["unscheduled"] == [{"name": "Kayıp", "reason": "Koordinat bilgisi yok"}]
+    markdown = format_itinerary_markdown(itinerary, "Roma")
+    assert "3 Günlük Rota" in markdown and "Kayıp (Koordinat bilgisi yok)" in markdown
+
+
+def test_over_budget_day_hands_places_to_a_day_with_room():
+    packed = [place(f"A{i}", 41.890 + i * 0.001, 12.490, minutes=150) for i in range(4)]
+    light = [place("B", 41.930, 12.450, minutes=30)]
+    itinerary = plan_itinerary(packed + light, num_days=2, start_weekday=0, day_budget_minutes=480)
+    assert all(not day["over_budget"] for day in itinerary["days"])
+    assert sorted(len(day) for day in names(itinerary)) == [2, 3]
+
+
+def test_rebalance_reorders_only_changed_days(monkeypatch):
+    calls = []
+    original = itinerary_planner.order_day
+    monkeypatch.setattr(itinerary_planner, "order_day", lambda places: calls.append(len(places)) or original(places))
+    centers = [(41.89, 12.49), (41.90, 12.45), (41.93, 12.47), (41.87, 12.50)]
+    spots = [place(f"{g}{i}", lat + i * 0.001, lon, minutes=150 if g == "A" else 20)
+             for g, (lat, lon) in zip("ABCD", centers) for i in range(4)]
+    itinerary = plan_itinerary(spots, num_days=4, start_weekday=0, day_budget_minutes=420)
+
+    assert all(not day["over_budget"] for day in itinerary["days"])
+    moved = sum(1 for day in names(itinerary) for name in day if name.startswith("A")) - max(
+        sum(1 for name in day if name.startswith("A")) for day in names(itinerary))
+    assert moved == 2
+    # 4 ilk sıralama + aktarım başına 2 gün + 4 plan çıktısı (aday başına sıralama yok)
+    assert len(calls) == 4 + 2 * moved + 4
+
+
+@pytest.mark.parametrize("text, closed", [
+    ("Salı günleri kapalıdır.", {1}),
+    ("Pazartesi ve Perşembe kapalı.", {0, 3}),
+    ("Pazartesi kapalı değildir, her gün açık.", set()),
+    ("Pazar günü kapalı olmaz; Cuma kapalıdır.", {4}),
+    ("Pazartesi hariç her gün açık.", set()),
+    (None, set()),
+])
+def test_closed_weekdays_from_tips(text, closed):
+    assert parse_closed_weekdays(text) == closed
+
+
+def test_places_from_city_reads_extras():
+    city = {"Places": {"Vatikan": {"latitude": 41.9, "longitude": 12.45, "tips": "Pazar günü kapalıdır.",
+                                   "closed_days": ["Salı"], "visit_minutes": 180},
+                       "Pantheon": {"latitude": 41.89, "longitude": 12.47}}}
+    vatikan, pantheon = places_from_city(city)
+    assert vatikan["closed_weekdays"] == {1, 6} and vatikan["visit_minutes"] == 180
+    assert pantheon["visit_minutes"] == itinerary_planner.DEFAULT_VISIT_MINUTES
+    assert places_from_city(city, ["Yok", "Pantheon"]) == [pantheon]
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import model_catalog
+from model_catalog import FALLBACK_MODELS, ModelCatalog, ModelRouter, INTENT_QA, stub_list_models
+
+
+class FlakyListModels:
+    def __init__(self, fail=True):
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("API'ye ulaşılamadı")
+        return stub_list_models()
+
+
+def test_choose_never_calls_the_api(tmp_path):
+    list_models = FlakyListModels(fail=False)
+    catalog = ModelCatalog(path=str(tmp_path / "catalog.json"), refresh_hours=0, list_models_fn=list_models)
+    router = ModelRouter(catalog)
+
+    assert catalog.models() == FALLBACK_MODELS
+    for _ in range(20):
+        router.choose(INTENT_QA, 100)
+    assert list_models.calls == 0
+    assert router.choose(INTENT_QA, 100) == model_catalog.STRONG_MODEL # yedek listede hafif model yok
+
+
+def test_choose_does_not_wait_for_a_slow_refresh(tmp_path):
+    release = threading.Event()
+
+    def slow_list_models():
+        release.wait(5)
+        return stub_list_models()
+
+    catalog = ModelCatalog(path=str(tmp_path / "catalog.json"), list_models_fn=slow_list_models)
+    router = ModelRouter(catalog)
+    refresher = threading.Thread(target=catalog.refresh)
+    refresher.start()
+    start = time.monotonic()
+    assert router.choose(INTENT_QA, 100) == model_catalog.STRONG_MODEL
+    assert time.monotonic() - start < 1
+    release.set()
+    refresher.join(5)
+    assert router.choose(INTENT_QA, 100) == model_catalog.LIGHT_MODEL
+
+
+def test_failed_startup_fetch_falls_back_and_backs_off(tmp_path, monkeypatch):
+    list_models = FlakyListModels()
+    catalog = ModelCatalog(path=str(tmp_path / "catalog.json"), refresh_hours=1, list_models_fn=list_models)
+    catalog.start()
+    catalog.stop()
+    assert catalog.models() == FALLBACK_MODELS
+    assert list_models.calls == 1
+    catalog.refresh(force=False)
+    assert list_models.calls == 1 # başarısız denemeden sonra aralık dolana kadar API'ye gidilmez
+
+    now = model_catalog.time.time()
+    monkeypatch.setattr(model_catalog.time, "time", lambda: now + 3601)
+    list_models.fail = False
+    names = {m["name"] for m in catalog.refresh(force=False)}
+    assert list_models.calls == 2
+    assert model_catalog.LIGHT_MODEL in names
+    assert ModelRouter(catalog).choose(INTENT_QA, 100) == model_catalog.LIGHT_MODEL
+
+
+def test_background_timer_refreshes_when_due(tmp_path):
+    list_models = FlakyListModels(fail=False)
+    # ~1 saniyelik aralık: zamanlayıcının en kısa beklemesi
+    catalog = ModelCatalog(path=str(tmp_path / "catalog.json"), refresh_hours=0.5 / 3600, list_models_fn=list_models)
+    catalog.start()
+    assert list_models.calls == 1
+    deadline = time.monotonic() + 5
+    while list_models.calls < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    catalog.stop()
+    assert list_models.calls >= 2
+
+
+def test_fresh_disk_catalog_is_used_without_fetching(tmp_path):
+    path = str(tmp_path / "catalog.json")
+    ModelCatalog(path=path, list_models_fn=stub_list_models).refresh()
+
+    list_models = FlakyListModels()
+    catalog = ModelCatalog(path=path, list_models_fn=list_models)
+    catalog.start()
+    catalog.stop()
+    assert list_models.calls == 0
+    assert catalog.supports(model_catalog.LIGHT_MODEL)
+
+
+def test_stale_disk_catalog_is_kept_when_refresh_fails(tmp_path):
+    path = str(tmp_path / "catalog.json")
+    ModelCatalog(path=path, list_models_fn=stub_list_models).refresh()
+
+    list_models = FlakyListModels()
+    catalog = ModelCatalog(path=path, refresh_hours=0, list_models_fn=list_models)
+    names = {m["name"] for m in catalog.refresh(force=False)}
+    assert model_catalog.LIGHT_MODEL in names # diskteki liste korunur, FALLBACK'e düşülmez
+    assert list_models.calls == 1
+
+
+def test_forced_refresh_ignores_backoff(tmp_path):
+    list_models = FlakyListModels()
+    catalog = ModelCatalog(path=str(tmp_path / "catalog.json"), list_models_fn=list_models)
+    catalog.refresh(force=False)
+    list_models.fail = False
+    catalog.refresh()
+    assert list_models.calls == 2
+    assert catalog.supports(model_catalog.LIGHT_MODEL)
@@ -0,0 +1,77 @@
+import json
+import os
+import stat
+import time
+
+import query_cache
+from query_cache import LruCache, QueryLog
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_record_does_not_touch_disk_until_flush(tmp_path):
+    path = tmp_path / "veri" / "query_log.jsonl"
+    log = QueryLog(str(path), flush_seconds=60)
+    log.record("Paris'te ne yenir?")
+    log.record("  paris'te ne yenir?  ")
+    log.record("Roma için 3 günlük plan")
+    assert not path.exists()
+    assert log.top(1) == ["Paris'te ne yenir?"]
+
+    log.flush()
+    assert [entry["q"] for entry in read_lines(path)] == ["Paris'te ne yenir?", "paris'te ne yenir?", "Roma için 3 günlük plan"]
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    log.close()
+
+    reopened = QueryLog(str(path), flush_seconds=60)
+    assert reopened.top(2) == ["Paris'te ne yenir?", "Roma için 3 günlük plan"]
+    reopened.close()
+
+
+def test_background_writer_flushes_and_close_writes_the_rest(tmp_path):
+    path = tmp_path / "query_log.jsonl"
+    log = QueryLog(str(path), flush_seconds=0.01)
+    log.record("ilk soru")
+    deadline = time.monotonic() + 2
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert read_lines(path) == [{"q": "ilk soru"}]
+    log.close()
+    log.record("kapanıştan önce kuyrukta")
+    log.flush()
+    assert len(read_lines(path)) == 2
+
+
+def test_compaction_keeps_frequent_questions_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(query_cache, "QUERY_LOG_MAX_LINES", 10)
+    path = tmp_path / "query_log.jsonl"
+    log = QueryLog(str(path), flush_seconds=60)
+    for _ in range(6):
+        log.record("sık soru")
+    for i in range(6):
+        log.record(f"seyrek soru {i}")
+    log.flush()
+    entries = read_lines(path)
+    assert len(entries) == 5
+    assert entries[0] == {"q": "sık soru", "count": 6}
+    log.record("sık soru")
+    log.flush()
+    log.close()
+    assert QueryLog(str(path), flush_seconds=60).top(1) == ["sık soru"]
+    assert sum(entry.get("count", 1) for entry in read_lines(path) if entry["q"] == "sık soru") == 7
+
+
+def test_lru_cache_evicts_and_expires(monkeypatch):
+    cache = LruCache(2, ttl_seconds=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3) # en az yakın zamanda kullanılan "b" atılır
+    assert cache.get("b") is None and cache.get("c") == 3
+    now = query_cache.time.time()
+    monkeypatch.setattr(query_cache.time, "time", lambda: now + 11)
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
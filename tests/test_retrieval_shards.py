@@ -0,0 +1,139 @@
+import socket
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("chromadb")
+
+import retrieval_shards
+from retrieval_shards import ShardCluster, ShardServer, ShardUnavailableError, partition_cities, where_cities
+
+CITIES = ["Paris", "Roma", "Berlin", "Madrid", "Viyana", "Prag"]
+
+
+@pytest.fixture
+def sharded():
+    cluster = ShardCluster.start_local(3)
+    collection = cluster.get_or_create_collection("test_routes")
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(60, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"doc-{i}" for i in range(len(vectors))]
+    metadatas = [{"source_city": CITIES[i % len(CITIES)], "place_name": f"yer {i}"} for i in range(len(vectors))]
+    collection.upsert(ids=ids, documents=[f"metin {i}" for i in ids], metadatas=metadatas, embeddings=vectors)
+    yield cluster, collection, vectors, ids, metadatas
+    cluster.close()
+
+
+def brute_force(vectors, ids, query, n, allowed=None):
+    distances = np.sum((vectors - query) ** 2, axis=1)
+    order = [i for i in np.argsort(distances) if allowed is None or allowed(i)]
+    return [ids[i] for i in order[:n]]
+
+
+def test_query_merges_all_shards_like_a_single_index(sharded):
+    cluster, collection, vectors, ids, _ = sharded
+    assert collection.count() == len(ids)
+    for query in vectors[:5] + 0.05:
+        result = collection.query(query_embeddings=[query], n_results=7)
+        assert result["partial"] is False
+        assert result["ids"][0] == brute_force(vectors, ids, query, 7)
+        assert result["distances"][0] == sorted(result["distances"][0])
+
+
+def test_city_filter_goes_only_to_owner_shard(sharded):
+    cluster, collection, vectors, ids, metadatas = sharded
+    result = collection.query(query_embeddings=[vectors[3]], n_results=4, where={"source_city": "Madrid"})
+    assert result["ids"][0] == brute_force(vectors, ids, vectors[3], 4, lambda i: metadatas[i]["source_city"] == "Madrid")
+    assert cluster.stats()["targeted_queries"] == 1
+
+
+def test_dead_shard_gives_partial_result_and_strict_count(sharded, monkeypatch):
+    cluster, collection, vectors, ids, metadatas = sharded
+    dead = cluster.shards[1]
+    dead_cities = {city for city, shard in collection.owners.items() if shard is dead}
+    process = cluster.processes[1]
+    process.kill()
+    process.wait()
+
+    result = collection.query(query_embeddings=[vectors[0]], n_results=10)
+    assert result["partial"] is True
+    assert result["ids"][0] == brute_force(vectors, ids, vectors[0], 10,
+                                           lambda i: metadatas[i]["source_city"] not in dead_cities)
+    assert not dead.healthy # geri çekilme süresince denenmez
+
+    with pytest.raises(ShardUnavailableError):
+        collection.count()
+    with pytest.raises(ShardUnavailableError):
+        collection.get() # eksik doküman listesi önbelleğe girmesin diye kısmi sonuç yok
+    assert len(collection.get(where={"source_city": sorted(set(CITIES) - dead_cities)[0]})["ids"]) == 10
+    with pytest.raises(ShardUnavailableError):
+        collection.query(query_embeddings=[vectors[0]], n_results=3, where={"source_city": sorted(dead_cities)[0]})
+
+
+def test_wrong_authkey_is_rejected(sharded):
+    cluster = sharded[0]
+    intruder = retrieval_shards.ShardClient("intruder", cluster.shards[0].address, "x" * 32)
+    with pytest.raises(retrieval_shards.ShardAuthError):
+        intruder.call({"op": "ping"})
+
+
+def test_stale_pooled_connection_is_retried_on_a_fresh_one(sharded):
+    cluster = sharded[0]
+    shard = cluster.shards[0]
+    shard.call({"op": "ping"})
+    # Parça yeniden başlamış gibi: havuzdaki bağlantının karşı ucu kapanmış
+    stale, peer = socket.socketpair()
+    peer.close()
+    with shard._lock:
+        shard._idle.append(stale)
+    assert shard.call({"op": "ping"})["pid"] == cluster.processes[0].pid
+    assert shard.healthy
+
+
+def test_unauthenticated_peer_cannot_send_large_frames(sharded):
+    address = sharded[0].shards[0].address
+    with socket.create_connection(address, timeout=2) as raw:
+        challenge = retrieval_shards.recv_frame(raw, time.monotonic() + 2)
+        assert "nonce" in challenge
+        raw.sendall(retrieval_shards._FRAME_HEADER.pack(64 * 1024 * 1024))
+        assert raw.recv(1) == b"" # gövde beklenmeden bağlantı kapatılır
+
+
+def test_server_caps_concurrent_connections():
+    server = ShardServer(max_connections=2)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        address = probe.getsockname()
+    threading.Thread(target=server.serve, args=(address, "k" * 32), daemon=True).start()
+    deadline = time.monotonic() + 5
+    held = []
+    while time.monotonic() < deadline and not held:
+        try:
+            held.append(socket.create_connection(address, timeout=2))
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    held.append(socket.create_connection(address, timeout=2))
+    for sock in held:
+        assert "nonce" in retrieval_shards.recv_frame(sock, time.monotonic() + 2)
+    with socket.create_connection(address, timeout=2) as rejected:
+        assert rejected.recv(1) == b""
+    for sock in held:
+        sock.close()
+
+
+def test_authkey_is_required():
+    with pytest.raises(ValueError):
+        retrieval_shards.require_authkey("")
+    with pytest.raises(ValueError):
+        ShardCluster([("127.0.0.1", 7001)], authkey="kisa")
+
+
+def test_partition_and_where_helpers():
+    owners = partition_cities({"A": 10, "B": 6, "C": 5, "D": 1}, 2)
+    assert owners == {"A": 0, "B": 1, "C": 1, "D": 0}
+    assert where_cities({"$and": [{"place_name": "x"}, {"source_city": {"$in": ["A", "B"]}}]}) == {"A", "B"}
+    assert where_cities({"source_city": "A"}) == {"A"}
+    assert where_cities({"place_name": "x"}) is None
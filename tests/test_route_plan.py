@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from itinerary_planner import plan_grouped_itinerary, plan_itinerary
+from prompt_templates import ROUTE_MAX_DAYS, parse_route_plan, route_candidate_ids
+
+CANDIDATES = route_candidate_ids(["Kolezyum", "Trevi Çeşmesi", "Vatikan Müzeleri", "Pantheon"])
+
+
+def route_json(days, summary="Roma turu"):
+    return json.dumps({"summary": summary, "days": days}, ensure_ascii=False)
+
+
+def test_keeps_day_grouping_in_day_order():
+    plan = parse_route_plan(route_json([
+        {"day": 2, "place_ids": ["p3"]},
+        {"day": 1, "place_ids": ["p1", "p2"]},
+    ]), CANDIDATES)
+    assert plan == {"summary": "Roma turu", "days": [["Kolezyum", "Trevi Çeşmesi"], ["Vatikan Müzeleri"]], "planned_days": 2}
+
+
+@pytest.mark.parametrize("place_ids", [[["p1"]], [{"id": "p1"}], [1, None], "p1", {"p1": 1}])
+def test_non_string_ids_are_ignored(place_ids):
+    plan = parse_route_plan(route_json([{"day": 1, "place_ids": place_ids}, {"day": 2, "place_ids": ["p4"]}]), CANDIDATES)
+    assert plan["days"] == [["Pantheon"]]
+    assert plan["planned_days"] == 2 # boşalan gün, gün sayısından düşmez
+
+
+def test_unknown_and_repeated_ids_are_dropped():
+    plan = parse_route_plan(route_json([
+        {"day": 1, "place_ids": ["p1", "p9", "p1"]},
+        {"day": 2, "place_ids": ["p1", "p2"]},
+    ]), CANDIDATES)
+    assert plan["days"] == [["Kolezyum"], ["Trevi Çeşmesi"]]
+
+
+def test_days_beyond_the_limit_are_truncated():
+    candidates = route_candidate_ids([f"Yer {i}" for i in range(20)])
+    plan = parse_route_plan(route_json([{"day": i + 1, "place_ids": [f"p{i + 1}"]} for i in range(20)]), candidates)
+    assert plan["planned_days"] == ROUTE_MAX_DAYS
+    assert len(plan["days"]) == ROUTE_MAX_DAYS and plan["days"][-1] == [f"Yer {ROUTE_MAX_DAYS - 1}"]
+
+
+@pytest.mark.parametrize("text", [
+    "rota yok",
+    None,
+    json.dumps([]),
+    json.dumps({"days": "p1"}),
+    json.dumps({"days": [{"day": 1, "place_ids": ["p9"]}]}),
+    json.dumps({"days": [1, "x", None]}),
+])
+def test_unusable_output_raises_value_error(text):
+    with pytest.raises(ValueError):
+        parse_route_plan(text, CANDIDATES)
+
+
+def place(name, lat, lon, closed=()):
+    return {"name": name, "latitude": lat, "longitude": lon, "visit_minutes": 60, "closed_weekdays": set(closed)}
+
+
+def test_grouped_itinerary_keeps_groups_and_orders_within_day():
+    a, b, c = place("A", 41.89, 12.49), place("B", 41.90, 12.48), place("C", 41.91, 12.45)
+    itinerary = plan_grouped_itinerary([[a, c], [b]], start_weekday=0)
+    assert [[p["name"] for p in day["places"]] for day in itinerary["days"]] in ([["A", "C"], ["B"]], [["C", "A"], ["B"]])
+    assert [day["weekday"] for day in itinerary["days"]] == ["Pazartesi", "Salı"]
+
+
+def test_grouped_itinerary_rejects_closed_day_and_missing_coordinates():
+    closed_on_tuesday = place("B", 41.90, 12.48, closed=[1])
+    assert plan_grouped_itinerary([[place("A", 41.89, 12.49)], [closed_on_tuesday]], start_weekday=0) is None
+    assert plan_grouped_itinerary([[place("A", None, 12.49)]], start_weekday=0) is None
+    # Aynı yerler yeniden gruplandığında kapalı gün dikkate alınır
+    itinerary = plan_itinerary([place("A", 41.89, 12.49), closed_on_tuesday], num_days=2, start_weekday=0)
+    assert "B" in [p["name"] for p in itinerary["days"][0]["places"]]
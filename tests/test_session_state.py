@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import session_state
+from embedding_storage import quantize
+from session_state import SessionState, release_session, session_for
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def roma_candidates():
+    ids = ["kolezyum", "pantheon", "trevi", "vatikan"]
+    documents = [f"# Yer: {name}" for name in ids]
+    metadatas = [{"source_city": "Roma", "place_name": name} for name in ids]
+    embeddings = np.stack([unit(1, 0, 0), unit(0, 1, 0), unit(1, 1, 0), unit(0, 0, 1)]) * 3 # normalize edilmeli
+    return ids, documents, metadatas, embeddings
+
+
+def test_candidates_are_sorted_by_first_query_and_reranked_locally():
+    session = SessionState()
+    session.set_candidates("Roma", *roma_candidates(), query_vector=unit(0, 0, 1), generation=1)
+    assert session.ids[0] == "vatikan"
+    assert session.has_candidates("Roma", 1)
+    assert not session.has_candidates("Roma", 2) # hot-reload sonrası eski nesil kullanılmaz
+    assert not session.has_candidates("Paris", 1)
+
+    ids, documents, metadatas, scores = session.rerank(unit(1, 0.1, 0), 2)
+    assert ids == ["kolezyum", "trevi"]
+    assert documents == ["# Yer: kolezyum", "# Yer: trevi"] and metadatas[1]["place_name"] == "trevi"
+    assert scores[0] == pytest.approx(float(unit(1, 0.1, 0) @ unit(1, 0, 0)), abs=1e-5)
+    assert session.reused_retrievals == 1
+
+
+def test_int8_storage_keeps_ranking(monkeypatch):
+    monkeypatch.setattr(session_state, "quantize", lambda matrix: quantize(matrix, "int8"))
+    session = SessionState()
+    session.set_candidates("Roma", *roma_candidates())
+    assert session.embeddings.dtype == np.int8
+    assert session.rerank(unit(0, 1, 0.2), 1)[0] == ["pantheon"]
+
+
+def test_memory_cap_drops_least_relevant_candidates(monkeypatch):
+    session = SessionState()
+    session.set_candidates("Roma", *roma_candidates(), query_vector=unit(1, 0, 0))
+    full = session.nbytes()
+    row = full // 4
+    monkeypatch.setattr(session_state, "SESSION_MAX_BYTES", full - 1)
+    session.enforce_memory_cap()
+    assert session.ids == ["kolezyum", "trevi", "pantheon"] # en az ilgili "vatikan" atıldı
+    assert len(session.embeddings) == 3 and session.nbytes() <= full - 1
+
+    monkeypatch.setattr(session_state, "SESSION_MAX_BYTES", row // 2)
+    session.enforce_memory_cap()
+    assert not session.has_candidates("Roma") and session.city is None
+
+
+def test_memory_cap_trims_old_history_before_candidates(monkeypatch):
+    session = SessionState()
+    session.set_candidates("Roma", *roma_candidates())
+    candidates = session.nbytes()
+    for i in range(3):
+        session.add_turn(f"soru {i}", "x" * 100)
+    monkeypatch.setattr(session_state, "SESSION_MAX_BYTES", candidates + 120)
+    session.enforce_memory_cap()
+    assert session.recent_questions() == ["soru 2"]
+    assert len(session.ids) == 4
+
+
+def test_history_keeps_last_turns_and_answer_prefix():
+    session = SessionState()
+    for i in range(session_state.SESSION_HISTORY_TURNS + 2):
+        session.add_turn(f"soru {i}", "cevap " * 200)
+    assert session.recent_questions() == [f"soru {i}" for i in range(2, session_state.SESSION_HISTORY_TURNS + 2)]
+    assert all(len(answer) == session_state.HISTORY_ANSWER_CHARS for _, answer in session.history)
+
+
+def test_expired_session_is_replaced_and_released(monkeypatch):
+    session = SessionState()
+    session.set_candidates("Roma", *roma_candidates())
+    session.add_turn("soru", "cevap")
+    assert session_for(session) is session
+
+    now = session.last_used + session_state.SESSION_IDLE_TTL_SECONDS + 1
+    assert session.is_expired(now)
+    monkeypatch.setattr(session_state.time, "time", lambda: now)
+    fresh = session_for(session)
+    assert fresh is not session and fresh.city is None
+    assert session.embeddings is None and not session.history
+    assert isinstance(session_for(None), SessionState)
+
+    other = SessionState()
+    other.set_candidates("Roma", *roma_candidates())
+    release_session(other)
+    assert other.ids == []
+
+
+def test_follow_up_reuses_candidates_unless_another_city_is_named(monkeypatch):
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("chromadb")
+    pytest.importorskip("google.generativeai")
+    import travel_service
+
+    data = {"Roma": {"Places": {"Kolezyum": {}, "Pantheon": {}}}, "Paris": {"Places": {"Louvre": {}}}}
+    snapshot = SimpleNamespace(generation=7, data=data)
+    session = SessionState()
+    session.set_candidates("Roma", *roma_candidates(), generation=7)
+    monkeypatch.setattr(travel_service, "select_relevant", lambda *args: args)
+
+    reused = travel_service.reuse_session_candidates(session, "Peki giriş ücreti ne kadar?", unit(1, 0, 0), snapshot)
+    assert reused["city"] == "Roma" and reused["ids"][0] == "kolezyum"
+    assert travel_service.reuse_session_candidates(session, "Paris'te ne yapılır?", unit(1, 0, 0), snapshot) is None
+    assert travel_service.reuse_session_candidates(session, "Louvre nerede?", unit(1, 0, 0), snapshot) is None
+    # Alakasız soru (en iyi benzerlik eşik altında) vektör DB'ye gider
+    assert travel_service.reuse_session_candidates(session, "Hava nasıl?", unit(-1, -1, -1), snapshot) is None
+    session.generation = 6
+    assert travel_service.reuse_session_candidates(session, "Peki giriş ücreti?", unit(1, 0, 0), snapshot) is None
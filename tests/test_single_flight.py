@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class Gate:
+    """Liderin hesaplamasını testin istediği ana kadar bekletir."""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_followers(flight, key, fn, count):
+    results = [None] * count
+
+    def follower(i):
+        try:
+            results[i] = flight.do(key, fn)
+        except BaseException as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=follower, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for_followers(flight, key, count):
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        with flight._lock:
+            if key in flight._flights and flight._flights[key].followers >= count:
+                return
+        time.sleep(0.005)
+    raise AssertionError("takipçiler uçuşa katılmadı")
+
+
+def test_identical_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    gate = Gate(result={"answer": 42})
+    leader_threads, leader_results = run_followers(flight, "soru", gate, 1)
+    assert gate.entered.wait(2)
+    threads, results = run_followers(flight, "soru", gate, 4)
+    wait_for_followers(flight, "soru", 4)
+    gate.release.set()
+    for thread in leader_threads + threads:
+        thread.join(2)
+
+    assert gate.calls == 1
+    assert leader_results == [({"answer": 42}, False)]
+    assert results == [({"answer": 42}, True)] * 4
+    stats = flight.stats()
+    assert stats["leaders"] == 1 and stats["shared"] == 4 and stats["inflight_keys"] == 0
+    assert stats["max_followers"] == 4
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    # Sonuç önbelleğe alınmaz: biten anahtar tekrar hesaplanır
+    assert flight.do("a", lambda: 3) == (3, False)
+
+
+def test_leader_error_is_shared_with_followers():
+    flight = SingleFlight()
+    gate = Gate(error=ValueError("kota doldu"))
+    leader_threads, leader_results = run_followers(flight, "soru", gate, 1)
+    assert gate.entered.wait(2)
+    threads, results = run_followers(flight, "soru", gate, 3)
+    wait_for_followers(flight, "soru", 3)
+    gate.release.set()
+    for thread in leader_threads + threads:
+        thread.join(2)
+
+    assert gate.calls == 1
+    assert all(isinstance(r, ValueError) for r in leader_results + results)
+    assert flight.stats()["shared_errors"] == 3
+
+
+def test_cancelled_leader_lets_followers_compute_themselves():
+    flight = SingleFlight()
+    gate = Gate(error=KeyboardInterrupt())
+    leader_threads, leader_results = run_followers(flight, "soru", gate, 1)
+    assert gate.entered.wait(2)
+    fallback_calls = []
+
+    def own_computation():
+        fallback_calls.append(1)
+        return "kendi sonucum"
+
+    threads, results = run_followers(flight, "soru", own_computation, 2)
+    wait_for_followers(flight, "soru", 2)
+    gate.release.set()
+    for thread in leader_threads + threads:
+        thread.join(2)
+
+    assert isinstance(leader_results[0], KeyboardInterrupt)
+    assert results == [("kendi sonucum", False)] * 2
+    assert len(fallback_calls) == 2
+    assert flight.stats()["fallbacks"] == 2
+
+
+def test_follower_wait_timeout_falls_back_without_affecting_leader():
+    flight = SingleFlight(wait_timeout=0.05)
+    gate = Gate(result="lider")
+    leader_threads, leader_results = run_followers(flight, "soru", gate, 1)
+    assert gate.entered.wait(2)
+    assert flight.do("soru", lambda: "bekleyen") == ("bekleyen", False)
+    gate.release.set()
+    leader_threads[0].join(2)
+    assert leader_results == [("lider", False)]
@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+
+import pytest
+
+import startup_profiler
+from startup_profiler import StartupProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path, monkeypatch):
+    # tracemalloc testleri yavaşlatır ve süreç geneline yayılır; faz/rapor mantığı için gerekmiyor
+    monkeypatch.setattr(startup_profiler, "PROFILE_TRACEMALLOC", False)
+    return StartupProfiler(enabled=True, report_path=str(tmp_path / "profile.json"))
+
+
+def read_report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_nested_phases_record_wall_time_and_names(profiler):
+    with profiler.phase("initialize"):
+        with profiler.phase("import:numpy"):
+            time.sleep(0.02)
+        with profiler.phase("dataset"):
+            time.sleep(0.01)
+
+    phases = {p["name"]: p for p in profiler.phases}
+    assert list(phases) == ["initialize/import:numpy", "initialize/dataset", "initialize"]
+    assert phases["initialize"]["depth"] == 0
+    assert phases["initialize/dataset"]["depth"] == 1
+    assert phases["initialize/import:numpy"]["wall_seconds"] >= 0.02
+    assert phases["initialize"]["wall_seconds"] >= 0.03
+    assert phases["initialize/import:numpy"]["start_offset_seconds"] <= phases["initialize/dataset"]["start_offset_seconds"]
+    for record in phases.values():
+        assert record["rss_delta_bytes"] == record["rss_after_bytes"] - record["rss_before_bytes"]
+
+
+def test_phase_is_recorded_when_body_raises(profiler):
+    with pytest.raises(RuntimeError):
+        with profiler.phase("broken"):
+            raise RuntimeError("hata")
+    with profiler.phase("next"):
+        pass
+    # Hata yığını bozmaz; sonraki faz üst seviyede kalır
+    assert [p["name"] for p in profiler.phases] == ["broken", "next"]
+
+
+def test_disabled_profiler_records_and_writes_nothing(tmp_path):
+    disabled = StartupProfiler(enabled=False, report_path=str(tmp_path / "profile.json"))
+    with disabled.phase("initialize"):
+        pass
+    with disabled.request("ask"):
+        pass
+    disabled.finish_startup()
+    assert disabled.phases == []
+    assert not (tmp_path / "profile.json").exists()
+
+
+def test_finish_startup_writes_report(profiler, tmp_path):
+    with profiler.phase("import:torch"):
+        pass
+    with profiler.phase("warmup"):
+        pass
+    profiler.finish_startup()
+
+    report = read_report(profiler.report_path)
+    assert set(report) == {"started_at", "pid", "python", "argv", "startup_seconds", "rss_bytes",
+                           "imports", "phases", "tracemalloc", "requests"}
+    assert report["startup_seconds"] > 0
+    assert [p["name"] for p in report["imports"]] == ["import:torch"]
+    assert [p["name"] for p in report["phases"]] == ["import:torch", "warmup"]
+    assert report["tracemalloc"] == {"totals": None, "top": []}
+    assert report["requests"] == []
+    assert [path.name for path in tmp_path.iterdir()] == ["profile.json"]
+
+
+def test_armed_request_is_profiled_once(profiler):
+    profiler.arm_requests(1)
+    with profiler.request("ask"):
+        sum(range(1000))
+    with profiler.request("ask"):
+        pass
+
+    report = read_report(profiler.report_path)
+    assert len(report["requests"]) == 1
+    sample = report["requests"][0]
+    assert sample["name"] == "ask"
+    assert sample["wall_seconds"] >= 0
+    assert sample["top_functions"]
+    assert set(sample["top_functions"][0]) == {"function", "ncalls", "tottime", "cumtime"}
+
+
+def test_concurrent_report_writes_do_not_collide(profiler, tmp_path, capsys):
+    with profiler.phase("initialize"):
+        pass
+
+    def write():
+        for _ in range(20):
+            profiler.write_report()
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Yazma hataları yutulup loglandığı için çıktıdan kontrol edilir
+    assert "Profil raporu yazılamadı" not in capsys.readouterr().out
+    assert [p["name"] for p in read_report(profiler.report_path)["phases"]] == ["initialize"]
+    # Geçici dosyalar benzersizdir ve hepsi hedefin üzerine taşınmıştır
+    assert [path.name for path in tmp_path.iterdir()] == ["profile.json"]
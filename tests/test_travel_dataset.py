@@ -0,0 +1,115 @@
+import json
+import math
+import os
+
+import numpy as np
+import pytest
+
+from travel_dataset import TravelDataset, build_documents, compile_dataset, load_travel_data
+
+ROUTES = {
+    "Roma": {
+        "Days": {"1": ["Kolezyum", "Pantheon"], "2": ["Vatikan Müzeleri"]},
+        "Tarih": ["Kolezyum", "Pantheon"],
+        "Places": {
+            "Kolezyum": {"description": "Antik amfitiyatro.", "tips": "Sabah erken gidin.", "image": "images/kolezyum.jpg",
+                         "latitude": 41.8902, "longitude": 12.4922, "visit_minutes": 120},
+            "Pantheon": {"description": "Roma tapınağı.", "latitude": 41.8986, "longitude": 12.4769},
+            "Vatikan Müzeleri": {"description": "Sanat koleksiyonu.", "tips": "Pazar günü kapalıdır.",
+                                 "closed_days": ["Pazar", "Salı"]},
+        },
+    },
+    "Paris": {
+        "Müzeler": ["Louvre"],
+        "Places": {"Louvre": {"description": "Dünyanın en büyük sanat müzesi.", "latitude": 48.8606, "longitude": 2.3376}},
+    },
+}
+
+
+def compiled(tmp_path, **kwargs):
+    path = tmp_path / "travel_routes.bin"
+    compile_dataset(ROUTES, str(path), **kwargs)
+    return TravelDataset(str(path))
+
+
+def test_documents_are_identical_for_json_and_binary(tmp_path):
+    dataset = compiled(tmp_path)
+    assert build_documents(dataset) == build_documents(ROUTES)
+    assert list(dataset) == ["Roma", "Paris"]
+    assert list(dataset["Roma"]) == ["Days", "Tarih", "Places"]
+    assert dataset["Roma"]["Days"] == ROUTES["Roma"]["Days"]
+    dataset.close()
+
+
+def test_strings_are_decoded_on_first_access(tmp_path):
+    dataset = compiled(tmp_path)
+    cached = len(dataset._string_cache) # yalnızca şehir adları açılışta çözülür
+    assert cached == 2
+    place = dataset["Roma"]["Places"]["Kolezyum"]
+    assert len(dataset._string_cache) == cached + 3 # PlacesView yer adlarını çözer
+    assert place["tips"] == "Sabah erken gidin."
+    assert len(dataset._string_cache) == cached + 4
+    assert "image" in place and "tips" not in dataset["Roma"]["Places"]["Pantheon"]
+    dataset.close()
+
+
+def test_missing_coordinates_are_absent(tmp_path):
+    dataset = compiled(tmp_path)
+    place = dataset["Roma"]["Places"]["Vatikan Müzeleri"]
+    assert "latitude" not in place and place.get("longitude") is None
+    assert dataset.coordinates(2) == (None, None)
+    assert math.isnan(dataset._coords[4])
+    assert dataset["Roma"]["Places"]["Pantheon"]["latitude"] == pytest.approx(41.8986)
+    dataset.close()
+
+
+def test_closed_days_and_visit_minutes_roundtrip(tmp_path):
+    dataset = compiled(tmp_path)
+    places = dataset["Roma"]["Places"]
+    assert places["Kolezyum"]["visit_minutes"] == 120 and "closed_days" not in places["Kolezyum"]
+    # Bit maskesinden hafta sırasıyla geri açılır
+    assert places["Vatikan Müzeleri"]["closed_days"] == ["Salı", "Pazar"]
+    assert "visit_minutes" not in places["Vatikan Müzeleri"]
+    assert dict(places["Pantheon"]) == ROUTES["Roma"]["Places"]["Pantheon"]
+    dataset.close()
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 0), ("float16", 1e-3), ("int8", 2e-2)])
+def test_embedding_sections_roundtrip(tmp_path, dtype, tolerance):
+    documents, _, _ = build_documents(ROUTES)
+    matrix = np.random.default_rng(0).standard_normal((len(documents), 8)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    dataset = compiled(tmp_path, embeddings=matrix, model_name="model-a", embedding_dtype=dtype)
+
+    loaded = dataset.precomputed_embeddings(documents, "model-a")
+    assert loaded.dtype == np.float32 and loaded.shape == matrix.shape
+    np.testing.assert_allclose(loaded, matrix, atol=tolerance)
+    assert dataset.precomputed_embeddings(documents, "model-b") is None
+    assert dataset.precomputed_embeddings(documents[:-1] + ["değişti"], "model-a") is None
+    # Dönen matris mmap'e bağlı değildir; dataset kapatılabilir
+    dataset.close()
+    assert float(loaded[0] @ loaded[0]) == pytest.approx(1.0, abs=0.05)
+
+
+def test_load_prefers_binary_only_when_newer(tmp_path):
+    json_path = tmp_path / "travel_routes.json"
+    bin_path = tmp_path / "travel_routes.bin"
+    json_path.write_text(json.dumps(ROUTES, ensure_ascii=False), encoding="utf-8")
+    compile_dataset(ROUTES, str(bin_path))
+
+    os.utime(json_path, (1000, 1000))
+    os.utime(bin_path, (2000, 2000))
+    data = load_travel_data(str(json_path), str(bin_path))
+    assert isinstance(data, TravelDataset)
+    data.close()
+
+    os.utime(json_path, (3000, 3000)) # JSON derlemeden sonra düzenlendi
+    assert load_travel_data(str(json_path), str(bin_path)) == ROUTES
+
+    json_path.unlink()
+    data = load_travel_data(str(json_path), str(bin_path))
+    assert isinstance(data, TravelDataset)
+    data.close()
+    bin_path.unlink()
+    with pytest.raises(FileNotFoundError):
+        load_travel_data(str(json_path), str(bin_path))
@@ -0,0 +1,528 @@
+"""travel_routes.json verisinin derlenmiş, mmap ile açılan ikili (binary) formatı.
+
+Dosya düzeni (little-endian):
+    Başlık  : sihirli değer, sürüm, bayraklar, kayıt sayıları ve bölüm ofsetleri
+    Dizgiler: (n+1) adet uint32 ofset + UTF-8 blob (tüm metinler tek bir tabloda)
+    Şehirler: uint32 x5 -> isim, ilk yer, yer sayısı, ilk grup, grup sayısı
+    Yerler  : uint32 x4 -> isim, açıklama, ipucu, görsel (dizgi indeksleri)
+    Koord.  : float64 x2 -> enlem, boylam (eksikse NaN)
+    Ekler   : uint16 ziyaret süresi (dk, 0=yok) + uint8 kapalı gün bit maskesi (bit0=Pazartesi)
+    Gruplar : uint8 tür (0=gün, 1=kategori) + uint32 x3 -> anahtar, ilk üye, üye sayısı
+    Üyeler  : uint32 dizgi indeksleri
+    Embedding (isteğe bağlı): doküman sayısı, boyut, model adı, doküman özeti + matris
+              (float32; FLAG_EMBEDDINGS_FLOAT16 ile float16; FLAG_EMBEDDINGS_INT8 ile float32 satır
+              ölçekleri + int8 kodlar)
+
+Okuma tarafı hiçbir şeyi baştan çözmez; açıklama ve ipuçları erişildiğinde decode edilir.
+Şema doğrulaması yalnızca derleme sırasında (`compile_dataset`) yapılır.
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+
+from itinerary_planner import WEEKDAYS_TR, weekday_index
+
+DATASET_MAGIC = b"TRVD"
+DATASET_VERSION = 2
+FLAG_EMBEDDINGS = 0x1
+FLAG_EMBEDDINGS_FLOAT16 = 0x2
+FLAG_EMBEDDINGS_INT8 = 0x4
+NO_STRING = 0xFFFFFFFF
+
+GROUP_DAY = 0
+GROUP_CATEGORY = 1
+
+_HEADER = struct.Struct("<4sHHIIIII9Q")
+_CITY = struct.Struct("<5I")
+_PLACE = struct.Struct("<4I")
+_PLACE_EXTRA = struct.Struct("<HBx")
+_GROUP = struct.Struct("<B3xIII")
+_EMBEDDING_HEADER = struct.Struct("<4I")
+
+RESERVED_KEYS = ("Days", "Places")
+PLACE_TEXT_FIELDS = ("description", "tips", "image")
+
+
+# ====================================================
+# >>> Doküman Üretimi (Vektör DB ve derleme ortak kullanır) <<<
+# ====================================================
+
+def build_documents(data):
+    """Şehir verisinden vektör DB'ye eklenecek dokümanları, metadataları ve ID'leri üretir."""
+    documents = []
+    metadatas = []
+    ids = []
+    doc_id_counter = 0
+
+    for city, city_data in data.items():
+        # 1. BELGE TÜRÜ: Şehrin Genel Planı ve Kategorileri
+        content_genel = f"# Şehir: {city}\n\n## Günlük Planlar\n"
+        if "Days" in city_data and isinstance(city_data["Days"], Mapping):
+            sorted_days = sorted(city_data["Days"].keys(), key=lambda x: int(x) if x.isdigit() else float('inf'))
+            for day_num in sorted_days:
+                activities = city_data["Days"][day_num]
+                content_genel += f"**{day_num}. Gün:** {', '.join(activities)}\n"
+        content_genel += "\n## Aktivite Kategorileri\n"
+        for category, places in city_data.items():
+            if category not in RESERVED_KEYS and isinstance(places, list):
+                content_genel += f"**{category}:** {', '.join(places)}\n"
+
+        documents.append(content_genel.strip())
+        metadatas.append({"source_city": city, "type": "Genel Plan"})
+        ids.append(f"doc_city_{doc_id_counter}")
+        doc_id_counter += 1
+
+        # 2. BELGE TÜRÜ: Her Yer İçin Ayrı Ayrı (Detaylar)
+        if "Places" in city_data and isinstance(city_data["Places"], Mapping):
+            for place_name, place_details in city_data["Places"].items():
+                content_yer = f"# Yer: {place_name} ({city})\n\n"
+                if "description" in place_details: content_yer += f"Açıklama: {place_details['description']}\n"
+                if "tips" in place_details: content_yer += f"İpucu: {place_details['tips']}\n"
+                categories_for_place = []
+                for category, places_list in city_data.items():
+                    if category not in RESERVED_KEYS and isinstance(places_list, list) and place_name in places_list:
+                        categories_for_place.append(category)
+                if categories_for_place: content_yer += f"Kategoriler: {', '.join(categories_for_place)}\n"
+
+                metadata_for_place = {
+                    "source_city": city,
+                    "type": "Yer Detayı",
+                    "place_name": place_name
+                }
+
+                # Eğer koordinatlar varsa metadata'ya ekle
+                place_lat = place_details.get("latitude")
+                place_lon = place_details.get("longitude")
+                if isinstance(place_lat, (int, float)) and isinstance(place_lon, (int, float)):
+                    metadata_for_place["latitude"] = place_lat
+                    metadata_for_place["longitude"] = place_lon
+
+                documents.append(content_yer.strip())
+                metadatas.append(metadata_for_place)
+                ids.append(f"doc_place_{doc_id_counter}")
+                doc_id_counter += 1
+
+    return documents, metadatas, ids
+
+
+def documents_fingerprint(documents):
+    """Doküman listesinin özetini döndürür (önceden hesaplanmış embedding'lerin geçerliliği için)."""
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(doc.encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+# ====================================================
+# >>> Derleme (JSON -> Binary) <<<
+# ====================================================
+
+def validate_routes(data):
+    """JSON verisinin şemasını doğrular; hatalıysa ValueError, sarkan referanslar için uyarı listesi döndürür."""
+    errors = []
+    warnings = []
+    if not isinstance(data, dict):
+        raise ValueError("Kök JSON nesnesi şehir -> veri sözlüğü olmalıdır.")
+
+    for city, city_data in data.items():
+        if not isinstance(city_data, dict):
+            errors.append(f"{city}: şehir verisi bir sözlük olmalı.")
+            continue
+        places = city_data.get("Places", {})
+        if not isinstance(places, dict):
+            errors.append(f"{city}: 'Places' bir sözlük olmalı.")
+            places = {}
+        for place_name, details in places.items():
+            if not isinstance(details, dict):
+                errors.append(f"{city}/{place_name}: yer detayı bir sözlük olmalı.")
+                continue
+            for field in PLACE_TEXT_FIELDS:
+                if field in details and not isinstance(details[field], str):
+                    errors.append(f"{city}/{place_name}: '{field}' metin olmalı.")
+            for field in ("latitude", "longitude"):
+                if field in details and (isinstance(details[field], bool) or not isinstance(details[field], (int, float))):
+                    errors.append(f"{city}/{place_name}: '{field}' sayı olmalı.")
+            visit_minutes = details.get("visit_minutes")
+            if visit_minutes is not None and (not isinstance(visit_minutes, int) or not 0 < visit_minutes < 65536):
+                errors.append(f"{city}/{place_name}: 'visit_minutes' pozitif bir tam sayı olmalı.")
+            closed_days = details.get("closed_days", [])
+            try:
+                if not isinstance(closed_days, list):
+                    raise ValueError
+                for day in closed_days:
+                    weekday_index(day)
+            except ValueError:
+                errors.append(f"{city}/{place_name}: 'closed_days' hafta günü listesi olmalı (örn. [\"Salı\"]).")
+
+        days = city_data.get("Days", {})
+        if not isinstance(days, dict):
+            errors.append(f"{city}: 'Days' bir sözlük olmalı.")
+            days = {}
+        groups = [(f"Days/{k}", v) for k, v in days.items()]
+        groups += [(k, v) for k, v in city_data.items() if k not in RESERVED_KEYS]
+        for group_name, members in groups:
+            if not isinstance(members, list) or not all(isinstance(m, str) for m in members):
+                errors.append(f"{city}/{group_name}: metin listesi olmalı.")
+                continue
+            for member in members:
+                if member not in places:
+                    warnings.append(f"{city}/{group_name}: '{member}' için yer detayı yok.")
+
+    if errors:
+        raise ValueError("Veri şeması geçersiz:\n" + "\n".join(errors))
+    return warnings
+
+
+def compile_dataset(data, output_path, embeddings=None, model_name=None, embedding_dtype="float32"):
+    """Doğrulanmış JSON verisini ikili dataset dosyasına yazar.
+
+    `embedding_dtype` ("float32" | "float16" | "int8") gömülü embedding matrisinin saklama türüdür.
+    """
+    warnings = validate_routes(data)
+
+    strings = []
+    string_ids = {}
+
+    def sid(text):
+        if text is None:
+            return NO_STRING
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text)
+        return string_ids[text]
+
+    city_records = []
+    place_records = []
+    coords = []
+    place_extras = []
+    group_records = []
+    members = []
+
+    for city, city_data in data.items():
+        places = city_data.get("Places", {})
+        place_start, group_start = len(place_records), len(group_records)
+        for place_name, details in places.items():
+            place_records.append((
+                sid(place_name),
+                sid(details.get("description")),
+                sid(details.get("tips")),
+                sid(details.get("image")),
+            ))
+            coords.append(float(details.get("latitude", math.nan)))
+            coords.append(float(details.get("longitude", math.nan)))
+            closed_mask = 0
+            for day in details.get("closed_days", []):
+                closed_mask |= 1 << weekday_index(day)
+            place_extras.append((details.get("visit_minutes", 0), closed_mask))
+
+        groups = [(GROUP_DAY, day, names) for day, names in city_data.get("Days", {}).items()]
+        groups += [(GROUP_CATEGORY, k, v) for k, v in city_data.items() if k not in RESERVED_KEYS]
+        for kind, key, names in groups:
+            group_records.append((kind, sid(key), len(members), len(names)))
+            members.extend(sid(name) for name in names)
+
+        city_records.append((sid(city), place_start, len(place_records) - place_start,
+                             group_start, len(group_records) - group_start))
+
+    flags = 0
+    embedding_section = b""
+    if embeddings is not None:
+        import numpy as np
+        from embedding_storage import quantize
+
+        documents, _, _ = build_documents(data)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(documents):
+            raise ValueError(f"Embedding sayısı ({len(matrix)}) doküman sayısıyla ({len(documents)}) eşleşmiyor.")
+        codes, scales = quantize(matrix, embedding_dtype)
+        flags |= FLAG_EMBEDDINGS
+        if embedding_dtype == "float16":
+            flags |= FLAG_EMBEDDINGS_FLOAT16
+        elif embedding_dtype == "int8":
+            flags |= FLAG_EMBEDDINGS_INT8
+        embedding_section = _EMBEDDING_HEADER.pack(len(matrix), matrix.shape[1], sid(model_name or ""), sid(documents_fingerprint(documents)))
+        if scales is not None:
+            embedding_section += scales.astype("<f4").tobytes()
+        embedding_section += codes.astype(codes.dtype.newbyteorder("<")).tobytes()
+
+    blob_parts = [s.encode("utf-8") for s in strings]
+    string_offsets = [0]
+    for part in blob_parts:
+        string_offsets.append(string_offsets[-1] + len(part))
+
+    sections = [
+        struct.pack(f"<{len(string_offsets)}I", *string_offsets),
+        b"".join(blob_parts),
+        b"".join(_CITY.pack(*r) for r in city_records),
+        b"".join(_PLACE.pack(*r) for r in place_records),
+        struct.pack(f"<{len(coords)}d", *coords),
+        b"".join(_PLACE_EXTRA.pack(*r) for r in place_extras),
+        b"".join(_GROUP.pack(*r) for r in group_records),
+        struct.pack(f"<{len(members)}I", *members),
+        embedding_section,
+    ]
+
+    # Her bölüm 8 bayt hizalı başlar (float64/float32 dizileri doğrudan cast edilebilsin diye)
+    offsets = []
+    position = _HEADER.size
+    body = bytearray()
+    for section in sections:
+        padding = (-position) % 8
+        body += b"\0" * padding
+        position += padding
+        offsets.append(position)
+        body += section
+        position += len(section)
+
+    header = _HEADER.pack(DATASET_MAGIC, DATASET_VERSION, flags, len(strings), len(city_records),
+                          len(place_records), len(group_records), len(members), *offsets)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, output_path)
+    return warnings
+
+
+# ====================================================
+# >>> Okuma (mmap + tembel decode) <<<
+# ====================================================
+
+class TravelDataset(Mapping):
+    """Derlenmiş dataset'i mmap ile açar; `data_json` ile aynı şehir -> veri arayüzünü sunar."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        view = memoryview(self._mm)
+        (magic, version, self.flags, n_strings, n_cities, n_places, n_groups, n_members,
+         off_str_index, off_str_blob, off_cities, off_places, off_coords, off_place_extras,
+         off_groups, off_members, off_embeddings) = _HEADER.unpack_from(view, 0)
+        if magic != DATASET_MAGIC:
+            raise ValueError(f"{path} bir seyahat dataset dosyası değil.")
+        if version != DATASET_VERSION:
+            raise ValueError(f"{path} desteklenmeyen dataset sürümü: {version}")
+
+        self._view = view
+        self._string_offsets = view[off_str_index:off_str_index + 4 * (n_strings + 1)].cast("I")
+        self._blob = view[off_str_blob:]
+        self._cities = view[off_cities:off_cities + _CITY.size * n_cities]
+        self._places = view[off_places:off_places + _PLACE.size * n_places].cast("I")
+        self._coords = view[off_coords:off_coords + 16 * n_places].cast("d")
+        self._place_extras = view[off_place_extras:off_place_extras + _PLACE_EXTRA.size * n_places]
+        self._groups = view[off_groups:off_groups + _GROUP.size * n_groups]
+        self._members = view[off_members:off_members + 4 * n_members].cast("I")
+        self._off_embeddings = off_embeddings
+        self._n_cities = n_cities
+        self._string_cache = {}
+        self._city_index = {self.string(_CITY.unpack_from(self._cities, i * _CITY.size)[0]): i
+                            for i in range(n_cities)}
+
+    def string(self, string_id):
+        """Dizgi tablosundan bir metni (ilk erişimde) decode eder."""
+        if string_id == NO_STRING:
+            return None
+        text = self._string_cache.get(string_id)
+        if text is None:
+            start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+            text = str(self._blob[start:end], "utf-8")
+            self._string_cache[string_id] = text
+        return text
+
+    def __getitem__(self, city):
+        return CityView(self, self._city_index[city])
+
+    def __iter__(self):
+        return iter(self._city_index)
+
+    def __len__(self):
+        return self._n_cities
+
+    def coordinates(self, place_index):
+        """Yerin (enlem, boylam) çiftini döndürür; eksik değerler None olur."""
+        lat, lon = self._coords[2 * place_index], self._coords[2 * place_index + 1]
+        return (None if math.isnan(lat) else lat, None if math.isnan(lon) else lon)
+
+    def place_extras(self, place_index):
+        """Yerin (ziyaret süresi, kapalı gün listesi) bilgisini döndürür; süre yoksa None."""
+        visit_minutes, closed_mask = _PLACE_EXTRA.unpack_from(self._place_extras, place_index * _PLACE_EXTRA.size)
+        closed_days = [name for i, name in enumerate(WEEKDAYS_TR) if closed_mask & (1 << i)]
+        return visit_minutes or None, closed_days
+
+    def precomputed_embeddings(self, documents, model_name):
+        """Derleme sırasında hesaplanan embedding'leri (float32 numpy matrisi) döndürür.
+
+        Matris her zaman kopya olarak döner: mmap'e bağlı bir görünüm yaşadığı sürece `close()` BufferError verirdi.
+        Model adı veya doküman içeriği değiştiyse None döner ve embedding'ler yeniden hesaplanmalıdır.
+        """
+        if not self.flags & FLAG_EMBEDDINGS:
+            return None
+        n_docs, dim, model_sid, fingerprint_sid = _EMBEDDING_HEADER.unpack_from(self._view, self._off_embeddings)
+        if self.string(model_sid) != model_name or n_docs != len(documents):
+            return None
+        if self.string(fingerprint_sid) != documents_fingerprint(documents):
+            return None
+        import numpy as np
+        from embedding_storage import dequantize
+        start = self._off_embeddings + _EMBEDDING_HEADER.size
+        if self.flags & FLAG_EMBEDDINGS_INT8:
+            scales = np.frombuffer(self._mm, dtype="<f4", count=n_docs, offset=start)
+            codes = np.frombuffer(self._mm, dtype=np.int8, count=n_docs * dim, offset=start + 4 * n_docs)
+            return dequantize(codes.reshape(n_docs, dim), scales)
+        if self.flags & FLAG_EMBEDDINGS_FLOAT16:
+            codes = np.frombuffer(self._mm, dtype="<f2", count=n_docs * dim, offset=start)
+            return dequantize(codes.reshape(n_docs, dim))
+        return np.array(np.frombuffer(self._mm, dtype="<f4", count=n_docs * dim, offset=start).reshape(n_docs, dim))
+
+    def close(self):
+        self._string_cache.clear()
+        for attr in ("_string_offsets", "_blob", "_cities", "_places", "_coords", "_place_extras",
+                     "_groups", "_members", "_view"):
+            getattr(self, attr).release()
+        self._mm.close()
+        self._file.close()
+
+
+class CityView(Mapping):
+    """Tek bir şehrin verisi: 'Days', kategoriler ve 'Places' anahtarları (JSON sırasıyla)."""
+
+    def __init__(self, dataset, city_index):
+        self._ds = dataset
+        (_, self._place_start, self._place_count,
+         self._group_start, self._group_count) = _CITY.unpack_from(dataset._cities, city_index * _CITY.size)
+        self._keys = None
+
+    def _iter_groups(self):
+        ds = self._ds
+        for i in range(self._group_start, self._group_start + self._group_count):
+            kind, key_sid, member_start, member_count = _GROUP.unpack_from(ds._groups, i * _GROUP.size)
+            yield kind, key_sid, member_start, member_count
+
+    def _member_names(self, member_start, member_count):
+        return [self._ds.string(s) for s in self._ds._members[member_start:member_start + member_count]]
+
+    def keys_list(self):
+        if self._keys is None:
+            keys = []
+            has_days = False
+            for kind, key_sid, _, _ in self._iter_groups():
+                if kind == GROUP_DAY:
+                    if not has_days:
+                        keys.append("Days")
+                        has_days = True
+                else:
+                    keys.append(self._ds.string(key_sid))
+            keys.append("Places")
+            self._keys = keys
+        return self._keys
+
+    def __getitem__(self, key):
+        if key == "Places":
+            return PlacesView(self._ds, self._place_start, self._place_count)
+        if key == "Days":
+            days = {self._ds.string(key_sid): self._member_names(start, count)
+                    for kind, key_sid, start, count in self._iter_groups() if kind == GROUP_DAY}
+            if not days:
+                raise KeyError(key)
+            return days
+        for kind, key_sid, start, count in self._iter_groups():
+            if kind == GROUP_CATEGORY and self._ds.string(key_sid) == key:
+                return self._member_names(start, count)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.keys_list())
+
+    def __len__(self):
+        return len(self.keys_list())
+
+
+class PlacesView(Mapping):
+    """Bir şehrin yerleri: yer adı -> PlaceView."""
+
+    def __init__(self, dataset, place_start, place_count):
+        self._ds = dataset
+        self._start = place_start
+        self._count = place_count
+        self._index = None
+
+    def _name_index(self):
+        if self._index is None:
+            places = self._ds._places
+            self._index = {self._ds.string(places[4 * i]): i
+                           for i in range(self._start, self._start + self._count)}
+        return self._index
+
+    def __getitem__(self, place_name):
+        return PlaceView(self._ds, self._name_index()[place_name])
+
+    def __iter__(self):
+        return iter(self._name_index())
+
+    def __len__(self):
+        return self._count
+
+
+class PlaceView(Mapping):
+    """Tek bir yerin detayları; metinler erişildiğinde decode edilir."""
+
+    def __init__(self, dataset, place_index):
+        self._ds = dataset
+        self._index = place_index
+
+    def _text_sid(self, field):
+        return self._ds._places[4 * self._index + 1 + PLACE_TEXT_FIELDS.index(field)]
+
+    def __getitem__(self, key):
+        if key in PLACE_TEXT_FIELDS:
+            value = self._ds.string(self._text_sid(key))
+        elif key in ("latitude", "longitude"):
+            value = self._ds.coordinates(self._index)[0 if key == "latitude" else 1]
+        elif key in ("visit_minutes", "closed_days"):
+            value = self._ds.place_extras(self._index)[0 if key == "visit_minutes" else 1] or None
+        else:
+            raise KeyError(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        lat, lon = self._ds.coordinates(self._index)
+        for field in PLACE_TEXT_FIELDS:
+            if self._text_sid(field) != NO_STRING:
+                yield field
+        if lat is not None:
+            yield "latitude"
+        if lon is not None:
+            yield "longitude"
+        visit_minutes, closed_days = self._ds.place_extras(self._index)
+        if visit_minutes:
+            yield "visit_minutes"
+        if closed_days:
+            yield "closed_days"
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def load_travel_data(json_path, dataset_path):
+    """Derlenmiş dataset güncelse mmap ile açar, değilse JSON'u klasik yoldan okur."""
+    if os.path.exists(dataset_path) and (
+        not os.path.exists(json_path) or os.path.getmtime(dataset_path) >= os.path.getmtime(json_path)
+    ):
+        return TravelDataset(dataset_path)
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"Veri dosyası bulunamadı: {json_path}")
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,1064 @@
+"""Arayüzden bağımsız RAG seyahat asistanı servisi.
+
+Modelleri ve veritabanını yükler; soru cevaplama, rota planlama ve yakındaki yerler işlemlerini
+sade Python sözlükleri döndüren fonksiyonlar olarak sunar. Gradio arayüzü (app.py / app_gradio.py)
+ve JSON API (api_server.py) aynı işlem hattını bu modül üzerinden kullanır.
+"""
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import traceback
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from startup_profiler import profiler # Ölçülecek importlardan önce gelmeli (PROFILE_STARTUP=1)
+
+# --- GEREKLİ IMPORTLAR (LANGCHAIN YOK) ---
+with profiler.phase("import:google.generativeai"):
+    import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
+with profiler.phase("import:sentence_transformers"):
+    from sentence_transformers import SentenceTransformer
+with profiler.phase("import:chromadb"):
+    import chromadb
+import numpy as np
+
+# --- Yerel Yardımcı Modüller ---
+from embedding_batcher import EmbeddingBatcher, EMBED_BATCH_MAX_WAIT_MS
+from travel_dataset import TravelDataset, build_documents, documents_fingerprint, load_travel_data, validate_routes
+from itinerary_planner import plan_itinerary, plan_grouped_itinerary, places_from_city, format_itinerary_markdown, haversine_km
+from prompt_templates import (PromptManager, build_context, build_qa_prompt, build_route_prompt, build_route_json_prompt,
+                              build_legacy_prompt, route_candidate_ids, route_generation_config, parse_route_plan,
+                              NO_ANSWER_MESSAGE, ROUTE_STRUCTURED_OUTPUT)
+from adaptive_retrieval import select_relevant, similarity_from_distance
+from image_pipeline import ThumbnailIndex, THUMBNAIL_CACHE_DIR, iter_place_images
+from hot_reload import DataSnapshot, SnapshotManager, DatasetWatcher, file_signature
+from model_catalog import ModelCatalog, ModelRouter, classify_intent, estimate_tokens, INTENT_ROUTE
+from single_flight import SingleFlight, SINGLE_FLIGHT_ENABLED
+from retrieval_shards import ShardCluster, ShardedCollection, ShardUnavailableError, SHARD_MODE, SHARD_TIMEOUT_SECONDS
+from embedding_storage import EmbeddingCodec
+from query_cache import (LruCache, QueryLog, QUERY_EMBEDDING_CACHE_SIZE, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS,
+                         QUERY_LOG_FILE)
+
+# --- Ayarlar ve API Anahtarı ---
+load_dotenv()
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+DATA_FILE = "travel_routes.json"
+DATASET_FILE = "travel_routes.bin" # compile_dataset.py ile üretilen ikili dataset (varsa tercih edilir)
+VECTOR_DB_PATH = "vector_db_gradio_final" # DB Klasör adı
+COLLECTION_NAME_PREFIX = "travel_routes" # Koleksiyon adı içerik özetiyle tamamlanır (her veri sürümü ayrı koleksiyon)
+embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
+llm_model_name = "gemini-2.5-flash" # Varsayılan / güçlü model (rota planlama)
+generation_config = {"temperature": 0.7, "top_p": 0.95, "top_k": 64}
+LOCATION_BOX_DEGREES = 0.015 # Yaklaşık 1.6 km
+RETRIEVAL_TOP_K = 10 # Bağlama girebilecek en fazla doküman (skor kesmesiyle daha azı kullanılır)
+SESSION_REUSE_MIN_SCORE = 0.2 # Oturum adaylarında en iyi benzerlik bunun altındaysa vektör DB'ye gidilir
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1" # "Hazır" öncesi ısınma adımı
+WARMUP_BATCH_SIZES = (1, 4, 16) # Sahte encode'ların batch boyutları (tekil sorgu ve micro-batch boyutları)
+WARMUP_EMBED_TOP_N = int(os.getenv("WARMUP_EMBED_TOP_N", "50")) # Embedding'i önceden hesaplanan sık soru sayısı
+WARMUP_ANSWER_TOP_N = int(os.getenv("WARMUP_ANSWER_TOP_N", "0")) # Cevabı önceden üretilen sık soru sayısı (isteğe bağlı; sorular Gemini'ye tekrar gider)
+WARMUP_TEXT = "Paris'te gezilecek yerler nelerdir?"
+NOT_READY_MESSAGE = "🚨 Üzgünüm, bir başlangıç hatası nedeniyle cevap veremiyorum. Lütfen terminal loglarını kontrol edin."
+
+# --- Hata Kontrolü: API Anahtarı ---
+API_KEY_ERROR = False
+if not GOOGLE_API_KEY:
+    print("🚨 HATA: Google API anahtarı .env dosyasında bulunamadı!")
+    print("Lütfen proje ana klasöründe .env dosyası oluşturup GOOGLE_API_KEY='...' anahtarınızı ekleyin.")
+    API_KEY_ERROR = True
+else:
+    try:
+        genai.configure(api_key=GOOGLE_API_KEY)
+    except Exception as e:
+        print(f"🚨 HATA: Google API anahtarı yapılandırılırken hata oluştu: {e}")
+        API_KEY_ERROR = True
+
+# --- Modelleri ve DB'yi Tutacak Global Değişkenler ---
+llm = None
+embeddings_model = None
+embedding_batcher = None # Eşzamanlı sorguların embedding'lerini toplu hesaplar
+prompt_manager = None # System instruction'lı / önek önbellekli modelleri sağlar
+# Veri nesli (veri + koleksiyon + küçük resimler); istekler `snapshots.acquire()` ile tek nesli kullanır
+snapshots = SnapshotManager()
+dataset_watcher = None
+answer_warmup_thread = None # Hazır olduktan sonra sık soruların cevabını üreten arka plan iş parçacığı
+_reload_lock = threading.Lock()
+_storage_paths = {"vector_db_path": VECTOR_DB_PATH, "thumbnail_cache_dir": THUMBNAIL_CACHE_DIR}
+# Güncel neslin kısayolları (arayüz ve API'nin basit okumaları için; işlem hattı snapshot kullanır)
+vector_collection = None
+data_json = None
+thumbnail_index = None # Kaynak görsel -> küçük resim (boyut bilgisiyle)
+model_router = None # İstek türü ve bağlam boyutuna göre model seçer (gecikme/hata istatistikleriyle)
+# Eşzamanlı özdeş istekler tek hesaplamada birleştirilir (SINGLE_FLIGHT_ENABLED=0 ile kapatılır)
+request_coalescer = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+# Sorgu embedding'i ve (oturum geçmişi olmayan) cevaplar için önbellekler; ısınma adımı sık sorularla doldurur
+query_embedding_cache = LruCache(QUERY_EMBEDDING_CACHE_SIZE) if QUERY_EMBEDDING_CACHE_SIZE > 0 else None
+answer_cache = LruCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS) if ANSWER_CACHE_SIZE > 0 else None
+query_log = None # En sık sorulan soruların kalıcı günlüğü (ilk başlatmada açılır)
+warmup_report = {}
+
+# ====================================================
+# >>> Coğrafi Rota Planlama <<<
+# ====================================================
+
+def plan_city_route(city, place_names=None, num_days=3, start_weekday=None, snapshot=None):
+    """Şehrin (veya verilen) yerlerini deterministik planlayıcıyla günlere bölüp sıralar; yapılandırılmış plan döndürür."""
+    if snapshot is None:
+        with snapshots.acquire() as snapshot:
+            return plan_city_route(city, place_names, num_days, start_weekday, snapshot) if snapshot else None
+    data = snapshot.data
+    if city not in data or "Places" not in data[city]:
+        return None
+
+    start_time = time.perf_counter()
+    places = places_from_city(data[city], place_names)
+    itinerary = plan_itinerary(places, num_days=num_days, start_weekday=start_weekday)
+    print(f"🗺️ {city} için {num_days} günlük rota planlandı ({(time.perf_counter() - start_time) * 1000:.1f} ms).")
+    return itinerary
+
+def plan_grouped_route(city, day_groups, snapshot, start_weekday=None):
+    """Verilen gün gruplamasını koruyarak planlar; gruplama geçersizse (kapalı gün, koordinat yok) None."""
+    data = snapshot.data
+    if city not in data or "Places" not in data[city]:
+        return None
+    places = {p["name"]: p for p in places_from_city(data[city], [name for day in day_groups for name in day])}
+    groups = [[places[name] for name in day if name in places] for day in day_groups]
+    if sum(len(day) for day in groups) != sum(len(day) for day in day_groups):
+        return None
+    return plan_grouped_itinerary(groups, start_weekday=start_weekday)
+
+def route_from_llm_text(city, day_plan_text, snapshot):
+    """LLM'in önerdiği yerleri metinden çıkarır; günlere bölme ve sıralamayı planlayıcıya bırakır."""
+    data = snapshot.data
+    if city not in data or "Places" not in data[city]:
+        return None
+
+    city_places_data = data[city]["Places"]
+
+    ordered_places = []
+    sentences = day_plan_text.replace("\n", " ").split('.')
+
+    for sentence in sentences:
+        for place_name in city_places_data.keys():
+            if place_name in sentence and place_name not in ordered_places:
+                ordered_places.append(place_name)
+                break
+
+    if not ordered_places:
+        # Metin ayrıştırılamazsa LLM'i tekrar çağırmak yerine şehrin tüm yerleriyle planla
+        print(f"⚠️ Rota metni ayrıştırılamadı, {city} şehrinin tüm yerleri planlanıyor.")
+        ordered_places = None
+
+    # LLM'in önerdiği gün sayısını kullan (bulunamazsa 3 gün)
+    day_numbers = [int(n) for n in re.findall(r"(\d+)\.\s*Gün", day_plan_text)]
+    num_days = max(day_numbers) if day_numbers else 3
+
+    return plan_city_route(city, ordered_places, num_days=num_days, snapshot=snapshot)
+
+def route_from_llm_json(city, response_text, candidates, snapshot):
+    """Şemaya bağlı JSON rota çıktısını doğrulayıp doğrudan planlayıcıya verir; (plan, özet) döndürür.
+
+    Modelin gün gruplaması geçerliyse korunur (planlayıcı yalnızca gün içi sırayı belirler). Bazı günler
+    geçersiz yerler yüzünden boşaldıysa ya da gruplama planlanamıyorsa, yerler modelin planladığı gün
+    sayısına yeniden dağıtılır. Çıktı doğrulanamazsa LLM tekrar çağrılmaz, şehrin tüm yerleriyle planlanır.
+    """
+    try:
+        plan = parse_route_plan(response_text, candidates)
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ Rota çıktısı kullanılamadı ({e}) -> {city} şehrinin tüm yerleri planlanıyor.")
+        return plan_city_route(city, None, num_days=3, snapshot=snapshot), ""
+    place_names = [name for day in plan["days"] for name in day]
+    num_days = plan["planned_days"]
+    if len(plan["days"]) == num_days:
+        itinerary = plan_grouped_route(city, plan["days"], snapshot)
+        if itinerary is not None:
+            print(f"🧩 Yapılandırılmış rota alındı: {num_days} gün, {len(place_names)} yer (modelin gün gruplaması korundu).")
+            return itinerary, plan["summary"]
+        print("ℹ️ Modelin gün gruplaması uygulanamadı (kapalı gün / koordinat eksik), yerler yeniden gruplanıyor.")
+    else:
+        print(f"ℹ️ Modelin {num_days} gününden {num_days - len(plan['days'])} tanesinde geçerli yer yok, "
+              f"yerler {num_days} güne yeniden dağıtılıyor.")
+    return plan_city_route(city, place_names, num_days=num_days, snapshot=snapshot), plan["summary"]
+
+def generate_and_order_route(city, day_plan_text, snapshot):
+    """LLM'in metinsel rotasını planlayıcıdan geçirip Markdown olarak döndürür."""
+    itinerary = route_from_llm_text(city, day_plan_text, snapshot)
+    if itinerary is None:
+        return f"❌ Rota oluşturmak için yeterli yer detayı bilgisi ({city} için) bulunamadı."
+    return format_itinerary_markdown(itinerary, city)
+
+def city_overview_document(city, snapshot):
+    """Şehrin vektör DB'deki "Genel Plan" dokümanının metnini döndürür (önek önbelleği için)."""
+    if city not in snapshot.data:
+        return None
+    documents, _, _ = build_documents({city: snapshot.data[city]})
+    return documents[0]
+
+def find_thumbnails(images_by_place, snapshot):
+    """Yer -> görsel eşlemesini küçük resim kayıtlarına çevirir ({"place", "path", "width", "height"})."""
+    image_results = []
+    for place, image_path in images_by_place.items():
+        thumb = snapshot.thumbnails.get(image_path) if snapshot.thumbnails else None
+        if thumb:
+            image_results.append({"place": place, "path": thumb["path"], "width": thumb["width"], "height": thumb["height"]})
+        else:
+            # Küçük resim üretilemediyse orijinal görsele geri dön
+            image_results.append({"place": place, "path": image_path, "width": None, "height": None})
+    return image_results
+
+def nearby_places(latitude, longitude, radius_km=1.6, limit=10, snapshot=None):
+    """Verilen koordinata `radius_km` içindeki yerleri mesafeye göre sıralı döndürür (LLM ve vektör DB kullanılmaz)."""
+    if snapshot is None:
+        with snapshots.acquire() as snapshot:
+            return nearby_places(latitude, longitude, radius_km, limit, snapshot) if snapshot else []
+    found = []
+    for city, city_data in snapshot.data.items():
+        for place, details in city_data.get("Places", {}).items():
+            lat, lon = details.get("latitude"), details.get("longitude")
+            if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+                continue
+            distance = haversine_km(latitude, longitude, lat, lon)
+            if distance <= radius_km:
+                found.append((distance, city, place, details))
+    found.sort(key=lambda item: item[0])
+
+    results = []
+    for distance, city, place, details in found[:limit]:
+        image = find_thumbnails({place: details["image"]}, snapshot)[0] if details.get("image") else None
+        results.append({
+            "city": city,
+            "place": place,
+            "distance_km": round(distance, 3),
+            "latitude": details["latitude"],
+            "longitude": details["longitude"],
+            "description": details.get("description"),
+            "tips": details.get("tips"),
+            "image": image,
+        })
+    return results
+
+
+# ====================================================
+# >>> VERİ NESLİ (Hot-Reload) <<<
+# ====================================================
+
+def watched_paths(snapshot=None):
+    """Hot-reload için izlenen dosyalar: JSON, derlenmiş dataset ve verideki görseller."""
+    paths = [DATA_FILE, DATASET_FILE]
+    if snapshot is not None:
+        paths.extend(sorted({image_path for _, _, image_path in iter_place_images(snapshot.data)}))
+    return paths
+
+def document_embeddings(data, documents, previous=None):
+    """Dokümanların (n, d) float32 embedding matrisi: önce dataset'teki hazır vektörler, sonra önceki
+    nesilde metni değişmemiş dokümanlar; yalnızca kalanlar yeniden encode edilir.
+
+    Önceki neslin indeksi PCA ile indirgenmişse oradaki vektörler tam boyutlu olmadığından kullanılmaz.
+    """
+    precomputed = None
+    if isinstance(data, TravelDataset):
+        precomputed = data.precomputed_embeddings(documents, embedding_model_name)
+    if precomputed is not None:
+        print("   - Önceden hesaplanmış vektörler dataset dosyasından okundu.")
+        return precomputed
+
+    reused = {}
+    if previous is not None and previous.codec.projection is None:
+        try:
+            old = previous.collection.get(include=["documents", "embeddings"])
+        except ShardUnavailableError as e:
+            print(f"⚠️ Önceki neslin vektörleri alınamadı, hepsi yeniden hesaplanacak: {e}")
+            old = {"documents": [], "embeddings": []}
+        old_by_text = {doc: embedding for doc, embedding in zip(old["documents"], old["embeddings"])}
+        reused = {i: old_by_text[doc] for i, doc in enumerate(documents) if doc in old_by_text}
+    missing = [i for i in range(len(documents)) if i not in reused]
+    print(f"   - Vektörler (Embeddings) oluşturuluyor... ({len(missing)} yeni, {len(reused)} önceki nesilden)")
+    encoded = embeddings_model.encode([documents[i] for i in missing], convert_to_numpy=True) if missing else None
+    dim = encoded.shape[1] if encoded is not None else len(next(iter(reused.values()), ()))
+    vectors = np.empty((len(documents), dim), dtype=np.float32)
+    for i, vector in reused.items():
+        vectors[i] = vector
+    if missing:
+        vectors[missing] = encoded
+    return vectors
+
+def build_snapshot(previous=None):
+    """Veriyi, vektör koleksiyonunu ve küçük resimleri yeni bir nesil olarak hazırlar (yayınlamaz).
+
+    Koleksiyon adı doküman içeriğinin özetini taşır; aynı içerik için diskteki koleksiyon yeniden
+    kullanılır, yeniden başlatmada indeks baştan kurulmaz.
+    """
+    start_time = time.time()
+    vector_db_path = _storage_paths["vector_db_path"]
+    # İmza yüklemeden önce alınır: yükleme sırasında gelen değişiklik bir sonraki yoklamada yakalanır
+    source_signature = file_signature([DATA_FILE, DATASET_FILE])
+
+    # 1. Veriyi yükle (derlenmiş dataset güncelse mmap ile, değilse JSON'dan)
+    try:
+        with profiler.phase("data_load"):
+            data = load_travel_data(DATA_FILE, DATASET_FILE)
+            if isinstance(data, TravelDataset):
+                print(f"✅ Derlenmiş dataset mmap ile açıldı: {DATASET_FILE}")
+            else:
+                for warning in validate_routes(data):
+                    print(f"⚠️ {warning}")
+                print("✅ JSON Verisi başarıyla yüklendi. (Hızlı açılış için: python compile_dataset.py)")
+    except Exception as e:
+        print(f"🚨 HATA: JSON verisi yüklenemedi! {e}")
+        raise
+
+    try:
+        # 2. Vektör Veritabanını yükle/oluştur
+        documents_to_add, metadatas_to_add, ids_to_add = build_documents(data)
+        # PCA ayarı indeksin içeriğini değiştirdiği için koleksiyon adına (özete) dahildir
+        codec = EmbeddingCodec()
+        fingerprint = documents_fingerprint(
+            documents_to_add + [json.dumps(metadatas_to_add, sort_keys=True, ensure_ascii=False), embedding_model_name,
+                                codec.index_key]
+        )
+        with profiler.phase("chroma_open"):
+            if previous is not None:
+                client = previous.client
+            elif SHARD_MODE != "off":
+                # Parçalı mod: şehirler ayrı arama süreçlerine dağıtılır (istemci arayüzü aynıdır)
+                client = ShardCluster.from_env()
+            else:
+                client = chromadb.PersistentClient(path=vector_db_path)
+            collection = client.get_or_create_collection(name=f"{COLLECTION_NAME_PREFIX}_{fingerprint[:16]}")
+
+        projection_path = os.path.join(vector_db_path, f"{collection.name}.pca.npz")
+        if collection.count() != len(ids_to_add) or (codec.pca_dim and not codec.load_projection(projection_path)):
+            with profiler.phase("index_build"):
+                print(f"⏳ Vektör koleksiyonu '{collection.name}' dolduruluyor... (Gelişmiş Strateji)")
+                print(f"   - {len(documents_to_add)} adet daha odaklı Document oluşturuldu.")
+                embeddings_matrix = document_embeddings(data, documents_to_add, previous)
+                if documents_to_add:
+                    codec.fit(embeddings_matrix)
+                    codec.save_projection(projection_path)
+                print(f"   - Veritabanına ekleniyor...")
+                if documents_to_add:
+                    collection.upsert(embeddings=codec.index_vectors(embeddings_matrix), documents=documents_to_add,
+                                      metadatas=metadatas_to_add, ids=ids_to_add)
+            print(f"✅ Vektör koleksiyonu oluşturuldu ve kaydedildi. ({time.time() - start_time:.2f} saniye)")
+        else:
+            print(f"✅ Mevcut vektör koleksiyonu '{collection.name}' başarıyla yüklendi ({collection.count()} doküman).")
+        # İlk isteğin indeks yükleme maliyetini ödememesi için koleksiyona yayından önce dokun
+        if documents_to_add:
+            with profiler.phase("index_warm"):
+                collection.query(query_embeddings=[codec.project_query(embedding_batcher.encode(documents_to_add[0]))], n_results=1)
+
+        # 3. Görsellerin küçük resimlerini hazırla (önceden üretilmişler manifest'ten okunur)
+        thumbnails_start = time.time()
+        with profiler.phase("thumbnails"):
+            thumbnails = ThumbnailIndex(_storage_paths["thumbnail_cache_dir"])
+            thumbnail_count = thumbnails.build_all(data)
+        print(f"✅ {thumbnail_count} küçük resim hazır ({time.time() - thumbnails_start:.2f} saniye).")
+    except Exception:
+        if hasattr(data, "close"):
+            data.close()
+        raise
+
+    snapshot = DataSnapshot(
+        generation=previous.generation + 1 if previous is not None else 1,
+        data=data, client=client, collection=collection, thumbnails=thumbnails,
+        fingerprint=fingerprint, source_signature=None, codec=codec,
+    )
+    snapshot.source_signature = source_signature + file_signature(watched_paths(snapshot)[2:])
+    return snapshot
+
+def publish_snapshot(snapshot):
+    """Yeni nesli yayınlar ve kısayol globallerini günceller."""
+    global data_json, vector_collection, thumbnail_index
+    data_json, vector_collection, thumbnail_index = snapshot.data, snapshot.collection, snapshot.thumbnails
+    snapshots.publish(snapshot)
+
+def reload_dataset(reason="yönetici isteği"):
+    """Yeni nesli hazırlayıp yayınlar; yeni neslin kaynak imzasını döndürür.
+
+    Hazırlık boyunca mevcut nesil istekleri cevaplamaya devam eder; hata olursa eski nesil yayında kalır.
+    """
+    with _reload_lock:
+        print(f"⏳ Veri yeniden yükleniyor ({reason})...")
+        start_time = time.time()
+        snapshot = build_snapshot(previous=snapshots.current())
+        publish_snapshot(snapshot)
+        print(f"✅ Yeniden yükleme tamamlandı ({time.time() - start_time:.2f} saniye).")
+        return snapshot.source_signature
+
+def reload_dataset_async(reason="yönetici isteği"):
+    """Yeniden yüklemeyi arka plan iş parçacığında başlatır."""
+    def run():
+        try:
+            reload_dataset(reason)
+        except Exception as e:
+            print(f"🚨 Yeniden yükleme başarısız, önceki veri nesli kullanılmaya devam ediyor: {e}\n{traceback.format_exc()}")
+
+    threading.Thread(target=run, name="dataset-reload", daemon=True).start()
+
+
+# ====================================================
+# >>> BAŞLANGIÇ FONKSİYONLARI (DB OLUŞTURMA GÜNCELLENDİ) <<<
+# ====================================================
+
+def initialize_models_and_db(vector_db_path=VECTOR_DB_PATH, thumbnail_cache_dir=THUMBNAIL_CACHE_DIR):
+    """Gerekli modelleri ve veritabanını yükler/oluşturur."""
+    global llm, embeddings_model, embedding_batcher, prompt_manager, model_router, dataset_watcher, query_log, answer_warmup_thread, API_KEY_ERROR
+
+    if API_KEY_ERROR:
+        print("❌ API Anahtarı hatası nedeniyle başlatma işlemi durduruldu.")
+        return False
+
+    # 1. LLM yükle (Gemini)
+    if llm is None:
+        try:
+            print("⏳ Google Gemini LLM yükleniyor...")
+            with profiler.phase("llm_setup"):
+                llm = genai.GenerativeModel(
+                  model_name=llm_model_name,
+                  generation_config=generation_config
+                )
+                prompt_manager = PromptManager(llm_model_name, generation_config)
+                catalog = ModelCatalog()
+                catalog.start() # Sonraki yenilemeler arka planda; model seçimi ağı beklemez
+                model_router = ModelRouter(catalog, strong_model=llm_model_name)
+            print(f"✅ Google Gemini LLM Başarıyla Yüklendi. (hafif model: {model_router.light_model})")
+        except Exception as e:
+            print(f"🚨 HATA: Google Gemini LLM başlatılırken hata oluştu: {e}")
+            API_KEY_ERROR = True
+            return False
+
+    # 2. Embedding modelini yükle
+    if embeddings_model is None:
+        try:
+            print(f"⏳ Embedding modeli ({embedding_model_name}) yükleniyor/indiriliyor...")
+            start_time = time.time()
+            with profiler.phase("embedding_model_load"):
+                embeddings_model = SentenceTransformer(
+                    model_name_or_path=embedding_model_name,
+                    device='cpu'
+                )
+            end_time = time.time()
+            print(f"✅ Embedding Modeli Başarıyla Yüklendi. ({end_time - start_time:.2f} saniye)")
+        except Exception as e:
+            print(f"🚨 HATA: Embedding modeli yüklenirken hata oluştu: {e}")
+            API_KEY_ERROR = True
+            return False
+
+    # 2b. Sorgu embedding'leri için toplu işleyiciyi (micro-batching) başlat
+    if embedding_batcher is None:
+        embedding_batcher = EmbeddingBatcher(embeddings_model)
+        print(f"✅ Embedding batcher hazır (max batch: {embedding_batcher.max_batch_size}, max bekleme: {EMBED_BATCH_MAX_WAIT_MS} ms).")
+
+    # 3. İlk veri nesli: veri + vektör koleksiyonu + küçük resimler
+    if snapshots.current() is None:
+        _storage_paths.update(vector_db_path=vector_db_path, thumbnail_cache_dir=thumbnail_cache_dir)
+        try:
+            with profiler.phase("dataset_snapshot"):
+                publish_snapshot(build_snapshot())
+        except Exception as e:
+            print(f"🚨 HATA: Veri / vektör veritabanı yüklenirken hata oluştu: {e}\n{traceback.format_exc()}")
+            API_KEY_ERROR = True
+            return False
+
+    # 4. Soğuk yol maliyetlerini (torch, HNSW yükleme, Gemini bağlantısı) "Hazır" demeden önce öde
+    if query_log is None and QUERY_LOG_FILE:
+        query_log = QueryLog(QUERY_LOG_FILE, normalize=normalize_question)
+    if WARMUP_ENABLED and not warmup_report:
+        with profiler.phase("warmup"):
+            warm_up()
+
+    # 5. Veri dosyalarını izle; değişince yeni nesil arka planda hazırlanıp yayınlanır
+    if dataset_watcher is None:
+        dataset_watcher = DatasetWatcher(lambda: watched_paths(snapshots.current()), reload_dataset)
+        dataset_watcher.start(snapshots.current().source_signature)
+
+    # 6. İsteğe bağlı cevap ısınması: Gemini çağrıları "Hazır" olmayı geciktirmesin diye arka planda
+    if (WARMUP_ENABLED and WARMUP_ANSWER_TOP_N > 0 and answer_warmup_thread is None
+            and query_log is not None and answer_cache is not None):
+        answer_warmup_thread = threading.Thread(target=prime_answers, name="answer-warmup", daemon=True)
+        answer_warmup_thread.start()
+
+    return True
+
+def warm_up():
+    """İlk isteğin ödeyeceği tembel başlatma maliyetlerini açılışta öder ve önbellekleri doldurur.
+
+    Adımlar: tipik batch boyutlarında sahte encode, vektör indeksine (filtreli/filtresiz) dokunma,
+    Gemini bağlantısını açma (count_tokens; cevap üretmez) ve sorgu günlüğündeki sık soruların
+    embedding'lerini önceden hesaplama. Cevap ısınması (`prime_answers`) burada değil, servis hazır
+    olduktan sonra arka planda yapılır. Hiçbir adımın hatası başlatmayı durdurmaz.
+    """
+    start_time = time.time()
+    snapshot = snapshots.current()
+    report = {}
+
+    def step(name, fn):
+        step_start = time.perf_counter()
+        try:
+            fn()
+            report[name] = round(time.perf_counter() - step_start, 3)
+        except Exception as e:
+            report[name] = f"hata: {e}"
+            print(f"⚠️ Isınma adımı başarısız ({name}): {e}")
+
+    def encode_batches():
+        for batch_size in WARMUP_BATCH_SIZES:
+            embeddings_model.encode([WARMUP_TEXT] * batch_size, convert_to_numpy=True)
+        embedding_batcher.encode(WARMUP_TEXT)
+
+    def touch_index():
+        vector = snapshot.codec.project_query(embed_query(WARMUP_TEXT))
+        snapshot.collection.query(query_embeddings=[vector], n_results=RETRIEVAL_TOP_K,
+                                  include=["metadatas", "documents", "distances"])
+        snapshot.collection.query(query_embeddings=[vector], n_results=1, where={"type": "Genel Plan"})
+
+    def open_llm_connection():
+        llm.count_tokens(WARMUP_TEXT)
+
+    def prime_embeddings():
+        questions = [q for q in query_log.top(WARMUP_EMBED_TOP_N) if query_embedding_cache.get(q) is None]
+        if questions:
+            for question, vector in zip(questions, embeddings_model.encode(questions, convert_to_numpy=True)):
+                vector.setflags(write=False)
+                query_embedding_cache.put(question, vector)
+        report["primed_embeddings"] = len(questions)
+
+    print("⏳ Isınma (warm-up) başlıyor...")
+    step("encode_seconds", encode_batches)
+    step("index_seconds", touch_index)
+    step("llm_connect_seconds", open_llm_connection)
+    if query_log is not None and query_embedding_cache is not None and WARMUP_EMBED_TOP_N > 0:
+        step("embedding_replay_seconds", prime_embeddings)
+    report["total_seconds"] = round(time.time() - start_time, 3)
+    warmup_report.update(report)
+    print(f"✅ Isınma tamamlandı ({report['total_seconds']:.2f} saniye): {report}")
+
+def prime_answers():
+    """Sorgu günlüğündeki ilk WARMUP_ANSWER_TOP_N sorunun cevabını önbelleğe üretir (Gemini çağrısı).
+
+    Varsayılan olarak kapalıdır: günlükteki sorular kişisel veri içerebilir ve her açılışta Gemini'ye
+    yeniden gönderilir. Açıksa servis hazır olduktan sonra arka planda çalışır, hazır olmayı geciktirmez.
+    """
+    start_time = time.perf_counter()
+    try:
+        questions = query_log.top(WARMUP_ANSWER_TOP_N)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(questions), 4)), thread_name_prefix="warmup") as pool:
+            results = list(pool.map(lambda q: answer_question(q, log_query=False), questions))
+    except Exception as e:
+        warmup_report["answer_replay_seconds"] = f"hata: {e}"
+        print(f"⚠️ Cevap ısınması başarısız: {e}")
+        return
+    warmup_report["primed_answers"] = sum(1 for result in results if not result["error"])
+    warmup_report["answer_replay_seconds"] = round(time.perf_counter() - start_time, 3)
+    print(f"✅ {warmup_report['primed_answers']} sık sorunun cevabı önbelleğe alındı "
+          f"({warmup_report['answer_replay_seconds']:.2f} saniye).")
+
+def is_ready():
+    """Servis soru cevaplamaya hazır mı?"""
+    return not API_KEY_ERROR and bool(prompt_manager and embedding_batcher and snapshots.current())
+
+def collection_size(collection):
+    """Metrikler için doküman sayısı; parçalı modda kısa süreli sorulur, cevap eksikse None."""
+    if not isinstance(collection, ShardedCollection):
+        return collection.count()
+    try:
+        return collection.count(timeout=SHARD_TIMEOUT_SECONDS)
+    except ShardUnavailableError:
+        return None
+
+def service_metrics():
+    """Arayüz ve API için çalışma zamanı metrikleri."""
+    snapshot = snapshots.current()
+    return {
+        "embedding_batch": embedding_batcher.stats() if embedding_batcher else {},
+        "models": model_router.stats.snapshot() if model_router else {},
+        "single_flight": request_coalescer.stats() if request_coalescer else {},
+        "query_embedding_cache": query_embedding_cache.stats() if query_embedding_cache else {},
+        "answer_cache": answer_cache.stats() if answer_cache else {},
+        "warmup": dict(warmup_report),
+        "shards": snapshot.client.stats() if snapshot and isinstance(snapshot.client, ShardCluster) else {},
+        "dataset": {"generation": snapshot.generation, "fingerprint": snapshot.fingerprint[:12],
+                    "documents": collection_size(snapshot.collection), "inflight_requests": snapshot.inflight} if snapshot else {},
+    }
+
+
+# ====================================================
+# >>> RAG İŞLEM HATTI (Konum Filtresi ve Rota Sıralama) <<<
+# ====================================================
+
+def parse_location(user_location):
+    """'48.85, 2.29' biçimindeki konumu (enlem, boylam) çiftine çevirir; hatalıysa None."""
+    if not user_location:
+        return None
+    try:
+        lat_str, lon_str = user_location.split(',')
+        return float(lat_str.strip()), float(lon_str.strip())
+    except ValueError:
+        print("🚨 Konum formatı hatalı. Koordinat filtresi uygulanmayacak.")
+        return None
+
+def is_route_question(user_question):
+    lowered = user_question.lower()
+    return "günlük gezi planı oluştur" in lowered or "rota oluştur" in lowered
+
+def normalize_question(user_question):
+    """Birleştirme anahtarı için soruyu sadeleştirir (büyük/küçük harf, boşluklar, sondaki noktalama)."""
+    return re.sub(r"\s+", " ", user_question.casefold()).strip(" ?!.")
+
+def request_key(user_question, user_location=None, session=None):
+    """Özdeş istekleri birleştirmek ve cevap önbelleği için anahtar; uygun olmayan istekte None.
+
+    Geçmişi olan oturumların cevabı önceki sorulara bağlı olduğundan bu istekler birleştirilmez/önbelleğe alınmaz.
+    Anahtar veri neslini de içerir; yeniden yüklemeden sonra eski cevaplar kullanılmaz. Rota planları bugünden
+    başlar (kapalı günler buna göre dağıtılır), bu yüzden rota isteklerinde haftanın günü de anahtara girer.
+    """
+    if session is not None and (session.history or session.city is not None):
+        return None
+    location = parse_location(user_location)
+    location = tuple(round(value, 6) for value in location) if location else None
+    snapshot = snapshots.current()
+    intent = classify_intent(user_question, is_route_question(user_question))
+    start_weekday = datetime.date.today().weekday() if intent == INTENT_ROUTE else None
+    return (normalize_question(user_question), location, intent, start_weekday, snapshot.generation if snapshot else None)
+
+def embed_query(user_question):
+    """Sorgu embedding'i (önbellekten ya da embedding_batcher ile); dönen dizi salt okunurdur."""
+    vector = query_embedding_cache.get(user_question) if query_embedding_cache is not None else None
+    if vector is None:
+        vector = embedding_batcher.encode(user_question)
+        vector.setflags(write=False)
+        if query_embedding_cache is not None:
+            query_embedding_cache.put(user_question, vector)
+    return vector
+
+_mention_index = {} # (veri nesli, veri nesnesi) -> şehir/yer adı desenleri; yalnızca son nesil tutulur
+_mention_index_lock = threading.Lock()
+
+def fold_name(text):
+    """Ad eşleştirmesi için harf büyüklüğü, aksan ve noktalı/noktasız I farkını kaldırır ("İstanbul" == "istanbul")."""
+    text = unicodedata.normalize("NFKD", text.casefold().replace("ı", "i"))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def _name_pattern(names):
+    # Uzun adlar önce denenir; kelime sınırı zorunlu ("Roma" "romantik" içinde eşleşmez, "Roma'da" eşleşir)
+    if not names:
+        return None
+    alternatives = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+
+def mention_index(snapshot):
+    """Veri nesli başına bir kez derlenen şehir ve yer adı desenleri."""
+    key = (snapshot.generation, id(snapshot.data))
+    with _mention_index_lock:
+        index = _mention_index.get(key)
+        if index is None:
+            cities = {fold_name(city): city for city in snapshot.data}
+            places = {}
+            for city, city_data in snapshot.data.items():
+                for place in city_data.get("Places", {}):
+                    if fold_name(place):
+                        places.setdefault(fold_name(place), set()).add(city)
+            index = {"cities": cities, "city_pattern": _name_pattern(cities),
+                     "places": places, "place_pattern": _name_pattern(places)}
+            _mention_index.clear()
+            _mention_index[key] = index
+    return index
+
+def mentioned_cities(user_question, snapshot, include_places=False):
+    """Soruda adı geçen (veri setindeki) şehirler; `include_places` ile yer adı geçen şehirler de eklenir."""
+    index = mention_index(snapshot)
+    folded = fold_name(user_question)
+    found = set()
+    if index["city_pattern"] is not None:
+        found.update(index["cities"][name] for name in index["city_pattern"].findall(folded))
+    if include_places and index["place_pattern"] is not None:
+        for name in index["place_pattern"].findall(folded):
+            found.update(index["places"][name])
+    return [city for city in snapshot.data if city in found]
+
+def load_session_candidates(session, city, query_vector, snapshot):
+    """Şehrin tüm dokümanlarını embedding'leriyle birlikte oturuma aday küme olarak yükler (şehir başına bir kez)."""
+    if session.has_candidates(city, snapshot.generation):
+        return
+    try:
+        candidates = snapshot.collection.get(where={"source_city": city}, include=["documents", "metadatas", "embeddings"])
+    except ShardUnavailableError as e:
+        # Eksik aday kümesi oturuma yazılmaz; sonraki soruda tekrar denenir
+        print(f"⚠️ Oturum adayları yüklenemedi ({city}): {e}")
+        return
+    if candidates["ids"]:
+        session.set_candidates(city, candidates["ids"], candidates["documents"], candidates["metadatas"],
+                               candidates["embeddings"], query_vector=query_vector, generation=snapshot.generation)
+        print(f"💾 Oturuma {len(session.ids)} aday doküman kaydedildi ({city}, ~{session.nbytes() // 1024} KB).")
+
+def reuse_session_candidates(session, user_question, query_vector, snapshot):
+    """Takip sorusu aynı şehirde kalıyorsa oturumdaki adayları yerelde yeniden sıralar; değilse None.
+
+    Soruda başka bir şehrin ya da başka bir şehre ait bir yerin adı geçiyorsa ("Kolezyum'a nasıl gidilir?")
+    adaylar kullanılmaz. Adaylar farklı bir veri neslinden geliyorsa (hot-reload sonrası) da kullanılmaz.
+    """
+    if session is None or not session.has_candidates(session.city, snapshot.generation):
+        return None
+    if any(city != session.city for city in mentioned_cities(user_question, snapshot, include_places=True)):
+        return None
+    ids, documents, metadatas, scores = session.rerank(query_vector, RETRIEVAL_TOP_K)
+    if not len(scores) or scores[0] < SESSION_REUSE_MIN_SCORE:
+        return None
+    ids, documents, _, scores = select_relevant(ids, documents, metadatas, [float(score) for score in scores])
+    if not ids:
+        return None
+    print(f"♻️ Takip sorusu: {session.city} adayları yerelde yeniden sıralandı (vektör DB sorgusu yapılmadı, k={len(ids)}).")
+    return {"snapshot": snapshot, "query_vector": query_vector, "city": session.city, "ids": ids,
+            "documents": documents, "scores": scores, "context": build_context(documents)}
+
+def query_collection(collection, query_vector, where=None):
+    """Vektör DB sorgusu; mesafeler benzerliğe çevrilir ve sonuçlar dinamik k ile kesilir."""
+    query_args = {"where": where} if where else {}
+    results = collection.query(
+        query_embeddings=[query_vector],
+        n_results=RETRIEVAL_TOP_K,
+        include=["metadatas", "documents", "distances"],
+        **query_args
+    )
+    ids = results['ids'][0] if results['ids'] else []
+    documents = results['documents'][0] if results['documents'] else []
+    metadatas = results['metadatas'][0] if results['metadatas'] else []
+    scores = [similarity_from_distance(d) for d in (results['distances'][0] if results['distances'] else [])]
+    kept = select_relevant(ids, documents, metadatas, scores)
+    print(f"   - {len(ids)} sonuçtan {len(kept[0])} tanesi alakalı (skorlar: {', '.join(f'{s:.2f}' for s in scores[:5])}).")
+    return kept
+
+def retrieve_context(user_question, user_location=None, session=None, snapshot=None):
+    """Soruyu vektöre çevirir, şehri tespit eder ve ChromaDB'den bağlamı getirir.
+
+    `session` verilirse aynı şehirdeki takip soruları oturumdaki aday kümesinden cevaplanır.
+    Sonuç, işlem hattının geri kalanının kullanacağı veri neslini (`snapshot`) da taşır.
+    """
+    snapshot = snapshot or snapshots.current()
+    vector_collection = snapshot.collection
+    where_filter = {}
+    city_to_check = None
+
+    # 1. Konum Filtresi Hazırlığı
+    location = parse_location(user_location)
+    if location:
+        user_lat, user_lon = location
+        print(f"🌍 Konum Filtresi Hazırlanıyor: ({user_lat}, {user_lon})")
+        where_filter = {
+            "$and": [
+                {"latitude": {"$gte": user_lat - LOCATION_BOX_DEGREES, "$lte": user_lat + LOCATION_BOX_DEGREES}},
+                {"longitude": {"$gte": user_lon - LOCATION_BOX_DEGREES, "$lte": user_lon + LOCATION_BOX_DEGREES}}
+            ]
+        }
+
+    # 2. Soruyu Vektöre Çevir (Şehir tespiti ve arama aynı vektörü kullanır)
+    # Eşzamanlı istekler embedding_batcher'da tek bir encode çağrısında birleştirilir.
+    # Vektör NumPy dizisi olarak kalır; PCA açıksa indeksin uzayına taşınır.
+    query_vector = snapshot.codec.project_query(embed_query(user_question))
+
+    # Konum verilmediyse ve soru aynı şehirde kalıyorsa oturumdaki adaylar kullanılır
+    if not location:
+        reused = reuse_session_candidates(session, user_question, query_vector, snapshot)
+        if reused is not None:
+            return reused
+
+    # Şehir tespiti (Konum filtrelemesi yapılıyorsa)
+    if location:
+        city_results = vector_collection.query(
+            query_embeddings=[query_vector],
+            n_results=1,
+            where={"type": "Genel Plan"}
+        )
+        if city_results['metadatas'][0] and city_results['metadatas'][0][0]['source_city']:
+             city_to_check = city_results['metadatas'][0][0]['source_city']
+             print(f"📍 Şehir Tespiti Başarılı: {city_to_check}")
+
+    # 3. ChromaDB'de Arama Yap (filtre sadece konum verildiyse uygulanır)
+    retrieved_ids = []
+    if where_filter:
+        print(f"🔍 ChromaDB Sorgusu: Konum Filtresi Uygulanıyor.")
+        retrieved_ids, retrieved_docs, retrieved_metadatas, scores = query_collection(vector_collection, query_vector, where_filter)
+        if not retrieved_ids:
+            print("ℹ️ Konum filtresiyle alakalı sonuç yok, filtresiz aramaya dönülüyor.")
+    if not retrieved_ids and SHARD_MODE != "off":
+        # Parçalı modda yalnızca tek bir şehrin geçtiği soru sadece o şehrin parçasına gönderilir
+        cities = mentioned_cities(user_question, snapshot)
+        if len(cities) == 1:
+            print(f"🔍 Parçalı Sorgu: yalnızca {cities[0]} şehrinin parçası sorgulanıyor.")
+            retrieved_ids, retrieved_docs, retrieved_metadatas, scores = query_collection(vector_collection, query_vector, {"source_city": cities[0]})
+    if not retrieved_ids:
+        print("🔍 ChromaDB Sorgusu: Konum Filtresi Uygulanmıyor (Normal RAG).")
+        retrieved_ids, retrieved_docs, retrieved_metadatas, scores = query_collection(vector_collection, query_vector)
+
+    # Konum yoksa şehir, en alakalı dokümanın metadatasından alınır (rota optimizasyonu için)
+    if city_to_check is None and retrieved_metadatas:
+        metadata_found = retrieved_metadatas[0]
+        if 'source_city' in metadata_found:
+            city_to_check = metadata_found['source_city']
+            print(f"📍 RAG ile Şehir Tespiti Başarılı: {city_to_check}")
+
+    # 4. Bağlamı (Context) Oluştur (tekrar eden parçalar ayıklanır)
+    context = build_context(retrieved_docs)
+    print(f"📚 Bulunan Bağlam (Context): {context[:200]}...")
+
+    if session is not None and city_to_check:
+        load_session_candidates(session, city_to_check, query_vector, snapshot)
+
+    return {"snapshot": snapshot, "query_vector": query_vector, "city": city_to_check, "ids": retrieved_ids,
+            "documents": retrieved_docs, "scores": scores, "context": context}
+
+def prepare_prompt(user_question, retrieval, session=None):
+    """Şablon türünü seçer; modeli (önbellekli olabilir) ve kullanıcı mesajını hazırlar."""
+    city_to_check = retrieval["city"]
+    current_city = city_to_check if city_to_check else "ilgili şehir"
+
+    snapshot = retrieval["snapshot"]
+    candidates = None
+    if is_route_question(user_question):
+        prompt_kind = "route"
+        city_document = city_overview_document(city_to_check, snapshot) if city_to_check else None
+        # Şehir biliniyorsa plan, aday yer ID'leriyle sınırlı JSON olarak istenir (metin ayrıştırma yok)
+        if ROUTE_STRUCTURED_OUTPUT and city_to_check and "Places" in snapshot.data.get(city_to_check, {}):
+            prompt_kind = "route_json"
+            candidates = route_candidate_ids(list(snapshot.data[city_to_check]["Places"].keys()))
+    else:
+        prompt_kind = "qa"
+        city_document = None
+    is_route = prompt_kind != "qa"
+
+    # Model, istek türü (rota / ipucu / genel soru) ve bağlam boyutuna göre seçilir
+    intent = classify_intent(user_question, is_route)
+    model_name = model_router.choose(intent, estimate_tokens(retrieval["context"])) if model_router else llm_model_name
+    print(f"🧭 Model seçimi: {model_name} (tür: {intent})")
+
+    # Önbelleğe alınmış parçalar (ör. şehrin Genel Plan dokümanı) bağlamda tekrar gönderilmez
+    prompt_model, cached_docs = prompt_manager.model_for(prompt_kind, city_to_check, city_document, model_name)
+    prompt_context = build_context(retrieval["documents"], exclude=cached_docs)
+    if prompt_kind == "route_json":
+        template = build_route_json_prompt(current_city, candidates, prompt_context, user_question)
+    elif prompt_kind == "route":
+        template = build_route_prompt(current_city, prompt_context, user_question)
+    else:
+        template = build_qa_prompt(prompt_context, user_question, session.recent_questions() if session else ())
+    legacy_prompt = build_legacy_prompt(prompt_kind, current_city, retrieval["context"], user_question)
+    return {"kind": prompt_kind, "is_route": is_route, "intent": intent, "model_name": model_name, "model": prompt_model,
+            "template": template, "legacy_prompt": legacy_prompt, "candidates": candidates,
+            "generation_config": route_generation_config(candidates) if candidates else None}
+
+def record_model_call(prompt, start_time, ok):
+    """LLM çağrısının süresini ve sonucunu yönlendiricinin istatistiklerine işler."""
+    if model_router:
+        model_router.record(prompt["model_name"], time.perf_counter() - start_time, ok)
+
+def finalize_answer(retrieval, prompt, llm_text_output):
+    """LLM çıktısına rota planlamasını ve görselleri ekleyip sonuç sözlüğünü oluşturur."""
+    snapshot = retrieval["snapshot"]
+    city_to_check = retrieval["city"]
+    is_route_request = prompt["is_route"]
+    itinerary = None
+    summary = ""
+
+    # 7. Rota Oluşturma Mantığını Uygula
+    if prompt["candidates"]:
+        itinerary, summary = route_from_llm_json(city_to_check, llm_text_output, prompt["candidates"], snapshot)
+        if itinerary is None:
+            llm_text_output = f"❌ Rota oluşturmak için yeterli yer detayı bilgisi ({city_to_check} için) bulunamadı."
+    elif is_route_request and city_to_check and "Gün" in llm_text_output:
+        itinerary = route_from_llm_text(city_to_check, llm_text_output, snapshot)
+    if itinerary:
+        full_response = format_itinerary_markdown(itinerary, city_to_check)
+        if summary:
+            full_response = f"{summary}\n\n{full_response}"
+    else:
+        full_response = llm_text_output
+
+    # 8. Görsel Bulma (orijinaller yerine boyut bilgili küçük resimler gönderilir)
+    images_found = {} # yer adı -> kaynak görsel yolu
+    if not is_route_request:
+        for city, city_data in snapshot.data.items():
+            if "Places" in city_data:
+                for place, details in city_data["Places"].items():
+                    if place.lower() in full_response.lower() and "image" in details and details["image"]:
+                        image_path = details["image"]
+                        if os.path.exists(image_path):
+                            images_found[place] = image_path
+                            print(f"🖼️ Görsel bulundu (metinden): {image_path}")
+
+    return {
+        "answer": full_response,
+        "city": city_to_check,
+        "is_route_request": is_route_request,
+        "itinerary": itinerary,
+        "images": find_thumbnails(images_found, snapshot),
+        "context": retrieval["context"],
+        "error": None,
+    }
+
+def format_error(e):
+    error_msg = f"😔 Soru işlenirken bir hata oluştu: {e}"
+    if "API key not valid" in str(e) or "API_KEY_INVALID" in str(e) or "404" in str(e) or "quota" in str(e):
+        error_msg = f"🚨 HATA: Google API ile ilgili bir sorun oluştu: {e}"
+    print(f"ERROR: {error_msg}\n{traceback.format_exc()}")
+    return error_msg
+
+def error_status(e):
+    """Hatanın HTTP karşılığı: kota 429, zaman aşımı 504, geçici erişilemezlik 503, diğer Gemini hataları 502, iç hatalar 500."""
+    if isinstance(e, google_exceptions.GoogleAPICallError):
+        return e.code if e.code in (429, 503, 504) else 502
+    if isinstance(e, TimeoutError):
+        return 504
+    if isinstance(e, ShardUnavailableError):
+        return 503
+    return 500
+
+def no_answer_result(retrieval, is_route_request):
+    """Alakalı doküman yoksa LLM çağrılmadan dönen hazır cevap."""
+    print("⚡ Alakalı bağlam yok: Gemini çağrılmadan hazır cevap döndürülüyor.")
+    return {"answer": NO_ANSWER_MESSAGE, "city": retrieval["city"], "is_route_request": is_route_request,
+            "itinerary": None, "images": [], "context": retrieval["context"], "error": None}
+
+def error_result(message, context="Bağlam bulunamadı.", status=500):
+    """Hata cevabı; `status` API'nin döndüreceği HTTP durum kodudur."""
+    return {"answer": message, "city": None, "is_route_request": False, "itinerary": None,
+            "images": [], "context": context, "error": message, "status": status}
+
+def answer_question(user_question, user_location=None, session=None, log_query=True):
+    """Tam RAG işlem hattı: bağlam getirme, Gemini ile cevap üretme, rota ve görsel ekleme.
+
+    `session` (SessionState) verilirse takip soruları için şehir adayları ve kısa geçmiş orada tutulur.
+    Aynı anda gelen özdeş sorular (normalize soru + konum + istek türü) tek bir hesaplamada birleştirilir;
+    hata ve iptal kuralları için single_flight modülüne bakınız. Başarılı cevaplar kısa süre önbellekte tutulur.
+    `log_query` False ise soru sorgu günlüğüne yazılmaz (ısınma tekrarları için).
+    """
+    if not is_ready():
+        return error_result(NOT_READY_MESSAGE, "Hata: Sistem başlatılamadı.", status=503)
+
+    key = request_key(user_question, user_location, session)
+    if key is None:
+        result = compute_answer(user_question, user_location, session)
+    else:
+        result, reused = (answer_cache.get(key) if answer_cache is not None else None), True
+        if result is not None:
+            print(f"⚡ Cevap önbellekten döndü (Gemini çağrılmadı): {user_question[:60]}")
+        elif request_coalescer is not None:
+            result, reused = request_coalescer.do(key, lambda: compute_answer(user_question, user_location, session))
+            if reused:
+                print(f"🔗 Özdeş istek uçuştaydı, sonuç paylaşıldı (yeni Gemini çağrısı yapılmadı): {user_question[:60]}")
+        else:
+            result, reused = compute_answer(user_question, user_location, session), False
+        if not reused and answer_cache is not None and not result["error"]:
+            answer_cache.put(key, dict(result))
+        if reused:
+            result = dict(result)
+            if session is not None:
+                session.add_turn(user_question, result["answer"])
+    if log_query and query_log is not None and not result["error"]:
+        query_log.record(user_question)
+    return result
+
+def compute_answer(user_question, user_location=None, session=None):
+    """answer_question'ın birleştirme yapılmadan çalışan işlem hattı."""
+    # Profilleme modunda istenen istekler cProfile ile örneklenir
+    with profiler.request("answer_question"), snapshots.acquire() as snapshot:
+        print(f"\n❓ Kullanıcı Sorusu: {user_question}")
+        retrieval = None
+        try:
+            start_time = time.time()
+            retrieval = retrieve_context(user_question, user_location, session, snapshot)
+            if not retrieval["documents"]:
+                result = no_answer_result(retrieval, is_route_question(user_question))
+                if session is not None:
+                    session.add_turn(user_question, result["answer"])
+                print(f"   -> Cevap {time.time() - start_time:.2f} saniyede üretildi.")
+                return result
+            prompt = prepare_prompt(user_question, retrieval, session)
+
+            # 6. Gemini'yi Çağır (Generation)
+            print("🤖 Gemini'den cevap bekleniyor...")
+            llm_start = time.perf_counter()
+            try:
+                response = prompt["model"].generate_content(prompt["template"], generation_config=prompt["generation_config"])
+            except Exception:
+                record_model_call(prompt, llm_start, ok=False)
+                raise
+            record_model_call(prompt, llm_start, ok=True)
+            prompt_manager.audit_tokens(prompt["kind"], prompt["legacy_prompt"], prompt["template"], response)
+
+            if not response.parts:
+                 llm_text_output = "Gemini'den bir cevap alınamadı. Lütfen tekrar deneyin."
+                 print("🚨 HATA: Gemini'den boş cevap (no parts) alındı.")
+            else:
+                 llm_text_output = response.text
+                 print(f"🤖 Ham Cevap Alındı: {llm_text_output[:100]}...")
+
+            end_time = time.time()
+            print(f"   -> Cevap {end_time - start_time:.2f} saniyede üretildi.")
+            result = finalize_answer(retrieval, prompt, llm_text_output)
+            if session is not None:
+                session.add_turn(user_question, result["answer"])
+            return result
+
+        except Exception as e:
+            return error_result(format_error(e), retrieval["context"] if retrieval else "Bağlam bulunamadı.", error_status(e))
+
+def stream_answer(user_question, user_location=None, session=None):
+    """answer_question'ın akış (streaming) hali: {"type": "meta" | "delta" | "final" | "error", ...} olayları üretir.
+
+    Rota isteklerinde cevap planlayıcıdan geçtiği için metin parça parça değil, tek seferde gelir.
+    Her istemci kendi parça akışını aldığından akış istekleri single-flight ile birleştirilmez.
+    """
+    if not is_ready():
+        yield {"type": "error", "error": NOT_READY_MESSAGE, "status": 503}
+        return
+
+    # Akış yarıda bırakılsa da (GeneratorExit) nesil bırakılır
+    with snapshots.acquire() as snapshot:
+        print(f"\n❓ Kullanıcı Sorusu (stream): {user_question}")
+        try:
+            retrieval = retrieve_context(user_question, user_location, session, snapshot)
+            if not retrieval["documents"]:
+                result = no_answer_result(retrieval, is_route_question(user_question))
+                if session is not None:
+                    session.add_turn(user_question, result["answer"])
+                yield {"type": "meta", "city": retrieval["city"], "is_route_request": result["is_route_request"]}
+                yield {"type": "final", **result}
+                return
+            prompt = prepare_prompt(user_question, retrieval, session)
+            yield {"type": "meta", "city": retrieval["city"], "is_route_request": prompt["is_route"]}
+
+            llm_start = time.perf_counter()
+            try:
+                if prompt["is_route"]:
+                    response = prompt["model"].generate_content(prompt["template"], generation_config=prompt["generation_config"])
+                    llm_text_output = response.text if response.parts else ""
+                else:
+                    chunks = []
+                    response = prompt["model"].generate_content(prompt["template"], stream=True)
+                    for chunk in response:
+                        piece = chunk.text if chunk.parts else ""
+                        if piece:
+                            chunks.append(piece)
+                            yield {"type": "delta", "text": piece}
+                    llm_text_output = "".join(chunks)
+            except Exception:
+                record_model_call(prompt, llm_start, ok=False)
+                raise
+            record_model_call(prompt, llm_start, ok=True)
+            prompt_manager.audit_tokens(prompt["kind"], prompt["legacy_prompt"], prompt["template"], response)
+
+            if not llm_text_output:
+                llm_text_output = "Gemini'den bir cevap alınamadı. Lütfen tekrar deneyin."
+            result = finalize_answer(retrieval, prompt, llm_text_output)
+            if session is not None:
+                session.add_turn(user_question, result["answer"])
+            if query_log is not None:
+                query_log.record(user_question)
+            yield {"type": "final", **result}
+
+        except Exception as e:
+            yield {"type": "error", "error": format_error(e), "status": error_status(e)}